@@ -0,0 +1,270 @@
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Optional
+
+from ortools.sat.python import cp_model
+from pydantic import BaseModel
+
+from grad_sat.scraper.models import MinimumClassInfo, MinimumMeetingTime
+from grad_sat.cp_sat.time_tables.main import read_data_from_disk
+from grad_sat.cp_sat.time_tables.model import (
+    TTProblemInstance,
+    TTSolver,
+    TTFilterConstraint,
+    OptimizationTarget,
+    TTSolution,
+)
+from grad_sat.cp_sat.time_tables.section_store import SectionStore
+from grad_sat.cp_sat.time_tables.term_data import (
+    DATA_JSON,
+    TERM_DATA_DIR,
+    build_term_data,
+    load_courses,
+)
+from grad_sat.cp_sat.v2.dependent_variables import are_all_true
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+
+
+def _meeting(day: int, begin_time: int, end_time: int) -> MinimumMeetingTime:
+    return MinimumMeetingTime(
+        begin_time=begin_time,
+        end_time=end_time,
+        **{day_name: i == day for i, day_name in enumerate(DAYS)},
+    )
+
+
+def linked_sections_catalog(
+    courses: int = 3, lectures: int = 3, labs: int = 15, tutorials: int = 15
+) -> list[MinimumClassInfo]:
+    """
+    synthetic term where every lecture links to every (lab, tutorial) pair, every section meets at a
+    different time so nothing collapses as symmetric.
+    """
+    catalog: list[MinimumClassInfo] = []
+    crn = 10_000
+
+    for course in range(courses):
+        class_code = f"BENC{1000 + course}U"
+
+        def section(section_type: str, meeting: MinimumMeetingTime) -> MinimumClassInfo:
+            nonlocal crn
+            crn += 1
+            return MinimumClassInfo(
+                id=crn,
+                class_code=class_code,
+                type=section_type,
+                subject="BENC",
+                meeting_times=[meeting],
+                linked_sections=[],
+            )
+
+        lecture_sections = [
+            section("Lecture", _meeting(i % 5, 700 + course * 10, 705 + course * 10))
+            for i in range(lectures)
+        ]
+        lab_sections = [
+            section("Laboratory", _meeting(i % 5, 800 + (i // 5) * 100 + course, 830 + (i // 5) * 100 + course))
+            for i in range(labs)
+        ]
+        tutorial_sections = [
+            section("Tutorial", _meeting(i % 5, 1400 + (i // 5) * 100 + course, 1430 + (i // 5) * 100 + course))
+            for i in range(tutorials)
+        ]
+
+        for lecture in lecture_sections:
+            lecture.linked_sections = [
+                [lab.id, tutorial.id] for lab in lab_sections for tutorial in tutorial_sections
+            ]
+        for linked in lab_sections + tutorial_sections:
+            linked.linked_sections = [[lecture.id] for lecture in lecture_sections]
+
+        catalog.extend(lecture_sections + lab_sections + tutorial_sections)
+
+    return catalog
+
+
+class _LegacyLinkedSectionsSolver(TTSolver):
+    # the per solve encoding linked sections had before groups were precompiled, kept for comparison
+    def add_linked_sections_constraint(self):
+        course_id_to_course = dict(
+            zip(
+                self.problem_instance.courses["id"], self.problem_instance.courses.index
+            )
+        )
+
+        for course_id, row in self.problem_instance.courses.iterrows():
+            if len(row["linked_sections"]) != 0:
+                course_taken = self.d_vars.course_was_taken[str(course_id)]
+
+                possible_linked_sections = []
+                for linked_section in row["linked_sections"]:
+                    linked_sections_taken = [
+                        self.d_vars.course_was_taken[course_id_to_course[course_id]]
+                        for course_id in linked_section
+                    ]
+
+                    possible_linked_sections.append(
+                        are_all_true(self.model, linked_sections_taken)
+                    )
+
+                self.model.add_at_least_one(possible_linked_sections).only_enforce_if(
+                    course_taken
+                )
+
+
+def benchmark_linked_sections(repeats: int = 3):
+    section_store = SectionStore(linked_sections_catalog())
+    filters = [TTFilterConstraint(subjects=["BENC"], eq=3)]
+
+    for name, solver_class in [
+        ("legacy", _LegacyLinkedSectionsSolver),
+        ("precompiled", TTSolver),
+    ]:
+        build_times, solve_times = [], []
+        for _ in range(repeats):
+            problem_instance = TTProblemInstance(
+                section_store=section_store,
+                forced_conflicts=[],
+                filter_constraints=filters,
+                optimization_target=OptimizationTarget.CoursesTaken,
+            )
+
+            start = time.perf_counter()
+            solver = solver_class(problem_instance=problem_instance)
+            build_times.append(time.perf_counter() - start)
+
+            # feasibility only, so the numbers measure the encoding rather than the optimality proof
+            solver.model.clear_objective()
+
+            start = time.perf_counter()
+            solution = solver.solve()
+            solve_times.append(time.perf_counter() - start)
+            assert solution.status_ok, f"{name} failed to solve"
+
+        proto = solver.model.proto
+        print(
+            f"{name:12} build {min(build_times) * 1000:8.1f}ms "
+            f"solve {min(solve_times) * 1000:8.1f}ms "
+            f"vars {len(proto.variables):6} constraints {len(proto.constraints):6}"
+        )
+
+
+def _legacy_response_json(solution: TTSolution) -> str:
+    # how responses were built before the models were moved to module level, kept for comparison
+    class Course(BaseModel):
+        crn: int
+        name: str
+        meeting_type: str
+        start_time: Optional[int]
+        end_time: Optional[int]
+        alternative_crns: list[int] = []
+
+    class GenerateResponse(BaseModel):
+        courses: dict[str, list[Course]]
+        found_solution: bool
+        stages: list = []
+
+    res: dict[str, list[Course]] = defaultdict(list)
+    for course_nid in solution.courses_taken:
+        course_info = solution.courses.loc[course_nid]
+        for meeting_time in course_info["meeting_times"]:
+            res[meeting_time.day_of_week()].append(
+                Course(
+                    crn=course_info["id"],
+                    name=course_info["class_code"],
+                    meeting_type=course_info["type"],
+                    end_time=meeting_time.end_time,
+                    start_time=meeting_time.begin_time,
+                    alternative_crns=[
+                        crn
+                        for crn in solution.section_store.section_alternatives.get(course_info["id"], [])
+                        if crn != course_info["id"]
+                    ],
+                )
+            )
+
+    return GenerateResponse(courses=res, found_solution=True).model_dump_json()
+
+
+def benchmark_serialisation(schedules: int = 100, sections_per_schedule: int = 8):
+    section_store = SectionStore(read_data_from_disk("grad_sat/cp_sat/time_tables/data.json").lomci)
+    rng = random.Random(0)
+    solutions = [
+        TTSolution(
+            courses_taken=rng.sample(list(section_store.courses.index), sections_per_schedule),
+            courses=section_store.courses,
+            status=cp_model.OPTIMAL,
+            section_store=section_store,
+        )
+        for _ in range(schedules)
+    ]
+
+    for name, serialise in [
+        ("legacy", _legacy_response_json),
+        ("response()", lambda solution: solution.response().model_dump_json()),
+        ("response_json()", lambda solution: solution.response_json()),
+    ]:
+        start = time.perf_counter()
+        payloads = [serialise(solution) for solution in solutions]
+        elapsed = time.perf_counter() - start
+        assert payloads[0] == _legacy_response_json(solutions[0]), f"{name} output differs"
+        print(f"{name:16} {schedules} schedules {elapsed * 1000:8.1f}ms")
+
+
+_IMPORT_ROUTER = (
+    "import time; start = time.perf_counter(); "
+    "import grad_sat.server.routers.time_tables; "
+    "from grad_sat.server.catalog import catalogs; catalogs.load(); "
+    "print(time.perf_counter() - start)"
+)
+
+
+def benchmark_term_data_loading(repeats: int = 5):
+    if not os.path.isdir(TERM_DATA_DIR):
+        build_term_data()
+
+    json_sections = [course.model_dump() for course in load_courses(DATA_JSON)[0]]
+    for name, path in [("json", DATA_JSON), ("term data", TERM_DATA_DIR)]:
+        load_times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            courses, _ = load_courses(path)
+            load_times.append(time.perf_counter() - start)
+        assert [course.model_dump() for course in courses] == json_sections, f"{name} sections differ"
+        del courses
+
+        tracemalloc.start()
+        courses, _ = load_courses(path)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del courses
+
+        # what a worker pays at startup, a fresh interpreter importing the router and loading the catalog
+        import_times = []
+        for _ in range(repeats):
+            result = subprocess.run(
+                [sys.executable, "-c", _IMPORT_ROUTER],
+                env={**os.environ, "TT_TERM_DATA": path},
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            import_times.append(float(result.stdout.strip().splitlines()[-1]))
+
+        print(
+            f"{name:10} load {min(load_times) * 1000:8.1f}ms "
+            f"retained {retained / 2**20:6.1f}MiB peak {peak / 2**20:6.1f}MiB "
+            f"router import {min(import_times) * 1000:8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    benchmark_linked_sections()
+    benchmark_serialisation()
+    benchmark_term_data_loading()
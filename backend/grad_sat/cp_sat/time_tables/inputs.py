@@ -0,0 +1,46 @@
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+
+from grad_sat.cp_sat.time_tables.time_grid import hhmm_to_minutes
+
+# what a timetable request can ask of the solver. kept free of ortools/pandas so the server can declare
+# its routes without importing the solver
+
+
+@dataclass
+class TTFilterConstraint:
+    course_codes: Optional[list[str]] = None
+    subjects: Optional[list[str]] = None
+    year_levels: Optional[list[int]] = None
+
+    lte: int = None
+    gte: int = None
+    eq: int = None
+
+
+@dataclass
+class ForcedConflict:
+    day: str
+    start: int
+    stop: int
+
+    def __post_init__(self):
+        # raised while validating a request, so a bad time is a 422 rather than a failed solve
+        if hhmm_to_minutes(self.start) >= hhmm_to_minutes(self.stop):
+            raise ValueError(f"start {self.start} should be before stop {self.stop}")
+
+
+class OptimizationTarget(Enum):
+    UNKNOWN = 0
+    CoursesTaken = 1
+    DaysOnCampus = 2
+    TimeOnCampus = 3
+
+
+class SectionAvailability(Enum):
+    # each level is stricter than the one before it
+    ALL = 0
+    OPEN = 1
+    SEATS_OR_WAITLIST = 2
+    SEATS = 3
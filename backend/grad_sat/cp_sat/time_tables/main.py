@@ -1,5 +1,5 @@
 import json
-from typing import Generator
+from typing import Generator, Optional
 
 from sqlalchemy import select
 
@@ -12,7 +12,9 @@ from grad_sat.cp_sat.time_tables.model import (
     TTFilterConstraint,
     OptimizationTarget,
     TTSolution,
+    SearchCancellation,
 )
+from grad_sat.cp_sat.time_tables.section_store import SectionStore
 
 from grad_sat.db.database import get_db, create_url
 
@@ -42,23 +44,32 @@ def read_data_from_disk(path: str) -> ListOfMinimumClassInfo:
 # recursive impl where i exclude 1 course, then 2, then 3... would be better i think
 def generate_multiple_optimal_schedules(
         problem_instance: TTProblemInstance,
+        cancellation: Optional[SearchCancellation] = None,
+        seen: Optional[list[list[str]]] = None,
 ) -> Generator[TTSolution, None, None]:
     already_excluded_courses: set[str] = set()
     courses_to_exclude: set[str] = set()
     solutions_count: int = 0
     seen_solutions: dict[str, bool] = dict()  # sorted list of all crn's in schedule
 
+    # schedules an earlier run of this request already sent, explore from them again but don't resend them
+    for courses_taken in seen or []:
+        seen_solutions["_".join(sorted(courses_taken))] = True
+        courses_to_exclude.update(courses_taken)
+        solutions_count += 1
+
     # initial solve
-    solver = TTSolver(problem_instance=problem_instance)
+    solver = TTSolver(problem_instance=problem_instance, cancellation=cancellation)
     solution = solver.solve()
 
     # would i get duplicate solutions? idk (Adam Later: yes)
     if solution.status_ok:
-        solutions_count += 1
         solution_str = "_".join(sorted(solution.courses_taken))
         print(solution_str)
-        seen_solutions[solution_str] = True
-        yield solution
+        if solution_str not in seen_solutions:
+            solutions_count += 1
+            seen_solutions[solution_str] = True
+            yield solution
 
         new_courses = set(solution.courses_taken) - already_excluded_courses
         courses_to_exclude = courses_to_exclude.union(new_courses)
@@ -68,10 +79,13 @@ def generate_multiple_optimal_schedules(
             # solve again without that course being allowed
             course_to_exclude = courses_to_exclude.pop()
             print(f"excluding {course_to_exclude}")
-            solver = TTSolver(problem_instance=problem_instance)
+            solver = TTSolver(problem_instance=problem_instance, cancellation=cancellation)
             solver.exclude_course(course_to_exclude)
             solution = solver.solve()
 
+            if cancellation is not None and cancellation.cancelled:
+                return
+
             if solution.status_ok:
                 solution_str = "_".join(sorted(solution.courses_taken))
                 print(solution_str)
@@ -90,15 +104,43 @@ def generate_multiple_optimal_schedules(
         yield solution
 
 
+def generate_diverse_schedules(
+        problem_instance: TTProblemInstance,
+        k: int,
+        min_course_difference: int = 1,
+        objective_gap: float = 0.0,
+        cancellation: Optional[SearchCancellation] = None,
+        seen: Optional[list[list[str]]] = None,
+) -> Generator[TTSolution, None, None]:
+    # top-k on a single model, each schedule is cut off from the next solve
+    solver = TTSolver(problem_instance=problem_instance, cancellation=cancellation)
+    yield from solver.solve_top_k(
+        k=k,
+        min_course_difference=min_course_difference,
+        objective_gap=objective_gap,
+        seen=seen,
+    )
+
+
+def generate_pareto_front(
+        problem_instance: TTProblemInstance,
+        include_courses_taken: bool = False,
+        cancellation: Optional[SearchCancellation] = None,
+) -> Generator[TTSolution, None, None]:
+    solver = TTSolver(problem_instance=problem_instance, cancellation=cancellation)
+    yield from solver.solve_pareto(include_courses_taken=include_courses_taken)
+
+
 if __name__ == "__main__":
     course_list = read_data_from_disk("../reduced_info.json")
     # course_list = read_data_from_db()
     print(course_list.lomci[:5])
 
     course_list = read_data_from_disk("data.json")
+    section_store = SectionStore(course_list.lomci)
 
     problem_instance = TTProblemInstance(
-        courses=course_list.lomci,
+        section_store=section_store,
         forced_conflicts=[],
         filter_constraints=[
             TTFilterConstraint(course_codes=["CSCI4060U", "PHY3900U"], eq=2),
@@ -120,7 +162,7 @@ if __name__ == "__main__":
     solutions = []
     # enumerate all should find 2 possible schdules with  just csci4060u but it doesnt!
     problem_instance = TTProblemInstance(
-        courses=course_list.lomci,
+        section_store=section_store,
         forced_conflicts=[],
         filter_constraints=[
             TTFilterConstraint(course_codes=["CSCI4060U", "PHY3900U"], eq=2),
@@ -137,7 +179,7 @@ if __name__ == "__main__":
     # try to exclude all courses that were taken to generate more possibilities on following solves (1 layer deep)
     for course in solution.courses_taken:
         problem_instance = TTProblemInstance(
-            courses=course_list.lomci,
+            section_store=section_store,
             forced_conflicts=[],
             filter_constraints=[
                 TTFilterConstraint(course_codes=["CSCI4060U", "PHY3900U"], eq=2),
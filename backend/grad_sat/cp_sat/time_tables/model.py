@@ -1,57 +1,51 @@
+import math
 import os
+import threading
+import time
 from collections import defaultdict, namedtuple
 from dataclasses import dataclass, field
-from enum import Enum
-from typing import Optional
-
-from pydantic import BaseModel
+from typing import Generator, Optional
 
 import numpy as np
 import pandas as pd
 from ortools.sat.python import cp_model
 
-from grad_sat.scraper.models import MinimumClassInfo
-from grad_sat.cp_sat.v2.dependent_variables import (
-    false_var,
-    zero_int,
-    empty_interval,
-    are_all_true,
-    create_optional_interval_variable,
-    true_var,
+from grad_sat.cp_sat.time_tables.inputs import (
+    ForcedConflict,
+    OptimizationTarget,
+    SectionAvailability,
+    TTFilterConstraint,
 )
-from grad_sat.cp_sat.v2.util import print_statistics
-
-
-@dataclass
-class TTFilterConstraint:
-    course_codes: Optional[list[str]] = None
-    subjects: Optional[list[str]] = None
-    year_levels: Optional[list[int]] = None
-
-    lte: int = None
-    gte: int = None
-    eq: int = None
-
-
-@dataclass
-class ForcedConflict:
-    day: str
-    start: int
-    stop: int
-
-
-class OptimizationTarget(Enum):
-    UNKNOWN = 0
-    CoursesTaken = 1
-    DaysOnCampus = 2
-    TimeOnCampus = 3
+from grad_sat.cp_sat.time_tables.section_store import SectionStore
+from grad_sat.cp_sat.time_tables.time_grid import hhmm_to_minutes, minutes_to_hhmm
+from grad_sat.cp_sat.time_tables.responses import (
+    TTCourse,
+    TTGenerateResponse,
+    TTStageResult,
+    NO_SOLUTION_JSON,
+    generate_response_json,
+)
+from grad_sat.cp_sat.v2.util import PhaseTimer, print_statistics
 
 
 class TTSolution:
-    def __init__(self, courses_taken: list[str], courses: pd.DataFrame, status: any):
+    def __init__(
+        self,
+        courses_taken: list[str],
+        courses: pd.DataFrame,
+        status: any,
+        section_store: Optional[SectionStore] = None,
+        section_availability: SectionAvailability = SectionAvailability.ALL,
+    ):
         self.courses_taken = courses_taken
         self.courses = courses
         self.status = status
+        self.section_store = section_store
+        # reported crns are the first ones meeting this level
+        self.section_availability = section_availability
+        self.stages: list[TTStageResult] = []
+        # target name -> value, set for pareto front schedules
+        self.objective_values: dict[str, int] = dict()
 
     @property
     def status_ok(self) -> bool:
@@ -94,76 +88,85 @@ class TTSolution:
 
         return buf
 
-    def response(self):
-        class Course(BaseModel):
-            crn: int
-            name: str
-            meeting_type: str
-            start_time: Optional[int]
-            end_time: Optional[int]
+    def response(self) -> TTGenerateResponse:
+        if not self.status_ok:
+            return TTGenerateResponse(courses=dict(), found_solution=False)
 
-        class GenerateResponse(BaseModel):
-            courses: dict[str, list[Course]]
-            found_solution: bool
+        res: dict[str, list[TTCourse]] = defaultdict(list)
+        available = self.section_store.available_meeting_records[self.section_availability]
+        for course_nid in self.courses_taken:
+            records = available.get(course_nid) or self.section_store.meeting_records[course_nid]
+            for day, record in records:
+                res[day].append(record)
 
-        if self.status in [
-            cp_model.UNKNOWN,
-            cp_model.INFEASIBLE,
-            cp_model.MODEL_INVALID,
-        ]:
-            return GenerateResponse(courses=dict(), found_solution=False)
+        # records were validated when the store was built
+        return TTGenerateResponse.model_construct(
+            courses=res, found_solution=True, stages=self.stages
+        )
 
-        res: dict[str, list[Course]] = defaultdict(list)
+    def response_json(self) -> str:
+        # same as response().model_dump_json() without going through pydantic, used when streaming
+        if not self.status_ok:
+            return NO_SOLUTION_JSON
 
+        res: dict[str, list[str]] = defaultdict(list)
+        available = self.section_store.available_meeting_records_json[self.section_availability]
         for course_nid in self.courses_taken:
-            course_info = self.courses.loc[course_nid]
-            for meeting_time in course_info["meeting_times"]:
-                res[meeting_time.day_of_week()].append(
-                    Course(
-                        crn=course_info["id"],
-                        name=course_info["class_code"],
-                        meeting_type=course_info["type"],
-                        end_time=meeting_time.end_time,
-                        start_time=meeting_time.begin_time,
-                    )
-                )
+            records = available.get(course_nid) or self.section_store.meeting_records_json[course_nid]
+            for day, record in records:
+                res[day].append(record)
+
+        return generate_response_json(res, self.stages)
+
+
+class SearchCancellation:
+    """
+    shared between a thread running solves and whoever wants them stopped,
+    cancelling stops the in-flight search and every solve after it returns without searching.
+    """
 
-        print(res)
-        return GenerateResponse(courses=res, found_solution=True)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._solver: Optional[cp_model.CpSolver] = None
+        self.cancelled = False
+
+    def register(self, solver: cp_model.CpSolver):
+        with self._lock:
+            self._solver = solver
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._solver is not None:
+                self._solver.stop_search()
 
 
 class TTProblemInstance:
     def __init__(
         self,
-        courses: list[MinimumClassInfo],
+        section_store: SectionStore,
         forced_conflicts: list[ForcedConflict],
         filter_constraints: list[TTFilterConstraint],
         optimization_target: OptimizationTarget,
+        secondary_optimization_targets: Optional[list[OptimizationTarget]] = None,
+        lexicographic_tolerance: float = 0.0,
+        section_availability: SectionAvailability = SectionAvailability.ALL,
     ):
-
-        self.courses = self.__init_courses(courses)
+        self.section_store = section_store
+        self.courses = section_store.courses
+        self.section_alternatives = section_store.section_alternatives
         self.forced_conflicts: list[ForcedConflict] = forced_conflicts
         self.filter_constraints: list[TTFilterConstraint] = filter_constraints
         self.optimization_target = optimization_target
 
-    @staticmethod
-    def __init_courses(courses: list[MinimumClassInfo]):
-        index = []
-        variables = []
-        columns = [
-            "id",
-            "class_code",
-            "type",
-            "subject",
-            "meeting_times",
-            "linked_sections",
-        ]
-
-        for course in courses:
-            variables.append([getattr(course, col) for col in columns])
-            index.append(course.info_id())
+        # optimized in order after the primary target, each stage keeps the previous ones within tolerance
+        self.secondary_optimization_targets: list[OptimizationTarget] = (
+            secondary_optimization_targets or []
+        )
+        self.lexicographic_tolerance = lexicographic_tolerance
 
-        return pd.DataFrame(variables, index=index, columns=columns)
+        # sections that don't meet this (closed, full, ...) are culled before the model is built
+        self.section_availability = section_availability
 
     def add_forced_conflict(self, start: int, end: int, day: str):
         assert 0 <= start <= 2359, "start should be between 0 and 2359 (24 hour clock)"
@@ -186,9 +189,21 @@ class TTProblemInstance:
 
 
 class TTDependantVariables:
-    def __init__(self, model: cp_model.CpModel, courses: pd.DataFrame):
-        # meta
-        self.__courses = courses
+    def __init__(
+        self,
+        model: cp_model.CpModel,
+        section_store: SectionStore,
+        course_nids: Optional[list[str]] = None,
+    ):
+        # meta, variables are only made for course_nids (every section when not given)
+        self.__course_nids = (
+            section_store.courses.index.tolist() if course_nids is None else course_nids
+        )
+        self.__meetings = section_store.meetings
+        if course_nids is not None:
+            self.__meetings = self.__meetings[
+                self.__meetings["course_nid"].isin(course_nids)
+            ]
         self.__model = model
         self.courses_on_day = self.__init_courses_on_day()
 
@@ -202,6 +217,7 @@ class TTDependantVariables:
             self.__init_have_courses_on_day()
         )
 
+        # all in minutes since midnight
         self.day_starts: dict[str, cp_model.IntVar] = self.__init_day_starts()
         self.day_ends: dict[str, cp_model.IntVar] = self.__init_day_ends()
         self.day_to_time_on_campus: dict[str, cp_model.IntVar] = (
@@ -211,7 +227,7 @@ class TTDependantVariables:
     def _init_unknown_variables(self) -> dict[str, cp_model.BoolVarT]:
         course_taken = dict()
 
-        for i, course_info_id in enumerate(self.__courses.index):
+        for course_info_id in self.__course_nids:
             course_taken[course_info_id] = self.__model.new_bool_var(
                 f"{course_info_id}_taken?"
             )
@@ -220,57 +236,27 @@ class TTDependantVariables:
 
     def _init_interval_variables(self) -> pd.DataFrame:
         new_rows = []
-        index = []
         columns = ["start", "end", "interval", "day_of_week"]
 
-        for row_index, row in self.__courses.iterrows():
-            if len(row["meeting_times"]) == 0:
-                index.append(row_index)
-
-                # start, end, interval (d_vars) day of week (str)
-                new_rows.append(
-                    [
-                        zero_int(self.__model),
-                        zero_int(self.__model),
-                        empty_interval(
-                            self.__model, is_present=false_var(self.__model)
-                        ),
-                        "NA",
-                    ]
-                )
-
-            else:
-                for j, meeting_time in enumerate(row["meeting_times"]):
-                    index.append(row_index)
-
-                    curr_course_was_taken = self.course_was_taken[str(row_index)]
-                    start, end, interval = create_optional_interval_variable(
-                        model=self.__model,
-                        start=meeting_time.begin_time,
-                        end=meeting_time.end_time,
-                        enforce=curr_course_was_taken,
-                        name=str(row_index),
-                    )
-
-                    new_rows.append([start, end, interval, meeting_time.day_of_week()])
+        for course_nid, day, start, end in self.__meetings.itertuples(index=False):
+            # fixed start/size, only present if the course is taken
+            interval = self.__model.new_optional_fixed_size_interval_var(
+                start=start,
+                size=end - start,
+                is_present=self.course_was_taken[course_nid],
+                name=f"{course_nid}_{day}_{start}",
+            )
+            new_rows.append([start, end, interval, day])
 
-        return pd.DataFrame(data=new_rows, columns=columns, index=index)
+        return pd.DataFrame(
+            data=new_rows, columns=columns, index=self.__meetings["course_nid"].values
+        )
 
     def __init_courses_on_day(self) -> dict[str, list[str]]:
-        courses_scheduled_on_day: dict[str, list[str]] = defaultdict(list)
-
-        for idx, row in self.__courses.iterrows():
-            for mt in row["meeting_times"]:
-                if mt.monday:
-                    courses_scheduled_on_day["monday"].append(str(idx))
-                if mt.tuesday:
-                    courses_scheduled_on_day["tuesday"].append(str(idx))
-                if mt.wednesday:
-                    courses_scheduled_on_day["wednesday"].append(str(idx))
-                if mt.thursday:
-                    courses_scheduled_on_day["thursday"].append(str(idx))
-                if mt.friday:
-                    courses_scheduled_on_day["friday"].append(str(idx))
+        courses_scheduled_on_day: dict[str, list[str]] = dict()
+
+        for day, meetings in self.__meetings.groupby("day_of_week"):
+            courses_scheduled_on_day[day] = meetings["course_nid"].unique().tolist()
 
         return courses_scheduled_on_day
 
@@ -291,48 +277,38 @@ class TTDependantVariables:
 
         return res
 
-    def __init_day_starts(self):
-        # day -> int of its start date
+    def __init_day_starts(self) -> dict[str, cp_model.IntVar]:
+        # day -> earliest start of a taken meeting that day.
+        # only bounded from above (start <= every taken meeting), minimizing time on campus pushes it up to the
+        # real start, and "time on campus <= x" constraints are exact with this encoding
         day_starts: dict[str, cp_model.IntVar] = dict()
-        for day, courses in self.courses_on_day.items():
-            day_start_var = self.__model.new_int_var(0, 2359, f"{day}_start")
-
-            # if a course isn't taken, say its taken at a really large number
-            start_times = []
-            for course in courses:
-                stv = self.__model.new_int_var(0, 10_000, f"{course}_stv")
-
-                self.__model.add(
-                    stv == self.__courses.loc[course]["meeting_times"][0].begin_time
-                ).only_enforce_if(self.course_was_taken[course])
-                # NOTE: if I make this 10_000 we get valid but bad solutions, not sure why
-                self.__model.add(stv == 2359).only_enforce_if(
-                    ~self.course_was_taken[course]
-                )
-
-                start_times.append(stv)
+        for day, meetings in self.__meetings.groupby("day_of_week"):
+            first_meetings = meetings.groupby("course_nid")["start"].min()
 
-            # making bad assumptions here but I need to ship
-            self.__model.add_min_equality(day_start_var, start_times)
+            day_start_var = self.__model.new_int_var(
+                int(first_meetings.min()), int(first_meetings.max()), f"{day}_start"
+            )
+            for course_nid, start in first_meetings.items():
+                self.__model.add(day_start_var <= int(start)).only_enforce_if(
+                    self.course_was_taken[course_nid]
+                )
 
             day_starts[day] = day_start_var
 
         return day_starts
 
-    def __init_day_ends(self):
+    def __init_day_ends(self) -> dict[str, cp_model.IntVar]:
         day_ends: dict[str, cp_model.IntVar] = dict()
-        for day, courses in self.courses_on_day.items():
-            day_end_var = self.__model.new_int_var(0, 2359, f"{day}_end")
+        for day, meetings in self.__meetings.groupby("day_of_week"):
+            last_meetings = meetings.groupby("course_nid")["end"].max()
 
-            # making bad assumptions here but I need to ship
-            self.__model.add_max_equality(
-                day_end_var,
-                [
-                    self.__courses.loc[course]["meeting_times"][0].end_time
-                    * self.course_was_taken[course]
-                    for course in courses
-                ],
+            day_end_var = self.__model.new_int_var(
+                int(last_meetings.min()), int(last_meetings.max()), f"{day}_end"
             )
+            for course_nid, end in last_meetings.items():
+                self.__model.add(day_end_var >= int(end)).only_enforce_if(
+                    self.course_was_taken[course_nid]
+                )
 
             day_ends[day] = day_end_var
 
@@ -341,10 +317,12 @@ class TTDependantVariables:
     def __init_time_on_campus(self) -> dict[str, cp_model.IntVar]:
         res = dict()
 
-        for day_of_week in ["monday", "tuesday", "wednesday", "thursday", "friday"]:
+        for day_of_week in self.day_starts.keys():
             start, end = self.day_starts[day_of_week], self.day_ends[day_of_week]
             time_on_campus_var = self.__model.new_int_var(
-                0, 2359, f"{day_of_week}_time_on_campus"
+                0,
+                end.proto.domain[-1] - start.proto.domain[0],
+                f"{day_of_week}_time_on_campus",
             )
 
             self.__model.add(time_on_campus_var == end - start).only_enforce_if(
@@ -365,19 +343,34 @@ class TTSolver:
         self,
         problem_instance: TTProblemInstance,
         enumerate_all_solutions=None,
+        cancellation: Optional[SearchCancellation] = None,
     ):
         self.model = cp_model.CpModel()
         self.solver = cp_model.CpSolver()
         self.problem_instance = problem_instance
         self.enumerate_all_solutions = enumerate_all_solutions
+        self.cancellation = cancellation
+        self.objective = None
+        self.objective_vars: dict[OptimizationTarget, cp_model.IntVar] = dict()
+        self.timer = PhaseTimer()
+        # sections left out of the model, and the class codes the filters select (in request order)
+        self.culled_courses: set[str] = set()
+        self.selected_class_codes: list[str] = []
 
-        self.d_vars = TTDependantVariables(
-            model=self.model, courses=problem_instance.courses
-        )
+        # 2.7s -> .12s per solve with this turned on
+        with self.timer.phase("cull"):
+            candidates = self.pre_cull(self.problem_instance.filter_constraints)
 
-        self.forced_conflicts: dict[str, list[cp_model.IntervalVar]] = (
-            self.__init_forced_conflicts()
-        )
+        with self.timer.phase("variables"):
+            self.d_vars = TTDependantVariables(
+                model=self.model,
+                section_store=problem_instance.section_store,
+                course_nids=candidates,
+            )
+
+            self.forced_conflicts: dict[str, list[cp_model.IntervalVar]] = (
+                self.__init_forced_conflicts()
+            )
 
         self.callback = Callback(
             courses=self.problem_instance.courses, dvars=self.d_vars
@@ -386,10 +379,8 @@ class TTSolver:
         if enumerate_all_solutions:
             self.solver.parameters.enumerate_all_solutions = True
 
-        # 2.7s -> .12s per solve with this turned on
-        self.pre_cull(self.problem_instance.filter_constraints)
-
-        self._build_model()
+        with self.timer.phase("constraints"):
+            self._build_model()
 
     def add_no_overlap_constraint(self):
         # we cant take two classes that are scheduled for the same time
@@ -410,33 +401,32 @@ class TTSolver:
     def add_tmp_constraint(self):
         # need to remove though for async online and thesis courses
         # tmp constraint to ignore courses with no scheduling (sanity checks are easier)
-        for course in self.problem_instance.courses.index:
-            curr_course_was_taken = self.d_vars.course_was_taken[course]
-
-            if len(self.problem_instance.courses.loc[course]["meeting_times"]) == 0:
-                self.model.add(curr_course_was_taken == 0)
+        scheduled = set(self.problem_instance.section_store.meetings["course_nid"])
+        for course, course_taken in self.d_vars.course_was_taken.items():
+            if course not in scheduled:
+                self.model.add(course_taken == 0)
 
     def add_max_of_course_type_constraint(self):
-        duplicate_courses: list[list[str]] = list(
-            self.problem_instance.courses.groupby(["class_code", "type"]).apply(
-                lambda x: x.index.tolist()
-            )
-        )
+        course_groups = self.problem_instance.section_store.course_groups
 
         # CONSTRAINT: if a course is taken, the same course shouldn't be taken again
-        for courses in duplicate_courses:
-            self.model.add(
-                sum([self.d_vars.course_was_taken[course] for course in courses]) <= 1
-            )
+        for class_code in self.selected_codes():
+            for course_nids in course_groups[class_code].values():
+                available = [
+                    self.d_vars.course_was_taken[course_nid]
+                    for course_nid in course_nids
+                    if course_nid not in self.culled_courses
+                ]
+                if len(available) > 1:
+                    self.model.add_at_most_one(available)
 
     def __init_forced_conflicts(self) -> dict[str, list[cp_model.IntervalVar]]:
         fc_map = defaultdict(list)
         for fc in self.problem_instance.forced_conflicts:
-            _, _, interval_var = create_optional_interval_variable(
-                model=self.model,
-                start=fc.start,
-                end=fc.stop,
-                enforce=true_var(self.model),
+            start, stop = hhmm_to_minutes(fc.start), hhmm_to_minutes(fc.stop)
+            interval_var = self.model.new_fixed_size_interval_var(
+                start=start,
+                size=stop - start,
                 name=f"forced_conflict_s{fc.start}_e{fc.stop}_{fc.day}",
             )
 
@@ -445,89 +435,128 @@ class TTSolver:
         return fc_map
 
     def add_linked_sections_constraint(self):
-        course_id_to_course = dict(
-            zip(
-                self.problem_instance.courses["id"], self.problem_instance.courses.index
-            )
-        )
+        course_was_taken = self.d_vars.course_was_taken
+        # options are shared between sections (every lab of a course links the same lecture/tutorial pairs)
+        option_literals: dict[tuple[str, ...], cp_model.BoolVarT] = dict()
 
-        # if a course is taken, one of its linked sections (dnf) must be taken as well
-        for course_id, row in self.problem_instance.courses.iterrows():
-            if len(row["linked_sections"]) != 0:
-                course_taken = self.d_vars.course_was_taken[str(course_id)]
-
-                possible_linked_sections = []
-                for linked_section in row["linked_sections"]:
-                    linked_sections_taken = [
-                        self.d_vars.course_was_taken[course_id_to_course[course_id]]
-                        for course_id in linked_section
-                    ]
-
-                    possible_linked_sections.append(
-                        are_all_true(self.model, linked_sections_taken)
-                    )
+        def option_literal(option: tuple[str, ...]) -> cp_model.BoolVarT:
+            if len(option) == 1:
+                return course_was_taken[option[0]]
 
-                # we're not going to take a lab twice, take it once
-                self.model.add_at_least_one(possible_linked_sections).only_enforce_if(
-                    course_taken
-                )
-                # self.model.add(sum(possible_linked_sections) == 1).only_enforce_if(
-                #     course_taken
-                # )
+            if option not in option_literals:
+                # option picked => all of its sections are taken (the other direction isn't needed)
+                option_taken = self.model.new_bool_var("")
+                self.model.add_bool_and(
+                    [course_was_taken[course_nid] for course_nid in option]
+                ).only_enforce_if(option_taken)
+                option_literals[option] = option_taken
 
-    def collect_filtered_variables(self, f: TTFilterConstraint):
-        df = self.problem_instance.courses
-        mask = pd.Series(True, index=df.index)
+            return option_literals[option]
 
-        # only Lectures for now, maybe add CRN filter
-        mask &= df["type"] == "Lecture"
+        # if a course is taken, one of its linked sections (dnf) must be taken as well
+        linked_groups = self.problem_instance.section_store.linked_groups
+        for course_nid in list(course_was_taken):
+            if course_nid not in linked_groups:
+                continue
+
+            # options with a section outside the model can't be met
+            options = [
+                option
+                for option in linked_groups[course_nid]
+                if all(linked in course_was_taken for linked in option)
+            ]
+
+            if len(options) == 0:
+                self.model.add(course_was_taken[course_nid] == 0)
+                continue
+
+            self.model.add_bool_or(
+                [option_literal(option) for option in options]
+            ).only_enforce_if(course_was_taken[course_nid])
+
+    def selected_codes(self) -> list[str]:
+        # class codes the filters select, everything else was culled
+        return self.selected_class_codes
+
+    def matching_codes(self, f: TTFilterConstraint) -> Optional[list[str]]:
+        # class codes meeting every criteria the filter sets, None if it doesn't set any
+        store = self.problem_instance.section_store
+        class_codes: Optional[list[str]] = None
+
+        def narrow(matches: list[str]) -> list[str]:
+            if class_codes is None:
+                return matches
+            matches = set(matches)
+            return [class_code for class_code in class_codes if class_code in matches]
 
         if f.course_codes:
-            mask &= df["class_code"].isin(f.course_codes)
-        if f.year_levels:
-            # TODO: need to add this to min course info scrape
-            pass
+            class_codes = [
+                class_code
+                for class_code in dict.fromkeys(f.course_codes)
+                if class_code in store.course_groups
+            ]
         if f.subjects:
-            mask &= df["subject"].isin(f.subjects)
+            class_codes = narrow(
+                [
+                    class_code
+                    for subject in dict.fromkeys(f.subjects)
+                    for class_code in store.codes_by_subject.get(subject, [])
+                ]
+            )
+        if f.year_levels:
+            class_codes = narrow(
+                [
+                    class_code
+                    for level in dict.fromkeys(f.year_levels)
+                    for class_code in store.codes_by_year_level.get(level, [])
+                ]
+            )
 
-        course_nids = df[mask].index.tolist()
+        return class_codes
+
+    def collect_filtered_variables(self, f: TTFilterConstraint):
+        store = self.problem_instance.section_store
+
+        class_codes = self.matching_codes(f)
+        if class_codes is None:
+            class_codes = self.selected_codes()
 
         res = []
-        for course_nid in course_nids:
-            res.append(self.d_vars.course_was_taken[course_nid])
+        for class_code in class_codes:
+            # only Lectures for now, maybe add CRN filter
+            for course_nid in store.course_groups[class_code].get("Lecture", []):
+                # culled sections aren't in the model
+                if course_nid not in self.culled_courses:
+                    res.append(self.d_vars.course_was_taken[course_nid])
 
         return res
 
-    # TODO: think if i should use this or not
-    def pre_cull(self, filters: list[TTFilterConstraint]):
-        valid_subjects = set()
+    def pre_cull(self, filters: list[TTFilterConstraint]) -> list[str]:
+        """
+        sections of the class codes some filter selects (every type, so linked labs/tutorials come along),
+        minus the ones that don't meet the requested availability. only these get variables,
+        everything else is recorded in culled_courses.
+        """
+        store = self.problem_instance.section_store
 
-        # TODO: year levels
+        selected: dict[str, None] = dict()
         for f in filters:
-            if f.course_codes is not None:
-                for cc in f.course_codes:
-                    buf = ""
-                    pos = 0
-                    while not cc[pos].isnumeric():
-                        buf += cc[pos]
-                        pos += 1
-
-                    valid_subjects.add(buf)
-            if f.subjects is not None:
-                for subj in f.subjects:
-                    valid_subjects.add(subj)
-
-        df = self.problem_instance.courses
-        mask = pd.Series(True, index=df.index)
-        mask &= ~df["subject"].isin(list(valid_subjects))
-
-        course_nids = df[mask].index.tolist()
-        res = []
-        for course_nid in course_nids:
-            res.append(self.d_vars.course_was_taken[course_nid])
+            for class_code in self.matching_codes(f) or []:
+                selected[class_code] = None
+        self.selected_class_codes = list(selected)
+
+        # closed/full sections, precomputed per availability level
+        unavailable = store.unavailable_sections[self.problem_instance.section_availability]
+
+        candidates = [
+            course_nid
+            for class_code in self.selected_class_codes
+            for course_nid in store.sections_by_code[class_code]
+            if course_nid not in unavailable
+        ]
+        self.culled_courses = set(store.courses.index).difference(candidates)
 
-        # user didn't specify these, so we shouldn't take them
-        self.model.add(sum(res) == 0)
+        return candidates
 
     def add_filter_constraints(self):
         for fc in self.problem_instance.filter_constraints:
@@ -546,6 +575,8 @@ class TTSolver:
         assert (
             "_" in course_nid
         ), "course_nid invalid expected format: UNSP1111U_TYPE_CRN"
+        if course_nid in self.culled_courses:
+            return
         course_taken = self.d_vars.course_was_taken[course_nid]
         self.model.add(course_taken == 0)
 
@@ -559,31 +590,318 @@ class TTSolver:
     def _build_model(self):
         self._add_constraints()
 
-        match self.problem_instance.optimization_target:
+        self.set_optimization_target(self.problem_instance.optimization_target)
+
+    def objective_expression(self, target: OptimizationTarget):
+        match target:
             case OptimizationTarget.CoursesTaken:
-                self.model.minimize(sum(self.d_vars.course_was_taken.values()))
+                return sum(self.d_vars.course_was_taken.values())
             case OptimizationTarget.DaysOnCampus:
-                self.model.minimize(sum(self.d_vars.course_was_taken.values()))
-                self.minimize_days_on_campus()
+                return sum(self.d_vars.have_courses_on_day.values())
             case OptimizationTarget.TimeOnCampus:
-                self.minimize_course_gap()
+                # time on campus is sort of a proxy for course gap
+                return sum(self.d_vars.day_to_time_on_campus.values())
             case _:
-                print("unhandled optimization target")
+                return None
+
+    def set_optimization_target(self, target: OptimizationTarget):
+        # NOTE: minimize replaces the previous objective, it doesn't add to it
+        self.objective = self.objective_expression(target)
+        if self.objective is None:
+            print("unhandled optimization target")
+            return
+
+        self.model.minimize(self.objective)
+
+    def solve_lexicographic(self) -> TTSolution:
+        """
+        optimize the primary target, bound it (within lexicographic_tolerance), then optimize the
+        next target on the same model hinted with the previous schedule.
+        """
+        targets = [
+            self.problem_instance.optimization_target,
+            *self.problem_instance.secondary_optimization_targets,
+        ]
+        tolerance = self.problem_instance.lexicographic_tolerance
+
+        stages: list[TTStageResult] = []
+        solution: Optional[TTSolution] = None
+        best_solution: Optional[TTSolution] = None
+        for target in targets:
+            self.set_optimization_target(target)
+            if self.objective is None:
+                continue
+
+            if best_solution is not None:
+                self.model.clear_hints()
+                taken = set(best_solution.courses_taken)
+                for course_nid, var in self.d_vars.course_was_taken.items():
+                    self.model.add_hint(var, course_nid in taken)
+
+            start = time.perf_counter()
+            solution = self.solve()
+            wall_time = time.perf_counter() - start
+
+            if not solution.status_ok:
+                print(f"lexicographic stage {target.name} failed: {self.solver.status_name()}")
+                break
+
+            best = round(self.solver.objective_value)
+            stages.append(
+                TTStageResult(
+                    target=target.name,
+                    objective_value=best,
+                    wall_time=wall_time,
+                    status=self.solver.status_name(),
+                )
+            )
+            best_solution = solution
+
+            # following stages can't make this target worse than the tolerance
+            self.model.add(self.objective <= math.floor(best + tolerance * abs(best)))
+
+        if best_solution is None:
+            return solution if solution is not None else self.solve()
+
+        best_solution.stages = stages
+        return best_solution
+
+    def objective_var(self, target: OptimizationTarget) -> cp_model.IntVar:
+        # int var equal to the target's objective, bounded by editing its domain so bounds can be undone
+        if target not in self.objective_vars:
+            match target:
+                case OptimizationTarget.CoursesTaken:
+                    upper_bound = len(self.d_vars.course_was_taken)
+                case OptimizationTarget.DaysOnCampus:
+                    upper_bound = len(self.d_vars.have_courses_on_day)
+                case _:
+                    upper_bound = sum(
+                        var.proto.domain[-1]
+                        for var in self.d_vars.day_to_time_on_campus.values()
+                    )
+
+            var = self.model.new_int_var(0, upper_bound, f"{target.name}_objective")
+            self.model.add(var == self.objective_expression(target))
+            self.objective_vars[target] = var
+
+        return self.objective_vars[target]
+
+    @staticmethod
+    def _set_domain(var: cp_model.IntVar, lb: int, ub: int):
+        var.proto.domain[:] = [lb, ub]
+
+    def _solve_lexicographic_point(
+        self, targets: list[OptimizationTarget]
+    ) -> tuple[Optional[TTSolution], dict[str, int]]:
+        # minimize targets in order, each one temporarily fixed to its optimum while the next is solved
+        fixed: list[tuple[cp_model.IntVar, list[int]]] = []
+        solution, values = None, dict()
+        try:
+            for target in targets:
+                var = self.objective_var(target)
+                self.model.minimize(var)
+                solution = self.solve()
+                if not solution.status_ok or self.solver.status_name() != "OPTIMAL":
+                    return None, values
+
+                values[target.name] = round(self.solver.objective_value)
+                fixed.append((var, list(var.proto.domain)))
+                self._set_domain(var, values[target.name], values[target.name])
+        finally:
+            for var, domain in fixed:
+                var.proto.domain[:] = domain
+
+        return solution, values
+
+    def solve_pareto(
+        self, include_courses_taken: bool = False, max_points: int = 25
+    ) -> Generator[TTSolution, None, None]:
+        """
+        pareto front of (days on campus, time on campus[, courses taken]) with epsilon-constraint sweeps,
+        time on campus is minimized while days (and courses) are bounded above, sweeping the bounds up.
+        every point is tie-broken lexicographically so it's non-dominated, and yielded as soon as it's proven.
+        one model is reused, bounds are domain edits on the objective variables.
+        """
+        epsilon_targets = [OptimizationTarget.DaysOnCampus]
+        if include_courses_taken:
+            epsilon_targets.append(OptimizationTarget.CoursesTaken)
+        targets = [OptimizationTarget.TimeOnCampus, *epsilon_targets]
+
+        # range of each bounded objective, from its own minimum up to its value at the time optimum
+        ranges: list[range] = []
+        for target in epsilon_targets:
+            lowest, lowest_values = self._solve_lexicographic_point([target])
+            if lowest is None:
+                yield self.solve()
+                return
+            low = lowest_values[target.name]
+
+            _, time_optimal = self._solve_lexicographic_point(
+                [OptimizationTarget.TimeOnCampus, target]
+            )
+            high = time_optimal.get(target.name, low)
+            ranges.append(range(low, max(low, high) + 1))
+
+        epsilon_vars = [self.objective_var(target) for target in epsilon_targets]
+        original_domains = [list(var.proto.domain) for var in epsilon_vars]
+
+        def bounds(i: int):
+            if i == len(ranges):
+                yield []
+                return
+            for bound in ranges[i]:
+                for rest in bounds(i + 1):
+                    yield [bound, *rest]
+
+        front: list[dict[str, int]] = []
+        seen_schedules: set[tuple[str, ...]] = set()
+        try:
+            for epsilon in bounds(0):
+                if len(front) >= max_points:
+                    return
+                if self.cancellation is not None and self.cancellation.cancelled:
+                    return
+
+                for var, domain, bound in zip(epsilon_vars, original_domains, epsilon):
+                    self._set_domain(var, domain[0], bound)
+
+                solution, values = self._solve_lexicographic_point(targets)
+                if solution is None:
+                    continue
+
+                schedule = tuple(sorted(solution.courses_taken))
+                dominated = any(
+                    all(point[name] <= values[name] for name in values) for point in front
+                )
+                if schedule in seen_schedules or dominated:
+                    continue
+
+                seen_schedules.add(schedule)
+                front.append(values)
+                solution.objective_values = values
+                yield solution
+        finally:
+            for var, domain in zip(epsilon_vars, original_domains):
+                var.proto.domain[:] = domain
+
+    def _init_course_code_taken(self) -> dict[str, cp_model.BoolVarT]:
+        # course level (not section level) taken vars, culled courses can never be taken so skip them
+        sections_by_code = self.problem_instance.section_store.sections_by_code
+
+        res: dict[str, cp_model.BoolVarT] = dict()
+        for class_code in self.selected_codes():
+            course_nids = [
+                course_nid
+                for course_nid in sections_by_code[class_code]
+                if course_nid not in self.culled_courses
+            ]
+            if len(course_nids) == 0:
+                continue
+
+            code_taken = self.model.new_bool_var(f"{class_code}_taken?")
+            self.model.add_max_equality(
+                code_taken,
+                [self.d_vars.course_was_taken[course_nid] for course_nid in course_nids],
+            )
+            res[class_code] = code_taken
 
-    def minimize_days_on_campus(self):
-        self.model.minimize(sum(self.d_vars.have_courses_on_day.values()))
+        return res
+
+    def add_diversity_cut(
+        self,
+        courses_taken: list[str],
+        code_taken: dict[str, cp_model.BoolVarT],
+        min_course_difference: int,
+    ):
+        if min_course_difference <= 0:
+            # only ask for a different set of sections (no-good cut)
+            taken = set(courses_taken)
+            self.model.add_bool_or(
+                [
+                    ~var if course_nid in taken else var
+                    for course_nid, var in self.d_vars.course_was_taken.items()
+                    if course_nid not in self.culled_courses
+                ]
+            )
+            return
+
+        taken_codes = set(self.problem_instance.courses.loc[courses_taken]["class_code"])
 
-    def minimize_course_gap(self):
-        # time on campus is sort of a proxy for course gap
-        self.model.minimize(sum(self.d_vars.day_to_time_on_campus.values()))
+        # hamming distance over courses: courses dropped + courses added >= D
+        self.model.add(
+            sum(
+                (1 - var) if class_code in taken_codes else var
+                for class_code, var in code_taken.items()
+            )
+            >= min_course_difference
+        )
+
+    def solve_top_k(
+        self,
+        k: int,
+        min_course_difference: int = 1,
+        objective_gap: float = 0.0,
+        seen: Optional[list[list[str]]] = None,
+    ) -> Generator["TTSolution", None, None]:
+        """
+        yields up to k schedules within objective_gap (relative) of the optimal objective,
+        each differing from every other by at least min_course_difference courses.
+        one model is reused, every solve just adds cuts.
+
+        seen are schedules an earlier run of the same request already produced, they count towards k
+        and are cut off up front instead of being found (and yielded) again.
+        """
+        seen = list(seen or [])
+        solution = self.solve()
+
+        seen_schedules = {tuple(sorted(courses_taken)) for courses_taken in seen}
+        first_is_new = tuple(sorted(solution.courses_taken)) not in seen_schedules
+        if first_is_new or not solution.status_ok:
+            yield solution
+
+        if not solution.status_ok:
+            return
+
+        if self.objective is not None:
+            best = round(self.solver.objective_value)
+            self.model.add(self.objective <= math.floor(best + objective_gap * abs(best)))
+
+        code_taken = self._init_course_code_taken()
+        previous = list(seen)
+        if first_is_new:
+            previous.append(solution.courses_taken)
+
+        for courses_taken in previous:
+            self.add_diversity_cut(courses_taken, code_taken, min_course_difference)
+        solutions_count = len(previous)
+
+        while solutions_count < k:
+            solution = self.solve()
+
+            if self.cancellation is not None and self.cancellation.cancelled:
+                return
+
+            if not solution.status_ok:
+                print(f"no more schedules within gap after {solutions_count}")
+                return
+
+            solutions_count += 1
+            yield solution
+            self.add_diversity_cut(solution.courses_taken, code_taken, min_course_difference)
 
     def solve(self) -> TTSolution:
+        if self.cancellation is not None:
+            self.cancellation.register(self.solver)
+            if self.cancellation.cancelled:
+                return TTSolution(courses=pd.DataFrame(), courses_taken=[], status=cp_model.UNKNOWN)
+
         # status = self.cp_sat.solve(self.model)
         status = -1
-        if self.enumerate_all_solutions:
-            status = self.solver.solve(self.model, self.callback)
-        else:
-            status = self.solver.solve(self.model)
+        with self.timer.phase("solve"):
+            if self.enumerate_all_solutions:
+                status = self.solver.solve(self.model, self.callback)
+            else:
+                status = self.solver.solve(self.model)
 
         if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
             if status == cp_model.OPTIMAL:
@@ -610,17 +928,19 @@ class TTSolver:
 
                 print(
                     k,
-                    start_var,
-                    end_var,
-                    toc,
+                    minutes_to_hhmm(start_var),
+                    minutes_to_hhmm(end_var),
+                    f"{toc}m",
                 )
 
-            print("TTOC:", ttoc)
+            print("TTOC:", f"{ttoc}m")
 
             return TTSolution(
                 courses=self.problem_instance.courses,
                 courses_taken=taken,
                 status=status,
+                section_store=self.problem_instance.section_store,
+                section_availability=self.problem_instance.section_availability,
             )
         else:
             return TTSolution(courses=pd.DataFrame(), courses_taken=[], status=status)
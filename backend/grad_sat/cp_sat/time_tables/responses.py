@@ -0,0 +1,40 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class TTCourse(BaseModel):
+    crn: int
+    name: str
+    meeting_type: str
+    start_time: Optional[int]
+    end_time: Optional[int]
+    alternative_crns: list[int] = []
+
+
+class TTStageResult(BaseModel):
+    # one stage of a lexicographic solve
+    target: str
+    objective_value: int
+    wall_time: float
+    status: str
+
+
+class TTGenerateResponse(BaseModel):
+    courses: dict[str, list[TTCourse]]
+    found_solution: bool
+    stages: list[TTStageResult] = []
+
+
+NO_SOLUTION_JSON = TTGenerateResponse(courses=dict(), found_solution=False).model_dump_json()
+
+
+def generate_response_json(
+    courses_on_day: dict[str, list[str]], stages: list[TTStageResult]
+) -> str:
+    # same output as TTGenerateResponse.model_dump_json, from already serialised TTCourse's
+    days = ",".join(
+        f'"{day}":[{",".join(courses)}]' for day, courses in courses_on_day.items()
+    )
+    stages_json = ",".join(stage.model_dump_json() for stage in stages)
+    return f'{{"courses":{{{days}}},"found_solution":true,"stages":[{stages_json}]}}'
@@ -0,0 +1,251 @@
+from collections import defaultdict
+
+import pandas as pd
+
+from grad_sat.scraper.models import MinimumClassInfo
+from grad_sat.cp_sat.time_tables.inputs import SectionAvailability
+from grad_sat.cp_sat.time_tables.responses import TTCourse
+from grad_sat.cp_sat.time_tables.symmetry import collapse_symmetric_sections
+from grad_sat.cp_sat.time_tables.time_grid import WEEK_DAYS, hhmm_to_minutes
+
+
+def year_level(class_code: str) -> int:
+    # first digit of the course number, CSCI3070U -> 3, 0 if there's no number
+    for char in class_code:
+        if char.isnumeric():
+            return int(char)
+    return 0
+
+
+def section_availability(course: MinimumClassInfo) -> SectionAvailability:
+    # strictest level a section meets, anything the scrape didn't record counts as available
+    if course.open_section is False:
+        return SectionAvailability.ALL
+
+    has_seats = course.seats_available is None or course.seats_available > 0
+    if has_seats:
+        return SectionAvailability.SEATS
+
+    has_waitlist = course.wait_available is None or course.wait_available > 0
+    if has_waitlist:
+        return SectionAvailability.SEATS_OR_WAITLIST
+
+    return SectionAvailability.OPEN
+
+
+class SectionStore:
+    """
+    everything about the term's sections that doesn't depend on a request, built once at catalog load
+    and shared (read only) by every TTProblemInstance.
+    """
+
+    def __init__(self, courses: list[MinimumClassInfo], collapse_symmetric: bool = True):
+        # crn -> strictest availability level it meets, alternatives can differ from their representative
+        self.crn_availability: dict[int, SectionAvailability] = {
+            course.id: section_availability(course) for course in courses
+        }
+
+        # representative crn -> interchangeable crns
+        self.section_alternatives: dict[int, list[int]] = dict()
+        if collapse_symmetric:
+            # solve over one section per group of identical sections, expanded again in the response
+            courses, self.section_alternatives = collapse_symmetric_sections(courses)
+
+        self.courses: pd.DataFrame = self.__init_courses(courses)
+
+        # groupings constraints are emitted from, so requests only touch the groups they select.
+        # class_code -> type -> course_nids, subject -> class_codes, year level -> class_codes,
+        # subject -> course_nids, class_code -> course_nids
+        self.course_groups: dict[str, dict[str, list[str]]] = dict()
+        self.codes_by_subject: dict[str, list[str]] = dict()
+        self.codes_by_year_level: dict[int, list[str]] = dict()
+        self.sections_by_subject: dict[str, list[str]] = dict()
+        self.sections_by_code: dict[str, list[str]] = dict()
+        self.__init_groups()
+
+        # availability level -> course_nids with no crn (representative or alternative) meeting it,
+        # requests cull these before the model is built
+        self.unavailable_sections: dict[SectionAvailability, frozenset[str]] = (
+            self.__init_unavailable_sections()
+        )
+
+        # one row per (section, day, start, end) in minutes since midnight, duplicate meetings
+        # (same slot listed once per date range) are dropped and multi day meetings are split per day
+        self.meetings: pd.DataFrame = self.__init_meetings()
+
+        # course_nid -> options, each option is a sorted tuple of course_nids that must all be taken.
+        # only sections that have linked sections are present, an empty list means no option can be met
+        self.linked_groups: dict[str, list[tuple[str, ...]]] = self.__init_linked_groups()
+
+        # course_nid -> (day, response record) for each meeting, responses are just lookups into this
+        self.meeting_records: dict[str, list[tuple[str, TTCourse]]] = dict()
+        self.meeting_records_json: dict[str, list[tuple[str, str]]] = dict()
+        # availability level -> course_nid -> records, only for sections where some crns don't meet the level.
+        # the first crn that does is reported and the rest are dropped from the alternatives
+        self.available_meeting_records: dict[
+            SectionAvailability, dict[str, list[tuple[str, TTCourse]]]
+        ] = {availability: dict() for availability in SectionAvailability}
+        self.available_meeting_records_json: dict[
+            SectionAvailability, dict[str, list[tuple[str, str]]]
+        ] = {availability: dict() for availability in SectionAvailability}
+        self.__init_meeting_records()
+
+    @staticmethod
+    def __init_courses(courses: list[MinimumClassInfo]) -> pd.DataFrame:
+        index = []
+        variables = []
+        columns = [
+            "id",
+            "class_code",
+            "type",
+            "subject",
+            "meeting_times",
+            "linked_sections",
+        ]
+
+        for course in courses:
+            variables.append([getattr(course, col) for col in columns])
+            index.append(course.info_id())
+
+        df = pd.DataFrame(variables, index=index, columns=columns)
+        df["year_level"] = df["class_code"].map(year_level)
+        return df
+
+    def crns(self, crn: int) -> list[int]:
+        # every crn a representative stands for, representative first
+        return self.section_alternatives.get(crn, [crn])
+
+    def available_crns(self, crn: int, availability: SectionAvailability) -> list[int]:
+        return [
+            member
+            for member in self.crns(crn)
+            if self.crn_availability.get(member, SectionAvailability.SEATS).value
+            >= availability.value
+        ]
+
+    def __init_groups(self):
+        course_groups: dict[str, dict[str, list[str]]] = defaultdict(lambda: defaultdict(list))
+        codes_by_subject: dict[str, dict[str, None]] = defaultdict(dict)
+        codes_by_year_level: dict[int, dict[str, None]] = defaultdict(dict)
+        sections_by_subject: dict[str, list[str]] = defaultdict(list)
+        sections_by_code: dict[str, list[str]] = defaultdict(list)
+
+        for course_nid, class_code, section_type, subject, level in zip(
+            self.courses.index,
+            self.courses["class_code"],
+            self.courses["type"],
+            self.courses["subject"],
+            self.courses["year_level"],
+        ):
+            course_groups[class_code][section_type].append(course_nid)
+            codes_by_subject[subject][class_code] = None
+            codes_by_year_level[int(level)][class_code] = None
+            sections_by_subject[subject].append(course_nid)
+            sections_by_code[class_code].append(course_nid)
+
+        self.course_groups = {code: dict(types) for code, types in course_groups.items()}
+        self.codes_by_subject = {subject: list(codes) for subject, codes in codes_by_subject.items()}
+        self.codes_by_year_level = {level: list(codes) for level, codes in codes_by_year_level.items()}
+        self.sections_by_subject = dict(sections_by_subject)
+        self.sections_by_code = dict(sections_by_code)
+
+    def __init_unavailable_sections(self) -> dict[SectionAvailability, frozenset[str]]:
+        # the strictest level any crn of the section meets, one column so each level is a single comparison
+        section_level = pd.Series(
+            [
+                max(
+                    self.crn_availability.get(member, SectionAvailability.SEATS).value
+                    for member in self.crns(crn)
+                )
+                for crn in self.courses["id"]
+            ],
+            index=self.courses.index,
+        )
+
+        return {
+            availability: frozenset(self.courses.index[section_level < availability.value])
+            for availability in SectionAvailability
+        }
+
+    def __init_meetings(self) -> pd.DataFrame:
+        rows = set()
+        for course_nid, meeting_times in self.courses["meeting_times"].items():
+            for mt in meeting_times:
+                if mt.begin_time is None or mt.end_time is None:
+                    continue
+
+                start, end = hhmm_to_minutes(mt.begin_time), hhmm_to_minutes(mt.end_time)
+                for day in WEEK_DAYS:
+                    if getattr(mt, day):
+                        rows.add((course_nid, day, start, end))
+
+        return pd.DataFrame(
+            sorted(rows), columns=["course_nid", "day_of_week", "start", "end"]
+        )
+
+    def __init_linked_groups(self) -> dict[str, list[tuple[str, ...]]]:
+        crn_to_course_nid = dict(zip(self.courses["id"], self.courses.index))
+
+        linked_groups: dict[str, list[tuple[str, ...]]] = dict()
+        for course_nid, linked_sections in self.courses["linked_sections"].items():
+            if len(linked_sections) == 0:
+                continue
+
+            options: set[tuple[str, ...]] = set()
+            for linked_section in linked_sections:
+                # an option that references a section we don't have can never be met
+                if all(crn in crn_to_course_nid for crn in linked_section):
+                    options.add(
+                        tuple(sorted({crn_to_course_nid[crn] for crn in linked_section}))
+                    )
+
+            linked_groups[course_nid] = sorted(options)
+
+        return linked_groups
+
+    @staticmethod
+    def __records(
+        class_code: str, section_type: str, meeting_times: list, crns: list[int]
+    ) -> list[tuple[str, TTCourse]]:
+        # crns[0] is reported, the rest are alternatives
+        return [
+            (
+                meeting_time.day_of_week(),
+                TTCourse(
+                    crn=crns[0],
+                    name=class_code,
+                    meeting_type=section_type,
+                    start_time=meeting_time.begin_time,
+                    end_time=meeting_time.end_time,
+                    alternative_crns=crns[1:],
+                ),
+            )
+            for meeting_time in meeting_times
+        ]
+
+    def __init_meeting_records(self):
+        # zip over the columns, iterrows builds a Series per row and was most of the store's build time
+        for course_nid, crn, class_code, section_type, meeting_times in zip(
+            self.courses.index,
+            self.courses["id"],
+            self.courses["class_code"],
+            self.courses["type"],
+            self.courses["meeting_times"],
+        ):
+            crns = self.crns(crn)
+            records = self.__records(class_code, section_type, meeting_times, crns)
+            self.meeting_records[course_nid] = records
+            self.meeting_records_json[course_nid] = [
+                (day, record.model_dump_json()) for day, record in records
+            ]
+
+            for availability in SectionAvailability:
+                available = self.available_crns(crn, availability)
+                if len(available) == 0 or available == crns:
+                    continue
+
+                records = self.__records(class_code, section_type, meeting_times, available)
+                self.available_meeting_records[availability][course_nid] = records
+                self.available_meeting_records_json[availability][course_nid] = [
+                    (day, record.model_dump_json()) for day, record in records
+                ]
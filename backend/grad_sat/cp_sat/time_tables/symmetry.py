@@ -0,0 +1,83 @@
+from collections import defaultdict
+
+from grad_sat.scraper.models import MinimumClassInfo, MinimumMeetingTime
+
+
+def meeting_pattern(meeting_times: list[MinimumMeetingTime]) -> tuple:
+    # order/duplicate insensitive, two sections that meet at the same times have the same pattern
+    return tuple(
+        sorted(
+            {
+                (
+                    mt.begin_time,
+                    mt.end_time,
+                    mt.monday,
+                    mt.tuesday,
+                    mt.wednesday,
+                    mt.thursday,
+                    mt.friday,
+                )
+                for mt in meeting_times
+            }
+        )
+    )
+
+
+def collapse_symmetric_sections(
+    courses: list[MinimumClassInfo],
+) -> tuple[list[MinimumClassInfo], dict[int, list[int]]]:
+    """
+    groups sections into equivalence classes by (class_code, type, meeting pattern, linked crns, crns linking
+    to it) and keeps one representative per class. sections in the same class only differ by crn/instructor
+    and are linked to and from the very same sections, so any pick of alternatives (ie. the first available
+    one of each) is a valid combination and the solver doesn't need to search over them. links are compared
+    by crn, two lectures each linked to their own look-alike labs aren't interchangeable.
+
+    returns the representatives (linked sections rewritten to point at representatives) and
+    representative crn -> every crn in its class (representative first).
+    """
+    linked_from: dict[int, set[int]] = defaultdict(set)
+    for course in courses:
+        for option in course.linked_sections:
+            for crn in option:
+                linked_from[crn].add(course.id)
+
+    members: dict[tuple, list[int]] = defaultdict(list)
+    class_of: dict[int, tuple] = dict()
+    for course in courses:
+        key = (
+            course.class_code,
+            course.type,
+            meeting_pattern(course.meeting_times),
+            frozenset(frozenset(option) for option in course.linked_sections),
+            frozenset(linked_from[course.id]),
+        )
+        members[key].append(course.id)
+        class_of[course.id] = key
+
+    def representative(crn: int) -> int:
+        # crn's that aren't in the catalog stay as they are
+        if crn not in class_of:
+            return crn
+        return members[class_of[crn]][0]
+
+    representatives: list[MinimumClassInfo] = []
+    alternatives: dict[int, list[int]] = dict()
+    for course in courses:
+        if representative(course.id) != course.id:
+            continue
+
+        linked_sections: list[list[int]] = []
+        seen_options: set[tuple[int, ...]] = set()
+        for option in course.linked_sections:
+            rep_option = tuple(sorted({representative(crn) for crn in option}))
+            if rep_option not in seen_options:
+                seen_options.add(rep_option)
+                linked_sections.append(list(rep_option))
+
+        representatives.append(
+            course.model_copy(update={"linked_sections": linked_sections})
+        )
+        alternatives[course.id] = members[class_of[course.id]]
+
+    return representatives, alternatives
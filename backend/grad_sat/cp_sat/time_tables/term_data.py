@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+from grad_sat.scraper.models import (
+    ListOfMinimumClassInfo,
+    MinimumClassInfo,
+    MinimumMeetingTime,
+)
+
+DATA_JSON = "grad_sat/cp_sat/time_tables/data.json"
+TERM_DATA_DIR = "grad_sat/cp_sat/time_tables/data.term"
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+
+# None is stored as -1 in the integer columns
+MISSING = -1
+
+SECTION_DTYPE = np.dtype(
+    [
+        ("crn", np.int32),
+        ("class_code", np.int32),  # index into the string table
+        ("type", np.int32),
+        ("subject", np.int32),
+        ("seats_available", np.int32),
+        ("wait_available", np.int32),
+        ("enrollment", np.int32),
+        ("open_section", np.int8),
+    ]
+)
+
+MEETING_DTYPE = np.dtype(
+    [
+        ("begin_time", np.int16),
+        ("end_time", np.int16),
+        ("days", np.uint8),  # bit i set if it meets on DAYS[i]
+    ]
+)
+
+
+# a term is a directory of .npy arrays plus a small json string table:
+#
+#   sections.npy                one SECTION_DTYPE row per section
+#   meetings.npy                one MEETING_DTYPE row per distinct meeting time (~200 for ~4000 meetings)
+#   section_meetings.npy        every section's meetings back to back, as rows of meetings.npy
+#   meeting_offsets.npy         section i's meetings are section_meetings[meeting_offsets[i]:meeting_offsets[i + 1]]
+#   linked_crns.npy             every distinct linked section option's crns back to back (~4k of ~27k)
+#   linked_option_offsets.npy   option j is linked_crns[linked_option_offsets[j]:linked_option_offsets[j + 1]]
+#   section_options.npy         every section's options back to back, as option numbers
+#   linked_section_offsets.npy  section i's options are section_options[linked_section_offsets[i]:[i + 1]]
+#   meta.json                   {"version": data_version of the source json, "strings": [...]}
+#
+# arrays are loaded with mmap_mode="r" so every worker reading the same term shares the pages.
+
+
+def data_version(contents: str) -> str:
+    # version of the term data a result was computed from
+    return hashlib.sha256(contents.encode()).hexdigest()[:16]
+
+
+def _optional(value: Optional[int]) -> int:
+    return MISSING if value is None else int(value)
+
+
+def _offsets(lengths: list[int]) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def write_term_data(courses: list[MinimumClassInfo], path: str, version: str):
+    strings: dict[str, int] = dict()
+
+    def string_id(value: str) -> int:
+        return strings.setdefault(value, len(strings))
+
+    sections = np.zeros(len(courses), dtype=SECTION_DTYPE)
+    meetings: dict[tuple[int, int, int], int] = dict()
+    section_meetings, meeting_lengths = [], []
+    options: dict[tuple[int, ...], int] = dict()
+    section_options, linked_lengths = [], []
+
+    for i, course in enumerate(courses):
+        sections[i] = (
+            course.id,
+            string_id(course.class_code),
+            string_id(course.type),
+            string_id(course.subject),
+            _optional(course.seats_available),
+            _optional(course.wait_available),
+            _optional(course.enrollment),
+            _optional(course.open_section),
+        )
+
+        for mt in course.meeting_times:
+            days = sum(1 << bit for bit, day in enumerate(DAYS) if getattr(mt, day))
+            meeting = (_optional(mt.begin_time), _optional(mt.end_time), days)
+            section_meetings.append(meetings.setdefault(meeting, len(meetings)))
+        meeting_lengths.append(len(course.meeting_times))
+
+        for option in course.linked_sections:
+            section_options.append(options.setdefault(tuple(option), len(options)))
+        linked_lengths.append(len(course.linked_sections))
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "sections.npy"), sections)
+    np.save(os.path.join(path, "meetings.npy"), np.array(list(meetings), dtype=MEETING_DTYPE))
+    np.save(os.path.join(path, "section_meetings.npy"), np.array(section_meetings, dtype=np.int32))
+    np.save(os.path.join(path, "meeting_offsets.npy"), _offsets(meeting_lengths))
+    np.save(
+        os.path.join(path, "linked_crns.npy"),
+        np.array([crn for option in options for crn in option], dtype=np.int32),
+    )
+    np.save(
+        os.path.join(path, "linked_option_offsets.npy"),
+        _offsets([len(option) for option in options]),
+    )
+    np.save(os.path.join(path, "section_options.npy"), np.array(section_options, dtype=np.int32))
+    np.save(os.path.join(path, "linked_section_offsets.npy"), _offsets(linked_lengths))
+
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"version": version, "strings": list(strings)}, f)
+
+
+class TermData:
+    """
+    read only view of a term written by write_term_data
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        self.version: str = meta["version"]
+        self.strings: list[str] = meta["strings"]
+
+        self.sections = self.__load("sections")
+        self.meetings = self.__load("meetings")
+        self.section_meetings = self.__load("section_meetings")
+        self.meeting_offsets = self.__load("meeting_offsets")
+        self.linked_crns = self.__load("linked_crns")
+        self.linked_option_offsets = self.__load("linked_option_offsets")
+        self.section_options = self.__load("section_options")
+        self.linked_section_offsets = self.__load("linked_section_offsets")
+
+    def __load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    def class_infos(self) -> list[MinimumClassInfo]:
+        """
+        sections as MinimumClassInfo, built with model_construct since the data was validated when written.
+        identical meeting times and linked section options are shared between sections (read only)
+        """
+        strings = self.strings
+
+        def optional(value: int) -> Optional[int]:
+            return None if value == MISSING else value
+
+        meetings = [
+            MinimumMeetingTime.model_construct(
+                begin_time=optional(begin_time),
+                end_time=optional(end_time),
+                **{day: bool(days >> bit & 1) for bit, day in enumerate(DAYS)},
+            )
+            for begin_time, end_time, days in self.meetings.tolist()
+        ]
+
+        # whole columns to python lists up front, indexing memmaps one element at a time is slow
+        columns = {name: self.sections[name].tolist() for name in SECTION_DTYPE.names}
+        section_meetings = [meetings[m] for m in self.section_meetings.tolist()]
+        meeting_offsets = self.meeting_offsets.tolist()
+
+        linked_crns = self.linked_crns.tolist()
+        option_offsets = self.linked_option_offsets.tolist()
+        options = [
+            linked_crns[option_offsets[o] : option_offsets[o + 1]]
+            for o in range(len(option_offsets) - 1)
+        ]
+        section_options = [options[o] for o in self.section_options.tolist()]
+        linked_offsets = self.linked_section_offsets.tolist()
+
+        infos: list[MinimumClassInfo] = []
+        for i in range(len(self.sections)):
+            meeting_times = section_meetings[meeting_offsets[i] : meeting_offsets[i + 1]]
+            linked_sections = section_options[linked_offsets[i] : linked_offsets[i + 1]]
+            open_section = optional(columns["open_section"][i])
+
+            infos.append(
+                MinimumClassInfo.model_construct(
+                    id=columns["crn"][i],
+                    class_code=strings[columns["class_code"][i]],
+                    type=strings[columns["type"][i]],
+                    subject=strings[columns["subject"][i]],
+                    meeting_times=meeting_times,
+                    linked_sections=linked_sections,
+                    seats_available=optional(columns["seats_available"][i]),
+                    wait_available=optional(columns["wait_available"][i]),
+                    enrollment=optional(columns["enrollment"][i]),
+                    open_section=None if open_section is None else bool(open_section),
+                )
+            )
+
+        return infos
+
+
+def build_term_data(source: str = DATA_JSON, path: str = TERM_DATA_DIR):
+    with open(source, "r") as f:
+        contents = f.read()
+    courses = ListOfMinimumClassInfo.model_validate_json(contents).lomci
+
+    write_term_data(courses, path, version=data_version(contents))
+    print(f"wrote {len(courses)} sections from {source} to {path}")
+
+
+def load_courses(
+    path: Optional[str] = None, source: str = DATA_JSON
+) -> tuple[list[MinimumClassInfo], str]:
+    """
+    a term's sections and data version. path can be a term data directory or a json file, by default the
+    built term data is used when it's up to date with the source json and the json is parsed otherwise.
+    """
+    if path is not None and not os.path.isdir(path):
+        with open(path, "r") as f:
+            contents = f.read()
+        return ListOfMinimumClassInfo.model_validate_json(contents).lomci, data_version(contents)
+
+    term_path = path or TERM_DATA_DIR
+    if os.path.isdir(term_path):
+        term = TermData(term_path)
+        # hashing is cheap next to parsing, don't serve a stale build
+        if path is not None or not os.path.exists(source):
+            return term.class_infos(), term.version
+
+        with open(source, "r") as f:
+            contents = f.read()
+        if term.version == data_version(contents):
+            return term.class_infos(), term.version
+
+        print(f"{term_path} was built from a different {source}, parsing the json instead")
+        return ListOfMinimumClassInfo.model_validate_json(contents).lomci, data_version(contents)
+
+    return load_courses(source)
+
+
+if __name__ == "__main__":
+    build_term_data()
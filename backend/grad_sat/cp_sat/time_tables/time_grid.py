@@ -0,0 +1,16 @@
+WEEK_DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def hhmm_to_minutes(hhmm: int) -> int:
+    # 1250 -> 770, so 1250 -> 1310 is 20 minutes (not 60)
+    if not 0 <= hhmm <= 2359:
+        raise ValueError(f"time {hhmm} should be between 0 and 2359 (24 hour clock)")
+    if hhmm % 100 >= 60:
+        raise ValueError(f"time {hhmm} has invalid minutes")
+    return (hhmm // 100) * 60 + hhmm % 100
+
+
+def minutes_to_hhmm(minutes: int) -> int:
+    return (minutes // 60) * 100 + minutes % 60
@@ -1,14 +1,16 @@
 from collections import defaultdict
-from typing import Optional, Annotated
+from typing import Optional
 
 import re
 import numpy as np
 import pandas as pd
 from ortools.sat.python import cp_model
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field
 
+from grad_sat.cp_sat.v2.feedback import SolverFeedback
 from grad_sat.cp_sat.v2.model import Filter, CourseType, GraduationRequirementsConfig
 from grad_sat.cp_sat.v2.static import all_semesters, Programs
+from grad_sat.cp_sat.v2.util import FirstSolutionTimer, PhaseTimer
 
 from grad_sat.cp_sat.v2.dependent_variables import (
     TakenBeforeDict,
@@ -46,15 +48,22 @@ class ProgramMapFeas(BaseModel):
 
 
 class GraduationRequirementsInstanceFeas:
-    def __init__(self, program_map: ProgramMapFeas, pickle_path: str, semesters: list[str]):
+    def __init__(
+        self,
+        program_map: ProgramMapFeas,
+        pickle_path: str,
+        semesters: list[str],
+        courses: Optional[pd.DataFrame] = None,
+    ):
         # specific case
         self.required_courses = program_map.required_courses
         self.one_of = program_map.one_of
         self.filter_constraints = program_map.filter_constraints
 
-        # world
-        self.courses: pd.DataFrame = pd.read_pickle(filepath_or_buffer=pickle_path)
-        self.courses[["pre_requisites"]].to_html("courses.html")
+        # world, courses is an already loaded (read only) copy of the pickle
+        self.courses: pd.DataFrame = (
+            courses if courses is not None else pd.read_pickle(filepath_or_buffer=pickle_path)
+        )
 
         self.semester_names: list[str] = semesters
 
@@ -157,19 +166,6 @@ class _CourseVariables:
         return taken_as_elective, taken_as_core
 
 
-class SolverFeedback(BaseModel):
-    model_config = ConfigDict(arbitrary_types_allowed=True)
-
-    variable: Annotated[any, Field(exclude=True)]  # cp_model.IntVar, pydantic ignore _ names during serialization step
-    category: str
-    reason: Optional[str] = None
-    lte: Optional[int] = None
-    gte: Optional[int] = None
-    current: Optional[int] = None
-    contributing_courses: Optional[list[str]] = []
-    weight: int = 1
-
-
 class GraduationRequirementsFeasabilitySolver:
     def __init__(
             self,
@@ -184,6 +180,9 @@ class GraduationRequirementsFeasabilitySolver:
         self.completed_classes = completed_classes
         self.model = cp_model.CpModel()
         self.solver = cp_model.CpSolver()
+        self.timer = PhaseTimer()
+        # how far into the last solve the first solution was found, see FirstSolutionTimer
+        self.first_solution_seconds: Optional[float] = None
 
         self.must_take_courses: list[str] = must_take
         self.must_not_take_courses: list[str] = must_not_take
@@ -191,12 +190,13 @@ class GraduationRequirementsFeasabilitySolver:
         self.filter_assumptions_actual = dict()
         self.solver_feedback: list[SolverFeedback] = []
 
-        self._class_vars = _CourseVariables(
-            problem_instance.courses.index.values,
-            problem_instance.semester_names,
-            problem_instance.courses["credit_hours"],
-            self.model,
-        )
+        with self.timer.phase("variables"):
+            self._class_vars = _CourseVariables(
+                problem_instance.courses.index.values,
+                problem_instance.semester_names,
+                problem_instance.courses["credit_hours"],
+                self.model,
+            )
 
         self._build_model()
 
@@ -542,48 +542,54 @@ class GraduationRequirementsFeasabilitySolver:
                 # self.solver_feedback.append(fdb)
 
     def _add_constraints(self):
-        self.set_taken_courses()
+        with self.timer.phase("constraints.structure"):
+            self.set_taken_courses()
 
-        self._class_vars.courses.apply(self.limit_courses_per_semester, axis=0)
+            self._class_vars.courses.apply(self.limit_courses_per_semester, axis=0)
 
-        self._class_vars.courses.apply(self.courses_taken_at_most_once, axis=1)
+            self._class_vars.courses.apply(self.courses_taken_at_most_once, axis=1)
 
-        self._class_vars.taken_as_core[self.problem_instance.required_courses].apply(
-            self.must_take
-        )
-
-        for option in self.problem_instance.one_of:
-            self.one_of(option)
-
-        for course, restrictions in zip(
-                self.problem_instance.courses.index,
-                self.problem_instance.courses["credit_restrictions"],
-        ):
-            if restrictions:
-                self.apply_credit_restrictions(course, restrictions)
-
-        for course_code, prerequisite_options in zip(
-                self.problem_instance.courses.index,
-                self.problem_instance.courses["pre_requisites"].values,
-        ):
-            if prerequisite_options:
-                self.apply_pre_requisite(course_code, prerequisite_options)
-
-        for course_code, co_requisite_option in zip(
-                self.problem_instance.courses.index,
-                self.problem_instance.courses["co_requisites"].values,
-        ):
-            if co_requisite_option:
-                self.apply_co_requisite(course_code, co_requisite_option)
-
-            if course_code == "csci2040u":
-                print("HIT csic2040u")
-                print(co_requisite_option)
-
-        self.apply_co_requisite("csci2040u", [["csci2020u"]])
+        with self.timer.phase("constraints.requirements"):
+            self._class_vars.taken_as_core[self.problem_instance.required_courses].apply(
+                self.must_take
+            )
 
-        for filter_constraint in self.problem_instance.filter_constraints:
-            self.apply_filter_constraint(filter_constraint)
+            for option in self.problem_instance.one_of:
+                self.one_of(option)
+
+        with self.timer.phase("constraints.credit_restrictions"):
+            for course, restrictions in zip(
+                    self.problem_instance.courses.index,
+                    self.problem_instance.courses["credit_restrictions"],
+            ):
+                if restrictions:
+                    self.apply_credit_restrictions(course, restrictions)
+
+        with self.timer.phase("constraints.prerequisites"):
+            for course_code, prerequisite_options in zip(
+                    self.problem_instance.courses.index,
+                    self.problem_instance.courses["pre_requisites"].values,
+            ):
+                if prerequisite_options:
+                    self.apply_pre_requisite(course_code, prerequisite_options)
+
+        with self.timer.phase("constraints.co_requisites"):
+            for course_code, co_requisite_option in zip(
+                    self.problem_instance.courses.index,
+                    self.problem_instance.courses["co_requisites"].values,
+            ):
+                if co_requisite_option:
+                    self.apply_co_requisite(course_code, co_requisite_option)
+
+                if course_code == "csci2040u":
+                    print("HIT csic2040u")
+                    print(co_requisite_option)
+
+            self.apply_co_requisite("csci2040u", [["csci2020u"]])
+
+        with self.timer.phase("constraints.filters"):
+            for filter_constraint in self.problem_instance.filter_constraints:
+                self.apply_filter_constraint(filter_constraint)
 
     def _build_model(self):
         self._add_constraints()
@@ -602,60 +608,64 @@ class GraduationRequirementsFeasabilitySolver:
         # self.solver.parameters.relative_gap_limit = self.config.opt_tol
         self.solver.parameters.relative_gap_limit = 0.001  # TODO: test
 
-        status = self.solver.solve(self.model)
+        callback = FirstSolutionTimer()
+        with self.timer.phase("solve"):
+            status = self.solver.solve(self.model, callback)
+        self.first_solution_seconds = callback.seconds
         if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
-            if status == cp_model.OPTIMAL:
-                print("[FEAS MODEL] OPTIMAL", self.solver.objective_value)
-            else:
-                print("[FEAS MODEL] FEASIBLE", self.solver.objective_value)
-
-            courses_taken = defaultdict(list)
-
-            print("========================")
-            for course in self.completed_classes:
-                is_elective = self.solver.value(self._class_vars.taken_as_elective[course.lower()])
-                is_core = self.solver.value(self._class_vars.taken_as_core[course.lower()])
-                print(course, end="")
-                if is_elective:
-                    print("_E")
-                if is_core:
-                    print("_C")
-
-            res = []
-
-            # TODO: related courses to feedback
-            for feedback in self.solver_feedback:
-                if self.solver.value(feedback.variable) == 0:
-                    # if True:
-                    print(feedback)
-                    if feedback.current == -1:
-                        feedback.current = 1337
-
-                        for fltr in self.problem_instance.filter_constraints:
-                            if fltr.name == feedback.category:
-                                print("MATCH")
-                                variables = self.collect_filtered_variables(fltr.filter)
-                                total = 0
-                                contributing_courses = []
-                                for course_code, taken_var in variables:
-                                    if self.solver.value(taken_var) == 1:
-                                        total += 3  # variable # of credit hours exist, this is hardcoded, bad # TODO: lookup credit hours
-                                        contributing_courses.append(course_code)
-                                print(contributing_courses)
-                                # NOTE: current is not always accurate. will not be present on UI.
-                                feedback.current = total
-                                feedback.contributing_courses = contributing_courses
-                                feedback.gte = fltr.gte
-                                feedback.lte = fltr.lte
-
-                    res.append(feedback)
-
-            try:
-                print(self._class_vars.taken["hlsc0880u"], self.solver.value(self._class_vars.taken["hlsc0880u"]))
-            except Exception as e:
-                print('err', e)
-
-            return res
+            with self.timer.phase("feedback"):
+                if status == cp_model.OPTIMAL:
+                    print("[FEAS MODEL] OPTIMAL", self.solver.objective_value)
+                else:
+                    print("[FEAS MODEL] FEASIBLE", self.solver.objective_value)
+
+                courses_taken = defaultdict(list)
+
+                print("========================")
+                for course in self.completed_classes:
+                    is_elective = self.solver.value(self._class_vars.taken_as_elective[course.lower()])
+                    is_core = self.solver.value(self._class_vars.taken_as_core[course.lower()])
+                    print(course, end="")
+                    if is_elective:
+                        print("_E")
+                    if is_core:
+                        print("_C")
+
+                res = []
+
+                # TODO: related courses to feedback
+                for feedback in self.solver_feedback:
+                    if self.solver.value(feedback.variable) == 0:
+                        # if True:
+                        print(feedback)
+                        if feedback.current == -1:
+                            feedback.current = 1337
+
+                            for fltr in self.problem_instance.filter_constraints:
+                                if fltr.name == feedback.category:
+                                    print("MATCH")
+                                    variables = self.collect_filtered_variables(fltr.filter)
+                                    total = 0
+                                    contributing_courses = []
+                                    for course_code, taken_var in variables:
+                                        if self.solver.value(taken_var) == 1:
+                                            total += 3  # variable # of credit hours exist, this is hardcoded, bad # TODO: lookup credit hours
+                                            contributing_courses.append(course_code)
+                                    print(contributing_courses)
+                                    # NOTE: current is not always accurate. will not be present on UI.
+                                    feedback.current = total
+                                    feedback.contributing_courses = contributing_courses
+                                    feedback.gte = fltr.gte
+                                    feedback.lte = fltr.lte
+
+                        res.append(feedback)
+
+                try:
+                    print(self._class_vars.taken["hlsc0880u"], self.solver.value(self._class_vars.taken["hlsc0880u"]))
+                except Exception as e:
+                    print('err', e)
+
+                return res
 
         else:
             print("feas_model INFEASIBLE")
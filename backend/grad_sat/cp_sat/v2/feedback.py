@@ -0,0 +1,16 @@
+from typing import Annotated, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class SolverFeedback(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    variable: Annotated[any, Field(exclude=True)]  # cp_model.IntVar, pydantic ignore _ names during serialization step
+    category: str
+    reason: Optional[str] = None
+    lte: Optional[int] = None
+    gte: Optional[int] = None
+    current: Optional[int] = None
+    contributing_courses: Optional[list[str]] = []
+    weight: int = 1
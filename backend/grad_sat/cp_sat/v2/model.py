@@ -1,7 +1,8 @@
 import logging
 from collections import defaultdict
+from dataclasses import dataclass
 from enum import Enum
-from typing import Optional
+from typing import Callable, Optional
 import re
 from grad_sat.cp_sat.v2.dependent_variables import (
     TakenBeforeDict,
@@ -25,12 +26,13 @@ from pydantic import (
 from ortools.sat.python import cp_model
 import pandas as pd
 
+from grad_sat.cp_sat.v2.profiles import SolverProfile, SOLVER_PROFILES
 from grad_sat.cp_sat.v2.static import (
     int_to_semester,
     Programs,
     year_to_sem,
 )
-from grad_sat.cp_sat.v2.util import print_statistics
+from grad_sat.cp_sat.v2.util import FirstSolutionTimer, PhaseTimer, print_statistics
 
 
 class CourseType(Enum):
@@ -69,15 +71,22 @@ class ProgramMap(BaseModel):
 
 
 class GraduationRequirementsInstance:
-    def __init__(self, program_map: ProgramMap, pickle_path: str, semesters: list[str]):
+    def __init__(
+        self,
+        program_map: ProgramMap,
+        pickle_path: str,
+        semesters: list[str],
+        courses: Optional[pd.DataFrame] = None,
+    ):
         # specific case
         self.required_courses = program_map.required_courses
         self.one_of = program_map.one_of
         self.filter_constraints = program_map.filter_constraints
 
-        # world
-        self.courses: pd.DataFrame = pd.read_pickle(filepath_or_buffer=pickle_path)
-        self.courses[["pre_requisites"]].to_html("courses.html")
+        # world, courses is an already loaded (read only) copy of the pickle
+        self.courses: pd.DataFrame = (
+            courses if courses is not None else pd.read_pickle(filepath_or_buffer=pickle_path)
+        )
 
         self.semester_names: list[str] = semesters
 
@@ -94,6 +103,11 @@ class GraduationRequirementsConfig(BaseModel):
     )
     print_stats: bool = Field(default=False, description="display search stats")
 
+    @classmethod
+    def from_profile(cls, profile: SolverProfile, **kwargs) -> "GraduationRequirementsConfig":
+        time_limit, opt_tol = SOLVER_PROFILES[profile]
+        return cls(**{"time_limit": time_limit, "opt_tol": opt_tol, **kwargs})
+
 
 class GraduationRequirementsSolution(BaseModel):
     taken_courses: dict[int, list[str]]
@@ -209,6 +223,44 @@ class _CourseVariables:
         return taken_as_elective, taken_as_core
 
 
+@dataclass
+class GraduationRequirementsProgress:
+    # an improving solution found during the search
+    objective: float
+    best_bound: float
+    elapsed: float
+    taken_courses: dict[int, list[str]]
+
+    @property
+    def gap(self) -> float:
+        # relative gap to the best bound, how relative_gap_limit measures it
+        return abs(self.objective - self.best_bound) / max(1.0, abs(self.objective))
+
+
+class _ProgressCallback(FirstSolutionTimer):
+    def __init__(
+        self,
+        solver: "GraduationRequirementsSolver",
+        on_solution: Optional[Callable[[GraduationRequirementsProgress], None]],
+    ):
+        super().__init__()
+        self.solver = solver
+        self.on_solution = on_solution
+
+    def on_solution_callback(self):
+        super().on_solution_callback()
+        if self.on_solution is None:
+            return
+        self.on_solution(
+            GraduationRequirementsProgress(
+                objective=self.objective_value,
+                best_bound=self.best_objective_bound,
+                elapsed=self.wall_time,
+                taken_courses=self.solver.taken_courses(self.value),
+            )
+        )
+
+
 class GraduationRequirementsSolver:
     def __init__(
         self,
@@ -219,6 +271,9 @@ class GraduationRequirementsSolver:
         self.config = config
         self.model = cp_model.CpModel()
         self.solver = cp_model.CpSolver()
+        self.timer = PhaseTimer()
+        # how far into the last solve the first plan was found, see FirstSolutionTimer
+        self.first_solution_seconds: Optional[float] = None
 
         logging.basicConfig(
             format="%(asctime)s %(levelname)s:%(message)s",
@@ -228,12 +283,13 @@ class GraduationRequirementsSolver:
         self.logger = logging.getLogger(__name__)
 
         # print(type(self.problem_instance.courses["credit_hours"]))
-        self._class_vars = _CourseVariables(
-            problem_instance.courses.index.values,
-            problem_instance.semester_names,
-            problem_instance.courses["credit_hours"],
-            self.model,
-        )
+        with self.timer.phase("variables"):
+            self._class_vars = _CourseVariables(
+                problem_instance.courses.index.values,
+                problem_instance.semester_names,
+                problem_instance.courses["credit_hours"],
+                self.model,
+            )
 
         self.logger.info("%s courses", len(self._class_vars.courses.index))
         self.logger.info("%s semesters", len(self._class_vars.courses.columns))
@@ -489,65 +545,89 @@ class GraduationRequirementsSolver:
             print("applied >= filter constraint for", f.name)
 
     def _add_constraints(self):
-        self._class_vars.courses.apply(self.courses_taken_at_most_once, axis=1)
-
-        self._class_vars.courses.apply(self.limit_courses_per_semester, axis=0)
-
-        self._class_vars.taken_as_core[self.problem_instance.required_courses].apply(
-            self.must_take
-        )
-
-        for option in self.problem_instance.one_of:
-            self.one_of(option)
-
-        for course, restrictions in zip(
-            self.problem_instance.courses.index,
-            self.problem_instance.courses["credit_restrictions"],
-        ):
-            if restrictions:
-                self.apply_credit_restrictions(course, restrictions)
-
-        invalid_prereq_count = 0
-        unhandled_pre_reqs: dict[str, str] = dict()
-        for course_code, prerequisite_options in zip(
-            self.problem_instance.courses.index,
-            self.problem_instance.courses["pre_requisites"].values,
-        ):
-            if prerequisite_options:
-                if not self.apply_pre_requisite(course_code, prerequisite_options):
-                    # print("invalid prereq:", course_code, "->", prerequisite_options)
-                    invalid_prereq_count += 1
-                    unhandled_pre_reqs[course_code] = prerequisite_options
-        print(f"{invalid_prereq_count} invalid prereqs.")
+        with self.timer.phase("constraints.structure"):
+            self._class_vars.courses.apply(self.courses_taken_at_most_once, axis=1)
 
-        for course, unknown_pre_req in unhandled_pre_reqs.items():
-            self.apply_unknown_prerequisites(course, unknown_pre_req)
+            self._class_vars.courses.apply(self.limit_courses_per_semester, axis=0)
 
-        self.model.add(sum([self._class_vars.taken[course] for course in self.problem_instance.required_courses]) == len(self.problem_instance.required_courses))
-
-        for course_code, co_requisite_option in zip(
-            self.problem_instance.courses.index,
-            self.problem_instance.courses["co_requisites"].values,
-        ):
-            if co_requisite_option:
-                self.apply_co_requisite(course_code, co_requisite_option)
-
-            if course_code == "csci2040u":
-                print("HIT csic2040u")
-                print(co_requisite_option)
-
-        self.apply_co_requisite("csci2040u", [["csci2020u"]])
-
-        for filter_constraint in self.problem_instance.filter_constraints:
+        with self.timer.phase("constraints.requirements"):
+            self._class_vars.taken_as_core[self.problem_instance.required_courses].apply(
+                self.must_take
+            )
 
-            self.apply_filter_constraint(filter_constraint)
+            for option in self.problem_instance.one_of:
+                self.one_of(option)
+
+        with self.timer.phase("constraints.credit_restrictions"):
+            for course, restrictions in zip(
+                self.problem_instance.courses.index,
+                self.problem_instance.courses["credit_restrictions"],
+            ):
+                if restrictions:
+                    self.apply_credit_restrictions(course, restrictions)
+
+        with self.timer.phase("constraints.prerequisites"):
+            invalid_prereq_count = 0
+            unhandled_pre_reqs: dict[str, str] = dict()
+            for course_code, prerequisite_options in zip(
+                self.problem_instance.courses.index,
+                self.problem_instance.courses["pre_requisites"].values,
+            ):
+                if prerequisite_options:
+                    if not self.apply_pre_requisite(course_code, prerequisite_options):
+                        # print("invalid prereq:", course_code, "->", prerequisite_options)
+                        invalid_prereq_count += 1
+                        unhandled_pre_reqs[course_code] = prerequisite_options
+            print(f"{invalid_prereq_count} invalid prereqs.")
+
+            for course, unknown_pre_req in unhandled_pre_reqs.items():
+                self.apply_unknown_prerequisites(course, unknown_pre_req)
+
+        with self.timer.phase("constraints.requirements"):
+            self.model.add(sum([self._class_vars.taken[course] for course in self.problem_instance.required_courses]) == len(self.problem_instance.required_courses))
+
+        with self.timer.phase("constraints.co_requisites"):
+            for course_code, co_requisite_option in zip(
+                self.problem_instance.courses.index,
+                self.problem_instance.courses["co_requisites"].values,
+            ):
+                if co_requisite_option:
+                    self.apply_co_requisite(course_code, co_requisite_option)
+
+                if course_code == "csci2040u":
+                    print("HIT csic2040u")
+                    print(co_requisite_option)
+
+            self.apply_co_requisite("csci2040u", [["csci2020u"]])
+
+        with self.timer.phase("constraints.filters"):
+            for filter_constraint in self.problem_instance.filter_constraints:
+
+                self.apply_filter_constraint(filter_constraint)
 
     def _build_model(self):
         self._add_constraints()
         # minimize assumptions (tmp off for testing)
         # self.model.minimize(sum(self._class_vars.unknown_prereqs.values()))
 
-    def solve(self) -> GraduationRequirementsSolution:
+    def taken_courses(self, value: Callable[[cp_model.IntVar], int]) -> dict[int, list[str]]:
+        # semester -> courses taken in it (suffixed _(E) or _(C)), value reads a solver or callback's assignment
+        courses_taken = defaultdict(list)
+        for class_name, v in zip(self._class_vars.taken_in.index.tolist(), self._class_vars.taken_in.values):
+            semester = value(v)
+            if semester != 0:
+                courses_taken[semester].append(
+                    class_name
+                    + f"_({"E" if value(self._class_vars.taken_as_elective[class_name]) else "C"})"
+                )
+        return courses_taken
+
+    def solve(
+        self, on_solution: Optional[Callable[[GraduationRequirementsProgress], None]] = None
+    ) -> GraduationRequirementsSolution:
+        """
+        on_solution is called with every improving solution found before the search ends
+        """
         self.solver.parameters.max_time_in_seconds = self.config.time_limit
         self.solver.parameters.relative_gap_limit = self.config.opt_tol
 
@@ -555,7 +635,10 @@ class GraduationRequirementsSolver:
         #     programs=[Programs.information_technology, Programs.engineering, Programs.business, Programs.automotive_engineering, Programs.forensic_science, Programs.kinesiology, Programs.forensic_psychology, Programs.education, Programs.medical_laboratory_science, Programs.environmental_science]
         # ))
 
-        status = self.solver.solve(self.model)
+        callback = _ProgressCallback(self, on_solution)
+        with self.timer.phase("solve"):
+            status = self.solver.solve(self.model, callback)
+        self.first_solution_seconds = callback.seconds
         if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
             # course_taken = self._class_vars.taken[course]
             print("[Populate Model] SUCCESS, OBJECTIVE:", self.solver.objective_value)
@@ -563,19 +646,8 @@ class GraduationRequirementsSolver:
             for k, v in self._class_vars.credit_hours_per_semester.items():
                 print(k, "~>", self.solver.value(v))
 
-            courses_taken_just_codes: list[str] = []
-            courses_taken = defaultdict(list)
-            for i, v in enumerate(self._class_vars.taken_in.values):
-                class_name = self._class_vars.taken_in.index.tolist()[i]
-                value = self.solver.value(v)
-                if value != 0:
-                    courses_taken[value].append(
-                        class_name
-                        + f"_({"E" if self.solver.value(self._class_vars.taken_as_elective[class_name]) else "C"})"
-                    )
-
-                    courses_taken_just_codes.append(class_name)
-
+            with self.timer.phase("extract"):
+                courses_taken = self.taken_courses(self.solver.value)
             for courses in courses_taken.values():
                 print(courses)
 
@@ -0,0 +1,15 @@
+from enum import Enum
+
+
+class SolverProfile(Enum):
+    Fast = "fast"
+    Default = "default"
+    Thorough = "thorough"
+
+
+# (time limit, optimality tolerance) for each profile
+SOLVER_PROFILES: dict[SolverProfile, tuple[float, float]] = {
+    SolverProfile.Fast: (1.0, 0.05),
+    SolverProfile.Default: (5.0, 0.01),
+    SolverProfile.Thorough: (30.0, 0.001),
+}
@@ -1,3 +1,8 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
 from ortools.sat.python import cp_model
 
 
@@ -6,3 +11,66 @@ def print_statistics(solver: cp_model.CpSolver) -> None:
     print(f"  - conflicts      : {solver.num_conflicts}")
     print(f"  - branches       : {solver.num_branches}")
     print(f"  - wall time      : {solver.wall_time} s")
+
+
+class PhaseTimer:
+    """
+    wall time spent in each phase of building and solving a model, phases that run more than once add up.
+    cheap enough to always have on (a perf_counter call on each side of a phase)
+    """
+
+    def __init__(self):
+        self.phases: dict[str, float] = defaultdict(float)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - start
+
+    def merge(self, other: "PhaseTimer", prefix: str = ""):
+        for name, seconds in other.phases.items():
+            self.phases[prefix + name] += seconds
+
+    def as_dict(self) -> dict[str, float]:
+        return dict(self.phases)
+
+
+class FirstSolutionTimer(cp_model.CpSolverSolutionCallback):
+    """
+    records how far into the search (seconds) the first solution was found, None when there wasn't one
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.seconds: Optional[float] = None
+
+    def on_solution_callback(self):
+        if self.seconds is None:
+            self.seconds = self.wall_time
+
+
+def solver_statistics(solver: cp_model.CpSolver, model: Optional[cp_model.CpModel] = None) -> dict:
+    """
+    the last solve's search stats (and the model's size), for metrics and debug output
+    """
+    try:
+        stats = {
+            "status": solver.status_name(),
+            "conflicts": solver.num_conflicts,
+            "branches": solver.num_branches,
+            "wall_time": solver.wall_time,
+        }
+    except RuntimeError:
+        # never solved, ie. cancelled before the search started
+        stats = {"status": "NOT_SOLVED"}
+    if stats["status"] in ["OPTIMAL", "FEASIBLE"]:
+        objective, bound = solver.objective_value, solver.best_objective_bound
+        stats["objective"] = objective
+        stats["gap"] = abs(objective - bound) / max(1.0, abs(objective))
+    if model is not None:
+        stats["variables"] = len(model.proto.variables)
+        stats["constraints"] = len(model.proto.constraints)
+    return stats
@@ -45,6 +45,10 @@ def raw_to_minimum(raw: str) -> MinimumClassInfo:
             )
         ],
         linked_sections=list(class_info.linkedSections.values()),
+        seats_available=class_info.seatsAvailable,
+        wait_available=class_info.waitAvailable,
+        enrollment=class_info.enrollment,
+        open_section=class_info.openSection,
     )
 
 
@@ -101,6 +105,10 @@ def process_json_files(
                             )
                         ],
                         linked_sections=list(cl.linkedSections.values()),
+                        seats_available=cl.seatsAvailable,
+                        wait_available=cl.waitAvailable,
+                        enrollment=cl.enrollment,
+                        open_section=cl.openSection,
                     )
 
                     # this isn't a meeting time (clean data here, not in model code please)
@@ -1,6 +1,8 @@
 from sqlalchemy.dialects.postgresql import insert
 
-from grad_sat.scraper.uoit_courses import Scraper
+import os
+
+from grad_sat.scraper.uoit_courses import DEFAULT_TERM, Scraper
 from grad_sat.scraper.models import Model, ClassInfoList, ClassInfo
 from grad_sat.db.database import get_db, create_url
 from grad_sat.db.schema import Course
@@ -8,15 +10,17 @@ from grad_sat.db.schema import Course
 
 def main():
     try:
+        # ie. GRAD_SAT_TERM=202509 for fall 2025
+        term = int(os.getenv("GRAD_SAT_TERM", DEFAULT_TERM))
         sc = Scraper(
             cookie="",
             unique_session_id="",
+            term=term,
         )
 
         limit = 50
         offset = 1000
         returned = 50
-        TERM = 202501  # winter 2025
         total = 0
 
         while returned == 50 and total < 1000:
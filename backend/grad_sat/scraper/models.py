@@ -148,6 +148,12 @@ class MinimumClassInfo(BaseModel):
     meeting_times: list[MinimumMeetingTime]
     linked_sections: list[list[int]]
 
+    # seat availability at scrape time, None when the catalog was reduced without it
+    seats_available: Optional[int] = None
+    wait_available: Optional[int] = None
+    enrollment: Optional[int] = None
+    open_section: Optional[bool] = None
+
     def info_id(self):
         return f"{self.class_code}_{self.type}_{self.id}"
 
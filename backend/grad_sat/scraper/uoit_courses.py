@@ -15,6 +15,15 @@ import bs4
 
 from grad_sat.scraper.models import Model
 
+# terms are <year><month the term starts>, 202501 is Winter 2025 and 202509 is Fall 2025
+DEFAULT_TERM = 202501
+TERM_SEASONS = {1: "Winter", 5: "Spring/Summer", 9: "Fall"}
+
+
+def term_description(term: int) -> str:
+    # how the term is listed in the term selection dropdown
+    return f"{TERM_SEASONS[term % 100]} {term // 100}"
+
 
 class Scraper:
     def __init__(
@@ -23,8 +32,10 @@ class Scraper:
         username: str = None,
         unique_session_id: str = None,
         cookie: str = None,
+        term: int = DEFAULT_TERM,
     ):
         load_dotenv()
+        self.term = term
         self.__cookie: str = cookie
         self.__unique_session_id: str = unique_session_id
         self.__student_id = username or os.environ["USERNAME"]
@@ -39,11 +50,11 @@ class Scraper:
 
     def get_courses(self, limit: int, offset: int) -> Model:
         # TODO: probably a better way to handle when these are invalidated
-        term = 202501
+        term = self.term
 
         endpoint = (
             "https://ssp.mycampus.ca/StudentRegistrationSsb/ssb/searchResults/searchResults?"
-            f"txt_term={term}&"  # this might change, 202501 is Winter 2025
+            f"txt_term={term}&"
             "startDatepicker=&"
             "endDatepicker=&"
             f"uniqueSessionId={self.__unique_session_id}&"
@@ -125,8 +136,8 @@ class Scraper:
             page.locator("#select2-chosen-1").click()
             page.wait_for_timeout(2000)
 
-            # choose first option
-            page.get_by_text(text="Winter 2025").click()
+            # choose the term being scraped
+            page.get_by_text(text=term_description(self.term)).click()
             page.wait_for_timeout(2000)
 
             # for the session to exist we need to go to the next page or something?
@@ -0,0 +1,122 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Optional
+
+from grad_sat.server.prefork import child_pids, memory_report
+
+# the server imports these once it solves (see the routers), importing the app shouldn't
+HEAVY_MODULES = ["pandas", "numpy", "ortools", "sqlalchemy", "pymupdf"]
+
+# import budget for grad_sat.server.main, GRAD_SAT_IMPORT_BUDGET_MS overrides it. most of it is fastapi
+DEFAULT_IMPORT_BUDGET_MS = 1000.0
+
+
+def import_times(module: str) -> dict[str, tuple[int, int]]:
+    """
+    self and cumulative microseconds of every module a fresh interpreter imports along with module,
+    from python -X importtime
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = dict()
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def benchmark_import_time(
+    module: str = "grad_sat.server.main",
+    repeats: int = 5,
+    budget_ms: Optional[float] = None,
+    top: int = 10,
+) -> bool:
+    """
+    how long importing the server takes, what's slowest and whether a heavy module crept back in.
+    false when over budget or a heavy module is imported
+    """
+    if budget_ms is None:
+        budget_ms = float(os.getenv("GRAD_SAT_IMPORT_BUDGET_MS", DEFAULT_IMPORT_BUDGET_MS))
+
+    runs = [import_times(module) for _ in range(repeats)]
+    # fastest run, the others are mostly noise from whatever else the machine is doing
+    times = min(runs, key=lambda run: run[module][1])
+    total_ms = times[module][1] / 1000
+
+    print(f"import {module} {total_ms:8.1f}ms (budget {budget_ms:.0f}ms)")
+    for name, (self_us, cumulative_us) in sorted(times.items(), key=lambda item: -item[1][1])[:top]:
+        print(f"  {name:48} self {self_us / 1000:8.1f}ms cumulative {cumulative_us / 1000:8.1f}ms")
+
+    heavy = [name for name in HEAVY_MODULES if name in times]
+    if heavy:
+        print(f"  imports {', '.join(heavy)}, these should be imported where they're used")
+
+    return total_ms <= budget_ms and not heavy
+
+
+def _wait_ready(port: int, process: subprocess.Popen, processes: int, timeout: float = 180.0):
+    # every server and solver worker started and the server answering /ready
+    start = time.time()
+    while time.time() - start < timeout:
+        assert process.poll() is None, "server exited"
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=1)
+            if len(child_pids(process.pid)) >= processes:
+                return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("server didn't get ready")
+
+
+def benchmark_prefork_memory(workers: int = 2, solver_workers: int = 1, port: int = 8124):
+    """
+    memory of workers server workers (each with solver_workers solver workers) started by uvicorn, which
+    spawns them and has each load everything itself, and by the prefork launcher. pss adds up to what the
+    whole server really uses
+    """
+    env = {**os.environ, "GRAD_SAT_SOLVER_WORKERS": str(solver_workers), "GRAD_SAT_WORKERS": str(workers),
+           "PORT": str(port)}
+    commands = {
+        "uvicorn": [sys.executable, "-m", "uvicorn", "grad_sat.server.main:app", "--port", str(port),
+                    "--workers", str(workers)],
+        "prefork": [sys.executable, "-c", "from grad_sat.server.main import main; main()"],
+    }
+    # uvicorn's own master, then each worker with its solver workers (and each spawned pool's resource tracker)
+    processes = workers * (1 + solver_workers)
+
+    for name, command in commands.items():
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_ready(port, process, processes)
+            # let startup garbage settle
+            time.sleep(2.0)
+            report = memory_report(process.pid)
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=60)
+
+        total = {kind: sum(usage[kind] for usage in report) / 2**20 for kind in ["rss", "pss", "uss"]}
+        print(f"{name:8} {len(report)} processes rss {total['rss']:8.1f}MiB pss {total['pss']:8.1f}MiB "
+              f"uss {total['uss']:8.1f}MiB")
+        for usage in report:
+            print(f"  pid {usage['pid']:7} rss {usage['rss'] / 2**20:8.1f}MiB pss {usage['pss'] / 2**20:8.1f}MiB "
+                  f"uss {usage['uss'] / 2**20:8.1f}MiB")
+
+
+if __name__ == "__main__":
+    benchmark_prefork_memory()
+    sys.exit(0 if benchmark_import_time() else 1)
@@ -0,0 +1,211 @@
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+from grad_sat.server.executor import SolverExecutor, solver_executor
+
+# milliseconds the client is willing to wait for the response, solves are cut short to fit in it
+DEADLINE_HEADER = "X-Deadline-Ms"
+# the time limit and gap a solve was actually given, ie. "time_limit=2.000, gap=0.0100, load=0.25"
+BUDGET_HEADER = "X-Solver-Budget"
+
+# time kept out of a client's deadline for building the model and sending the result back, until jobs have
+# shown how long that takes
+DEADLINE_RESERVE = 0.5
+# no solve gets less than this, a deadline that can't fit it gets a 504 without solving
+MIN_TIME_LIMIT = 0.1
+# the load never cuts a solve below this many times the learned time to its model's first solution
+FIRST_SOLUTION_MARGIN = 2.0
+# the floor under load before a model's first solution time is learned, the fast profile's full limit: the
+# least any profile is meant to find a plan in
+DEFAULT_FLOOR = 1.0
+
+
+@dataclass
+class SolverBudget:
+    """
+    what a job's solves are allowed: each solve's time limit and the relative gap it can stop at. load is the
+    queue pressure (0 to 1) it was granted under and deadline_limited whether a client's deadline cut it
+    shorter than the load did. sent to the worker with the job, so it has to stay picklable
+    """
+    time_limit: float
+    opt_tol: float
+    load: float = 0.0
+    deadline_limited: bool = False
+
+
+class BudgetController:
+    """
+    shrinks solver time limits (and loosens the gap limits) as jobs queue up, so the queue works off faster
+    instead of every job waiting out the full limit of the ones ahead of it. with an empty queue (a free
+    worker for every job) solves get their full limit back.
+
+    load is how full the queue would be with the new job in it: at 0 a solve gets its full time limit and
+    gap, at 1 (the executor about to turn jobs away) min_fraction of the time and at least max_gap.
+
+    a cut solve that stops before its first solution is wasted, so the load never cuts below a floor:
+    FIRST_SOLUTION_MARGIN times how long the model has been taking to find a first solution (see observe),
+    floor (GRAD_SAT_BUDGET_FLOOR, 1s by default) until that's known. a solve's full limit caps it, only a
+    client's deadline can cut deeper
+    """
+
+    def __init__(self, executor: SolverExecutor, min_fraction: float = 0.2, max_gap: float = 0.1,
+                 floor: float = DEFAULT_FLOOR):
+        assert 0 < min_fraction <= 1, "min_fraction has to be in (0, 1]"
+        self.executor = executor
+        self.min_fraction = min_fraction
+        self.max_gap = max_gap
+        self.floor = max(MIN_TIME_LIMIT, floor)
+
+        # moving average of the time a job spends outside its solves (building the model, feedback)
+        self.overhead_seconds = DEADLINE_RESERVE
+        # model -> moving average of the time its solves took to find a first solution
+        self.first_solution_seconds: dict[str, float] = {}
+        self.granted = 0
+        self.shrunk = 0
+
+    def load(self) -> float:
+        queued = max(0, self.executor.in_flight + 1 - self.executor.workers)
+        return min(1.0, queued / max(1, self.executor.max_queue))
+
+    def expected_wait(self) -> float:
+        # seconds a new job would queue for, the jobs ahead of it worked off by every worker
+        queued = max(0, self.executor.in_flight + 1 - self.executor.workers)
+        return self.executor.average_job_seconds * queued / self.executor.workers
+
+    def observe(self, report: dict):
+        """
+        learns from a finished job's report (see record_solve) the job overhead, the part of a deadline its
+        solves can't have, and how long each model takes to find a first solution
+        """
+        for stats in report.get("solvers", []):
+            self.__observe_solve(stats)
+        phases = report.get("phases", {})
+        if not phases:
+            return
+        overhead = sum(seconds for phase, seconds in phases.items() if not phase.endswith("solve"))
+        self.overhead_seconds = 0.8 * self.overhead_seconds + 0.2 * overhead
+
+    def __observe_solve(self, stats: dict):
+        model, learned = stats.get("model"), self.first_solution_seconds.get(stats.get("model"))
+        if stats.get("first_solution") is not None:
+            seconds = stats["first_solution"]
+            self.first_solution_seconds[model] = seconds if learned is None else 0.8 * learned + 0.2 * seconds
+        elif stats.get("status") == "UNKNOWN":
+            # out of time before a first solution, it takes at least as long as was searched
+            self.first_solution_seconds[model] = max(learned or 0.0, stats["wall_time"])
+
+    def min_time_limit(self, time_limit: float, model: Optional[str] = None) -> float:
+        # the least the load cuts a solve of model with a full time_limit to
+        learned = self.first_solution_seconds.get(model)
+        floor = self.floor if learned is None else max(MIN_TIME_LIMIT, FIRST_SOLUTION_MARGIN * learned)
+        return min(time_limit, floor)
+
+    def grant(self, time_limit: float, opt_tol: float, deadline: Optional[float] = None,
+              solves: int = 1, model: Optional[str] = None) -> SolverBudget:
+        """
+        the budget for a job about to be submitted that runs up to solves solves of model with time_limit and
+        opt_tol each when the server is idle. deadline is the client's (see client_deadline), what's left of
+        it after the expected queueing and job overhead is split between the solves. raises a 504 when that
+        isn't enough to solve in at all
+        """
+        load = self.load()
+        scaled = max(self.min_time_limit(time_limit, model), time_limit * (1 - (1 - self.min_fraction) * load))
+        deadline_limited = False
+        if deadline is not None:
+            remaining = deadline - time.time() - self.expected_wait() - self.overhead_seconds
+            if remaining / solves < MIN_TIME_LIMIT:
+                raise HTTPException(
+                    status_code=504,
+                    detail=f"deadline too short, a solve takes about {self.overhead_seconds + MIN_TIME_LIMIT:.1f}s "
+                           f"plus {self.expected_wait():.1f}s queueing",
+                )
+            deadline_limited = remaining / solves < scaled
+            scaled = min(scaled, remaining / solves)
+
+        budget = SolverBudget(
+            time_limit=max(MIN_TIME_LIMIT, scaled),
+            opt_tol=max(opt_tol, opt_tol + (self.max_gap - opt_tol) * load),
+            load=load,
+            deadline_limited=deadline_limited,
+        )
+        self.granted += 1
+        if budget.time_limit < time_limit:
+            self.shrunk += 1
+        return budget
+
+    def stats(self) -> dict:
+        return {
+            "load": self.load(),
+            "expected_wait": self.expected_wait(),
+            "overhead_seconds": self.overhead_seconds,
+            # time limit share a job submitted now would get
+            "fraction": 1 - (1 - self.min_fraction) * self.load(),
+            "min_fraction": self.min_fraction,
+            "floor": self.floor,
+            "first_solution_seconds": dict(self.first_solution_seconds),
+            "max_gap": self.max_gap,
+            "granted": self.granted,
+            "shrunk": self.shrunk,
+        }
+
+
+def client_deadline(request: Request) -> Optional[float]:
+    """
+    when (time.time()) the client stops waiting, from its X-Deadline-Ms header. None when it didn't send one
+    """
+    value = request.headers.get(DEADLINE_HEADER)
+    if value is None:
+        return None
+    try:
+        milliseconds = float(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{DEADLINE_HEADER} has to be a number of milliseconds")
+    if milliseconds <= 0:
+        raise HTTPException(status_code=400, detail=f"{DEADLINE_HEADER} has to be positive")
+    return time.time() + milliseconds / 1000
+
+
+def job_timeout(deadline: Optional[float], default: float) -> float:
+    # how long to wait on a job, no longer than the client waits for it
+    if deadline is None:
+        return default
+    return max(MIN_TIME_LIMIT, min(default, deadline - time.time()))
+
+
+def flight_key(key: str, budget: SolverBudget) -> str:
+    """
+    the singleflight key of a solve given budget. one cut short to fit a client's deadline is only shared
+    with requests given the same time limit, a request without a deadline never gets its degraded result.
+    the load's cut is shared, a request joining the solve would get the same cut solving itself
+    """
+    if not budget.deadline_limited:
+        return key
+    return f"{key}:{budget.time_limit:.1f}"
+
+
+def granted(budget: SolverBudget, solver) -> dict:
+    """
+    what a solve was actually given, read off its cp_model.CpSolver once it's solved: the worker cuts the
+    time limit further to fit the job's deadline and a model can keep its own gap limit
+    """
+    return {
+        "time_limit": solver.parameters.max_time_in_seconds,
+        "gap": solver.parameters.relative_gap_limit,
+        "load": budget.load,
+    }
+
+
+def budget_header(granted: dict) -> str:
+    return f"time_limit={granted['time_limit']:.3f}, gap={granted['gap']:.4f}, load={granted['load']:.2f}"
+
+
+budget_controller = BudgetController(
+    solver_executor,
+    min_fraction=float(os.getenv("GRAD_SAT_BUDGET_MIN_FRACTION", 0.2)),
+    max_gap=float(os.getenv("GRAD_SAT_BUDGET_MAX_GAP", 0.1)),
+    floor=float(os.getenv("GRAD_SAT_BUDGET_FLOOR", DEFAULT_FLOOR)),
+)
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Generic, Optional, TypeVar
+
+from pydantic import BaseModel
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """
+    least recently used eviction, capped by the (approximate) size of what's stored rather than entry count
+    since a schedule stream can be 100x a single schedule. safe to share between threads.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[V], int]):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[V, int]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: V):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+
+            # bigger than the whole cache, would just evict everything else
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+@dataclass
+class CachedStream:
+    # events already sent for a request, and the schedules (sorted course_nids) they contain.
+    # incomplete when the client left before the search finished, the next request picks it up from here
+    payloads: list[str] = field(default_factory=list)
+    schedules: list[list[str]] = field(default_factory=list)
+    complete: bool = False
+
+    def size(self) -> int:
+        return sum(len(payload) for payload in self.payloads) + sum(
+            len(course_nid) for schedule in self.schedules for course_nid in schedule
+        )
+
+
+def _canonical_filter(f: dict) -> dict:
+    canonical = dict()
+    for key, value in f.items():
+        if isinstance(value, list):
+            # criteria are sets, an empty list is the same as not setting it
+            value = sorted(set(value)) or None
+        canonical[key] = value
+    return canonical
+
+
+def _canonical_conflict(fc: dict) -> tuple:
+    return fc["day"].lower(), fc["start"], fc["stop"]
+
+
+def request_fingerprint(endpoint: str, request: BaseModel, data_version: str) -> str:
+    """
+    key for a timetable request, requests that only differ in filter/conflict order or duplicates share a key
+    """
+    canonical = request.model_dump(mode="json")
+    if "filter_constraints" in canonical:
+        canonical["filter_constraints"] = sorted(
+            (_canonical_filter(f) for f in canonical["filter_constraints"]),
+            key=lambda f: json.dumps(f, sort_keys=True),
+        )
+    if "forced_conflicts" in canonical:
+        canonical["forced_conflicts"] = sorted(
+            {_canonical_conflict(fc) for fc in canonical["forced_conflicts"]}
+        )
+
+    payload = json.dumps([endpoint, data_version, canonical], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
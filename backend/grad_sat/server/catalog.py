@@ -0,0 +1,398 @@
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Optional
+
+from grad_sat.server.metrics import catalog_load_seconds
+
+if TYPE_CHECKING:
+    # pandas/ortools are only imported once a catalog is loaded, not when the server starts
+    import pandas as pd
+
+    from grad_sat.cp_sat.time_tables.section_store import SectionStore
+    from grad_sat.cp_sat.v2.feasability_model import ProgramMapFeas
+
+GRADUATION_PICKLE = "grad_sat/cp_sat/v2/uoit_courses_copy.pickle"
+
+# set on responses, the catalog version the request was answered from
+CATALOG_VERSION_HEADER = "X-Catalog-Version"
+
+# a catalog version is a directory under GRAD_SAT_CATALOG_DIR holding any of these, missing ones fall back to
+# the bundled data. versions are ordered by name, so name them by date/sequence (2025-09-01T0300, v0004, ...)
+VERSION_TERM_DATA = "data.term"
+VERSION_JSON = "data.json"
+VERSION_PICKLE = "courses.pickle"
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """
+    everything requests read about a term, built once per version and never modified after.
+    a request holds on to the catalog it started with, so swapping versions can't change data under it
+    """
+
+    version: str
+    # content hash of the term data, cache keys use this
+    data_version: str
+    section_store: "SectionStore"
+    graduation_courses: "pd.DataFrame"
+    course_maps: dict[str, "ProgramMapFeas"]
+    loaded_at: float = field(default_factory=time.time)
+
+
+def load_catalog(path: Optional[str] = None, version: Optional[str] = None) -> Catalog:
+    """
+    builds a catalog from a version directory, or from the bundled data when path is None
+    """
+    import pandas as pd
+
+    from grad_sat.cp_sat.time_tables.section_store import SectionStore
+    from grad_sat.cp_sat.time_tables.term_data import load_courses
+    from grad_sat.cp_sat.v2.feasability_model import get_cs_program_map_feas
+
+    term_path, pickle_path = None, GRADUATION_PICKLE
+    if path is not None:
+        for name in [VERSION_TERM_DATA, VERSION_JSON]:
+            if os.path.exists(os.path.join(path, name)):
+                term_path = os.path.join(path, name)
+                break
+        if os.path.exists(os.path.join(path, VERSION_PICKLE)):
+            pickle_path = os.path.join(path, VERSION_PICKLE)
+
+    # TT_TERM_DATA picks the bundled data's format, see load_courses
+    courses, data_version = load_courses(term_path or os.getenv("TT_TERM_DATA"))
+    return Catalog(
+        version=version or data_version,
+        data_version=data_version,
+        section_store=SectionStore(courses),
+        graduation_courses=pd.read_pickle(pickle_path),
+        course_maps={"computer-science": get_cs_program_map_feas()},
+    )
+
+
+def publish_catalog(
+    root: str,
+    version: str,
+    source: Optional[str] = None,
+    pickle_path: Optional[str] = None,
+) -> str:
+    """
+    writes a new catalog version for running servers to pick up, it's built next to the other versions and
+    renamed into place so watchers never see a half written version. source defaults to the bundled data.json
+    """
+    from grad_sat.cp_sat.time_tables.term_data import DATA_JSON, build_term_data
+
+    path = os.path.join(root, version)
+    assert not os.path.exists(path), f"catalog version {version} already exists"
+
+    tmp_path = os.path.join(root, f".{version}.tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    build_term_data(source or DATA_JSON, os.path.join(tmp_path, VERSION_TERM_DATA))
+    if pickle_path is not None:
+        shutil.copyfile(pickle_path, os.path.join(tmp_path, VERSION_PICKLE))
+
+    os.rename(tmp_path, path)
+    return path
+
+
+def newest_version(root: Optional[str]) -> Optional[str]:
+    if root is None or not os.path.isdir(root):
+        return None
+
+    versions = [
+        name
+        for name in os.listdir(root)
+        if not name.startswith(".") and os.path.isdir(os.path.join(root, name))
+    ]
+    return max(versions, default=None)
+
+
+class CatalogRegistry:
+    """
+    holds the active catalog and swaps in new versions as they're published under root, without a restart.
+    new versions are built on the watcher thread, requests keep being served from the active one meanwhile
+    and the swap itself is a single reference assignment.
+
+    nothing is loaded until load() (or the first request needing the catalog), so creating a registry is free
+    and the server can answer health checks while its catalog loads.
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        poll_interval: float = 30.0,
+        loader: Callable[[Optional[str], Optional[str]], Catalog] = load_catalog,
+        term: Optional[str] = None,
+    ):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.loader = loader
+        self.term = term
+
+        self.swaps = 0
+        self.last_error: Optional[str] = None
+        self._failed_versions: set[str] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._active: Optional[Catalog] = None
+
+    @property
+    def active(self) -> Catalog:
+        # read once per request and use that catalog for the whole request
+        catalog = self._active
+        return catalog if catalog is not None else self.load()
+
+    @property
+    def loaded(self) -> bool:
+        return self._active is not None
+
+    def load(self) -> Catalog:
+        """
+        loads the newest version if nothing is loaded yet, concurrent callers wait on the one load
+        """
+        if self._active is not None:
+            # without the lock, check() holds it while building a new version
+            return self._active
+        with self._lock:
+            if self._active is None:
+                self._active = self.__load(self.newest_version())
+            return self._active
+
+    def newest_version(self) -> Optional[str]:
+        return newest_version(self.root)
+
+    def __load(self, version: Optional[str]) -> Catalog:
+        start = time.perf_counter()
+        if version is None:
+            catalog = self.loader(None, None)
+        else:
+            catalog = self.loader(os.path.join(self.root, version), version)
+        catalog_load_seconds.observe(time.perf_counter() - start, term=self.term or "")
+        return catalog
+
+    def check(self) -> bool:
+        """
+        loads and activates the newest version if it isn't active yet, true if the catalog was swapped
+        """
+        with self._lock:
+            newest = self.newest_version()
+            if self._active is None or newest is None:
+                return False
+            if newest == self._active.version or newest in self._failed_versions:
+                return False
+
+            start = time.perf_counter()
+            try:
+                catalog = self.__load(newest)
+            except Exception as e:
+                # keep serving the active version, and don't rebuild a broken one every poll
+                print(f"failed to load catalog {newest}: {e}")
+                self.last_error = f"{newest}: {e}"
+                self._failed_versions.add(newest)
+                return False
+
+            previous = self._active.version
+            self._active = catalog
+            self.swaps += 1
+            print(f"catalog {previous} -> {newest} ({time.perf_counter() - start:.2f}s to build)")
+            return True
+
+    def start(self):
+        """
+        loads the catalog if it isn't yet and then watches root for new versions, both in the background
+        """
+        if self._watcher is not None:
+            return
+
+        def watch():
+            try:
+                self.load()
+            except Exception as e:
+                # requests retry the load, and fail with this until it works
+                print(f"failed to load catalog: {e}")
+                self.last_error = str(e)
+            if self.root is None:
+                return
+            while not self._stopped.wait(self.poll_interval):
+                self.check()
+
+        self._watcher = threading.Thread(target=watch, name="catalog_watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def status(self) -> dict:
+        catalog = self._active
+        return {
+            "version": None if catalog is None else catalog.version,
+            "data_version": None if catalog is None else catalog.data_version,
+            "loaded_at": None if catalog is None else catalog.loaded_at,
+            "swaps": self.swaps,
+            "last_error": self.last_error,
+        }
+
+
+class UnknownTermError(KeyError):
+    pass
+
+
+class TermCatalogs:
+    """
+    catalogs for the terms under root (root/<term>/<version>, each term is versioned like the default catalog).
+    a term is loaded the first time it's asked for and at most max_loaded terms are kept, the least recently
+    used one is dropped to make room. requests still holding a dropped term's catalog finish on it.
+    requests without a term use the default registry, which is always loaded.
+    """
+
+    def __init__(
+        self,
+        default: CatalogRegistry,
+        root: Optional[str] = None,
+        max_loaded: int = 2,
+        poll_interval: float = 30.0,
+        loader: Callable[[Optional[str], Optional[str]], Catalog] = load_catalog,
+    ):
+        assert max_loaded >= 1, "max_loaded has to fit at least one term"
+        self.default = default
+        self.root = root
+        self.max_loaded = max_loaded
+        self.poll_interval = poll_interval
+        self.loader = loader
+
+        self.loads = 0
+        self.evictions = 0
+        self._started = False
+        self._lock = threading.Lock()
+        self._term_locks: dict[str, threading.Lock] = dict()
+        self._loaded: OrderedDict[str, CatalogRegistry] = OrderedDict()
+
+    def terms(self) -> list[str]:
+        # terms with at least one published version
+        if self.root is None or not os.path.isdir(self.root):
+            return []
+
+        terms = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            if newest_version(path) is not None:
+                terms.append(name)
+        return sorted(terms)
+
+    def get(self, term: Optional[int | str] = None) -> Catalog:
+        """
+        the active catalog of a term, loading it if it isn't already
+        """
+        if term is None:
+            return self.default.active
+
+        term = str(term)
+        with self._lock:
+            registry = self._loaded.get(term)
+            if registry is not None:
+                self._loaded.move_to_end(term)
+                return registry.active
+
+            if term not in self.terms():
+                raise UnknownTermError(term)
+            term_lock = self._term_locks.setdefault(term, threading.Lock())
+
+        # built outside the main lock so requests for loaded terms aren't held up, concurrent requests
+        # for the same cold term wait on the one load
+        with term_lock:
+            with self._lock:
+                registry = self._loaded.get(term)
+            if registry is None:
+                start = time.perf_counter()
+                registry = CatalogRegistry(
+                    root=os.path.join(self.root, term),
+                    poll_interval=self.poll_interval,
+                    loader=self.loader,
+                    term=term,
+                )
+                registry.load()
+                print(f"loaded term {term} ({time.perf_counter() - start:.2f}s to build)")
+                self.__add(term, registry)
+
+        return registry.active
+
+    def __add(self, term: str, registry: CatalogRegistry):
+        evicted: list[tuple[str, CatalogRegistry]] = []
+        with self._lock:
+            self._loaded[term] = registry
+            self.loads += 1
+            while len(self._loaded) > self.max_loaded:
+                evicted.append(self._loaded.popitem(last=False))
+                self.evictions += 1
+            if self._started:
+                registry.start()
+
+        for evicted_term, evicted_registry in evicted:
+            evicted_registry.stop()
+            print(f"evicted term {evicted_term}")
+
+    def start(self):
+        self.default.start()
+        with self._lock:
+            self._started = True
+            for registry in self._loaded.values():
+                registry.start()
+
+    def stop(self):
+        with self._lock:
+            self._started = False
+            registries = list(self._loaded.values())
+        for registry in registries:
+            registry.stop()
+        self.default.stop()
+
+    def status(self) -> dict:
+        with self._lock:
+            loaded = {term: registry.status() for term, registry in self._loaded.items()}
+        return {
+            **self.default.status(),
+            "terms": {
+                "available": self.terms(),
+                "loaded": loaded,
+                "max_loaded": self.max_loaded,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            },
+        }
+
+
+catalogs = CatalogRegistry(
+    root=os.getenv("GRAD_SAT_CATALOG_DIR"),
+    poll_interval=float(os.getenv("GRAD_SAT_CATALOG_POLL", 30.0)),
+)
+
+# every loaded term holds a section store and graduation data in memory, GRAD_SAT_MAX_TERMS bounds that
+term_catalogs = TermCatalogs(
+    default=catalogs,
+    root=os.getenv("GRAD_SAT_TERMS_DIR"),
+    max_loaded=int(os.getenv("GRAD_SAT_MAX_TERMS", 2)),
+    poll_interval=float(os.getenv("GRAD_SAT_CATALOG_POLL", 30.0)),
+)
+
+
+if __name__ == "__main__":
+    # publish the bundled data as a new version, ie. after a scrape rebuilt data.json.
+    # with GRAD_SAT_TERM set it's published as a version of that term instead of the default catalog
+    term = os.getenv("GRAD_SAT_TERM")
+    if term is None:
+        root = os.getenv("GRAD_SAT_CATALOG_DIR", "catalogs")
+    else:
+        root = os.path.join(os.getenv("GRAD_SAT_TERMS_DIR", "terms"), term)
+    os.makedirs(root, exist_ok=True)
+    print(publish_catalog(root, time.strftime("%Y-%m-%dT%H%M%S"), pickle_path=GRADUATION_PICKLE))
@@ -0,0 +1,303 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# how long a job can take from being accepted to its result, queueing included
+DEFAULT_DEADLINE = 30.0
+# a solver that finished right at the deadline still has to send its result back
+DEADLINE_GRACE = 1.0
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def time_limit(deadline: Optional[float], default: float) -> float:
+    """
+    solver time limit for a job, whatever is left before the deadline if that's less than the default
+    """
+    if deadline is None:
+        return default
+    return max(0.01, min(default, deadline - time.time()))
+
+
+def _init_worker():
+    # ctrl-c goes to the whole process group, let the server shut the pool down instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # a forked worker inherits the server's handlers, terminating the pool has to actually stop it
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.set_wakeup_fd(-1)
+
+    # the default catalog is loaded before the worker takes jobs, later versions are picked up like in the server
+    from grad_sat.server.catalog import term_catalogs
+
+    term_catalogs.default.load()
+    term_catalogs.start()
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+def _run_job(fn: Callable, deadline: Optional[float], args: tuple) -> tuple[Any, float]:
+    # runs in a worker, returns the result and how long it took (busy time, without queueing)
+    if deadline is not None and time.time() >= deadline:
+        raise DeadlineExceeded("deadline passed while queued")
+
+    start = time.perf_counter()
+    result = fn(*args, deadline=deadline)
+    return result, time.perf_counter() - start
+
+
+class SolverExecutor:
+    """
+    runs solves in a pool of worker processes, each with the catalogs already loaded, so model building
+    (pandas, holding the gil) doesn't stall the server and solves don't tie up the request threadpool.
+
+    at most workers + max_queue jobs are accepted at once, past that requests get a 503 with a Retry-After
+    instead of queueing without bound. every job has a deadline, passed to the job so it can cap its solver
+    time limit, and the request gets a 504 if the result isn't back by then.
+
+    a worker dying (oom killed, a crash in ortools) breaks the whole pool, it's replaced with a new one and the
+    jobs that were in it get a 503.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        deadline: float = DEFAULT_DEADLINE,
+        start_method: str = "spawn",
+    ):
+        assert workers >= 1, "need at least one worker"
+        self.workers = workers
+        self.max_queue = max_queue
+        self.deadline = deadline
+        # spawned by default, the server has threads (catalog watcher, threadpool) by the time it's started.
+        # preforked servers fork them instead, before starting any threads, see prefork.preload
+        self.start_method = start_method
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.restarts = 0
+        self.in_flight = 0
+        self.busy_seconds = 0.0
+        # moving average of how long a job runs, used for Retry-After
+        self.average_job_seconds = 1.0
+        self.started_at = time.time()
+
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # pids of the workers that have loaded their catalogs
+        self._warm_workers: set[int] = set()
+
+    def start(self):
+        """
+        starts the workers and has each load its catalogs, without waiting for them
+        """
+        with self._lock:
+            if self._pool is not None:
+                return
+            pool = self._pool = self.__new_pool(self.start_method)
+            self.started_at = time.time()
+        self.__warm(pool)
+
+    def __new_pool(self, start_method: str) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+        )
+
+    def __warm(self, pool: ProcessPoolExecutor):
+        for _ in range(self.workers):
+            pool.submit(_ready).add_done_callback(self.__warmed)
+
+    def __replace(self, broken: ProcessPoolExecutor) -> Optional[ProcessPoolExecutor]:
+        """
+        swaps out a pool that lost a worker, only the first job to notice does it. the pool to submit to after,
+        None if the executor was shut down in the meantime
+        """
+        with self._lock:
+            if self._pool is not broken:
+                return self._pool
+            # forking now would copy whatever locks the server's threads (catalog watcher, logging, the
+            # threadpool) hold into the new workers, only the first pool (forked before any threads) is safe to
+            # fork. replacements are spawned and load their catalogs themselves
+            start_method = "spawn" if self.start_method == "fork" else self.start_method
+            pool = self._pool = self.__new_pool(start_method)
+            # not ready again until a new worker has loaded its catalogs
+            self._warm_workers.clear()
+            self.restarts += 1
+        logger.error("a solver worker died, restarting the pool (%d restarts)", self.restarts)
+        _terminate(broken)
+        self.__warm(pool)
+        return pool
+
+    def __warmed(self, future: Future):
+        if not future.cancelled() and future.exception() is None:
+            with self._lock:
+                self._warm_workers.add(future.result())
+
+    def worker_pids(self) -> list[int]:
+        with self._lock:
+            return sorted(self._warm_workers)
+
+    def ready(self) -> bool:
+        # a worker can take jobs (a cold pool would make the first requests wait on catalog loads). a pool that
+        # lost a worker is replaced here too, so probes don't wait on the next job to notice
+        pool = self._pool
+        if pool is not None and pool._broken:
+            self.__replace(pool)
+        return self._pool is not None and len(self._warm_workers) > 0
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self._warm_workers.clear()
+        if pool is not None:
+            _terminate(pool)
+
+    def retry_after(self) -> int:
+        # seconds until a slot is likely free, roughly the queue ahead of it worked off by every worker
+        queued = max(0, self.in_flight - self.workers)
+        return max(1, math.ceil(self.average_job_seconds * (queued + 1) / self.workers))
+
+    def saturated(self) -> bool:
+        return self.in_flight >= self.workers + self.max_queue
+
+    def busy_error(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail="solver is busy, try again later",
+            headers={"Retry-After": str(self.retry_after())},
+        )
+
+    def __admit(self) -> bool:
+        with self._lock:
+            if self.saturated():
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            self.submitted += 1
+            return True
+
+    def __done(self, future: Future):
+        # runs once the worker is actually finished, a request that timed out keeps its slot until then
+        with self._lock:
+            self.in_flight -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self.failed += 1
+                return
+
+            _, elapsed = future.result()
+            self.completed += 1
+            self.busy_seconds += elapsed
+            self.average_job_seconds = 0.8 * self.average_job_seconds + 0.2 * elapsed
+
+    async def submit(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """
+        runs fn(*args, deadline=...) in a worker and returns its result. fn has to be a module level
+        function and args picklable. raises 503 when saturated and 504 past the deadline (timeout seconds
+        from now, the executor's default deadline if not set)
+        """
+        if not self.__admit():
+            raise self.busy_error()
+
+        if self._pool is None:
+            self.start()
+
+        timeout = self.deadline if timeout is None else timeout
+        job_deadline = time.time() + timeout
+        pool = self._pool
+        try:
+            try:
+                future = pool.submit(_run_job, fn, job_deadline, args)
+            except BrokenProcessPool:
+                pool = self.__replace(pool)
+                if pool is None:
+                    raise self.busy_error()
+                future = pool.submit(_run_job, fn, job_deadline, args)
+        except Exception:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+        future.add_done_callback(self.__done)
+
+        try:
+            result, _ = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)), timeout=timeout + DEADLINE_GRACE
+            )
+            return result
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            # still queued jobs are dropped, running ones stop at their time limit
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+            raise HTTPException(status_code=504, detail=f"solve didn't finish within {timeout:.0f}s")
+        except BrokenProcessPool:
+            # this job or another one in the pool took a worker down with it
+            self.__replace(pool)
+            raise HTTPException(
+                status_code=503,
+                detail="solver restarted, try again",
+                headers={"Retry-After": str(self.retry_after())},
+            )
+        except Exception:
+            logger.exception("solver job %s failed", getattr(fn, "__name__", fn))
+            raise HTTPException(status_code=500, detail="solver failed")
+
+    def stats(self) -> dict:
+        with self._lock:
+            running = min(self.in_flight, self.workers)
+            uptime = max(time.time() - self.started_at, 1e-9)
+            return {
+                "workers": self.workers,
+                "warm_workers": len(self._warm_workers),
+                "max_queue": self.max_queue,
+                "deadline": self.deadline,
+                "running": running,
+                "queue_depth": self.in_flight - running,
+                "utilisation": running / self.workers,
+                "average_utilisation": min(1.0, self.busy_seconds / (uptime * self.workers)),
+                "average_job_seconds": self.average_job_seconds,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "restarts": self.restarts,
+            }
+
+
+def _terminate(pool: ProcessPoolExecutor):
+    # a forked worker holds copies of the pool's pipes and would never see the server go away, stop the
+    # workers outright (a running solve is abandoned either way)
+    workers = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for worker in workers:
+        worker.terminate()
+
+
+solver_executor = SolverExecutor(
+    workers=int(os.getenv("GRAD_SAT_SOLVER_WORKERS", os.cpu_count() or 1)),
+    max_queue=int(os.getenv("GRAD_SAT_SOLVER_QUEUE", 16)),
+    deadline=float(os.getenv("GRAD_SAT_SOLVER_DEADLINE", DEFAULT_DEADLINE)),
+)
@@ -0,0 +1,304 @@
+import json
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Optional
+
+# how long a finished job (and its events) is kept around for clients to collect
+DEFAULT_JOB_TTL = 600.0
+
+
+class JobStatus(Enum):
+    Queued = "queued"
+    Running = "running"
+    Succeeded = "succeeded"
+    Failed = "failed"
+
+
+FINISHED = {JobStatus.Succeeded, JobStatus.Failed}
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    status: JobStatus = JobStatus.Queued
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    # latest solution found while running, and the response once it's done
+    best: Optional[dict] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status.value,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "best": self.best,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class MemoryJobStore:
+    """
+    jobs kept in this process, they're gone on restart and other server processes can't see them
+    """
+
+    def __init__(self, ttl: float = DEFAULT_JOB_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._jobs: dict[str, Job] = dict()
+        self._events: dict[str, list[dict]] = dict()
+
+    def create(self, kind: str) -> Job:
+        self.purge_expired()
+        job = Job(id=uuid.uuid4().hex, kind=kind)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._events[job.id] = []
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or self.__expired(job):
+                return None
+            return Job(**job.__dict__)
+
+    def update(self, job_id: str, **changes):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.updated_at = time.time()
+
+    def add_event(self, job_id: str, event: dict) -> int:
+        with self._lock:
+            events = self._events.get(job_id)
+            if events is None:
+                return 0
+            events.append(event)
+            return len(events)
+
+    def events(self, job_id: str, after: int = 0) -> list[tuple[int, dict]]:
+        # events numbered from 1, the ones after the given number
+        with self._lock:
+            events = self._events.get(job_id, [])
+            return [(seq, event) for seq, event in enumerate(events[after:], start=after + 1)]
+
+    def __expired(self, job: Job) -> bool:
+        return job.finished and time.time() - job.updated_at > self.ttl
+
+    def purge_expired(self):
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items() if self.__expired(job)]:
+                del self._jobs[job_id]
+                del self._events[job_id]
+
+
+class SqliteJobStore:
+    """
+    jobs kept in a sqlite database, survives restarts and is shared by every server process on the machine
+    (a job is still run by the process that accepted it)
+    """
+
+    def __init__(self, path: str, ttl: float = DEFAULT_JOB_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT, status TEXT, created_at REAL, updated_at REAL, "
+            "best TEXT, result TEXT, error TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            "job_id TEXT, seq INTEGER, event TEXT, PRIMARY KEY (job_id, seq))"
+        )
+
+    def create(self, kind: str) -> Job:
+        self.purge_expired()
+        job = Job(id=uuid.uuid4().hex, kind=kind)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, NULL, NULL, NULL)",
+                (job.id, job.kind, job.status.value, job.created_at, job.updated_at),
+            )
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, status, created_at, updated_at, best, result, error FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+
+        job = Job(
+            id=row[0],
+            kind=row[1],
+            status=JobStatus(row[2]),
+            created_at=row[3],
+            updated_at=row[4],
+            best=None if row[5] is None else json.loads(row[5]),
+            result=None if row[6] is None else json.loads(row[6]),
+            error=row[7],
+        )
+        if job.finished and time.time() - job.updated_at > self.ttl:
+            return None
+        return job
+
+    def update(self, job_id: str, **changes):
+        columns, values = ["updated_at = ?"], [time.time()]
+        for name, value in changes.items():
+            if name == "status":
+                value = value.value
+            elif name in ["best", "result"] and value is not None:
+                value = json.dumps(value)
+            columns.append(f"{name} = ?")
+            values.append(value)
+
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {', '.join(columns)} WHERE id = ?", (*values, job_id))
+
+    def add_event(self, job_id: str, event: dict) -> int:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                (seq,) = self._db.execute(
+                    "SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                self._db.execute(
+                    "INSERT INTO job_events VALUES (?, ?, ?)", (job_id, seq, json.dumps(event))
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return seq
+
+    def events(self, job_id: str, after: int = 0) -> list[tuple[int, dict]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after),
+            ).fetchall()
+        return [(seq, json.loads(event)) for seq, event in rows]
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl
+        finished = tuple(status.value for status in FINISHED)
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM job_events WHERE job_id IN "
+                "(SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?)",
+                (*finished, cutoff),
+            )
+            self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (*finished, cutoff)
+            )
+
+
+JobStore = MemoryJobStore | SqliteJobStore
+
+
+def create_job_store() -> JobStore:
+    # GRAD_SAT_JOB_STORE=memory (default) or sqlite, with the database at GRAD_SAT_JOB_DB
+    ttl = float(os.getenv("GRAD_SAT_JOB_TTL", DEFAULT_JOB_TTL))
+    if os.getenv("GRAD_SAT_JOB_STORE", "memory") == "sqlite":
+        return SqliteJobStore(os.getenv("GRAD_SAT_JOB_DB", "jobs.sqlite3"), ttl=ttl)
+    return MemoryJobStore(ttl=ttl)
+
+
+class ProgressReporter:
+    """
+    handed to a job running in a solver worker, sends its progress events back through a manager queue.
+    picklable, so it can be passed as a job argument
+    """
+
+    def __init__(self, events: "queue.Queue", job_id: str):
+        self.events = events
+        self.job_id = job_id
+
+    def __call__(self, event: dict):
+        self.events.put((self.job_id, event))
+
+
+# the last event a job sends, its outcome
+TERMINAL_EVENTS = {"finished", "failed"}
+
+
+class ProgressChannel:
+    """
+    collects progress events from jobs running in solver workers. workers put (job id, event) on a queue
+    owned by a manager process and a thread here hands them to the job's on_event in the order they were
+    sent. a job is forgotten after its terminal event
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._manager = None
+        self._queue = None
+        self._drain: Optional[threading.Thread] = None
+        self._handlers: dict[str, Callable[[str, dict], None]] = dict()
+
+    def reporter(self, job_id: str, on_event: Callable[[str, dict], None]) -> ProgressReporter:
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context("spawn").Manager()
+                self._queue = self._manager.Queue()
+                self._drain = threading.Thread(target=self.__drain, name="job_progress", daemon=True)
+                self._drain.start()
+            self._handlers[job_id] = on_event
+            return ProgressReporter(self._queue, job_id)
+
+    def __drain(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            job_id, event = item
+            with self._lock:
+                if event["type"] in TERMINAL_EVENTS:
+                    on_event = self._handlers.pop(job_id, None)
+                else:
+                    on_event = self._handlers.get(job_id)
+            if on_event is None:
+                continue
+
+            try:
+                on_event(job_id, event)
+            except Exception as e:
+                print(f"failed to record progress of job {job_id}: {e}")
+
+    def stop(self):
+        with self._lock:
+            manager, self._manager = self._manager, None
+            if manager is None:
+                return
+            self._handlers.clear()
+        self._queue.put(None)
+        self._drain.join()
+        manager.shutdown()
+
+
+progress_channel = ProgressChannel()
@@ -1,17 +1,69 @@
 import os
-from fastapi import FastAPI
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
-from grad_sat.server.routers import misc, graduation, time_tables
+from grad_sat.server.budget import BUDGET_HEADER
+from grad_sat.server.catalog import term_catalogs
+from grad_sat.server.executor import solver_executor
+from grad_sat.server.jobs import progress_channel
+from grad_sat.server.metrics import registry, request_seconds
+from grad_sat.server.timing import SERVER_TIMING_HEADER, RequestTiming
+from grad_sat.server.routers import misc, graduation, time_tables, jobs
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # workers load their catalogs while the server starts up. started before any threads, preforked servers
+    # fork them
+    solver_executor.start()
+    # loads the catalog and picks up versions published while the server is running, in the background so
+    # /health answers right away (/ready once it's loaded)
+    term_catalogs.start()
+    threading.Thread(target=time_tables.import_solver, name="import_solver", daemon=True).start()
+    # preforked workers share their metrics with whichever worker a scrape reaches
+    registry.start_dumping()
+    yield
+    solver_executor.shutdown()
+    progress_channel.stop()
+    term_catalogs.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(misc.router)
 app.include_router(graduation.router)
 app.include_router(time_tables.router)
+app.include_router(jobs.router)
+
+
+@app.middleware("http")
+async def time_request(request: Request, call_next):
+    timing = request.state.timing = RequestTiming()
+    response = await call_next(request)
+    # solve endpoints break their time down by phase
+    if timing.durations:
+        response.headers[SERVER_TIMING_HEADER] = timing.finish()
+        # browsers only show other origins' Server-Timing to the pages they allow
+        if os.getenv("UI_URL"):
+            response.headers["Timing-Allow-Origin"] = os.getenv("UI_URL")
+
+    # labelled by route template (/jobs/{job_id}) not path, unmatched paths share a label
+    route = request.scope.get("route")
+    request_seconds.observe(
+        time.perf_counter() - timing.received_at,
+        route=getattr(route, "path", "unmatched"),
+        method=request.method,
+        status=response.status_code,
+    )
+    return response
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,4 +71,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[SERVER_TIMING_HEADER, BUDGET_HEADER],
 )
+
+
+def main():
+    # the server script, GRAD_SAT_WORKERS workers forked from one process that loaded the catalog for them
+    from grad_sat.server.prefork import serve
+
+    serve(
+        workers=int(os.getenv("GRAD_SAT_WORKERS", 1)),
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", 8000)),
+    )
@@ -0,0 +1,377 @@
+import bisect
+import math
+import os
+import pickle
+import threading
+import time
+from typing import Callable, Optional
+
+# prometheus text exposition format, see https://prometheus.io/docs/instrumenting/exposition_formats/
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+GAP_BUCKETS = (0.0, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# set by a preforked server (see prefork.serve), where each worker has its own registry. every worker writes
+# its metrics to <dir>/<pid>.metrics, a scrape (answered by any one worker) adds them all up
+METRICS_DIR_ENV = "GRAD_SAT_METRICS_DIR"
+# seconds between workers writing their metrics for the others' scrapes
+DUMP_INTERVAL = 5.0
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    labels = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        assert set(labels) == set(self.labels), f"{self.name} takes labels {self.labels}, got {tuple(labels)}"
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self, values: Optional[dict] = None, labels: Optional[tuple[str, ...]] = None) -> list[str]:
+        # values (and labels) are merged ones from every worker when set, this process' own otherwise
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples(self.snapshot() if values is None else values, labels or self.labels))
+        return lines
+
+    def snapshot(self) -> dict:
+        raise NotImplementedError
+
+    def merge(self, snapshots: dict[int, dict]) -> tuple[dict, tuple[str, ...]]:
+        """
+        one set of values (and the labels they're under) from each worker's snapshot, keyed by pid
+        """
+        raise NotImplementedError
+
+    def _samples(self, values: dict, labels: tuple[str, ...]) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = dict()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, value: float, **labels):
+        # for totals counted elsewhere (ie. cache hits), copied over when scraped
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, snapshots: dict[int, dict]) -> tuple[dict, tuple[str, ...]]:
+        # totals of every worker, ones that have exited included so the sum never goes down
+        merged = dict()
+        for values in snapshots.values():
+            for key, value in values.items():
+                merged[key] = merged.get(key, 0.0) + value
+        return merged, self.labels
+
+    def _samples(self, values: dict, labels: tuple[str, ...]) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(labels, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def merge(self, snapshots: dict[int, dict]) -> tuple[dict, tuple[str, ...]]:
+        # a gauge is one worker's current state (its queue, its caches), kept apart under a worker label
+        merged = {
+            (*key, str(pid)): value
+            for pid, values in snapshots.items()
+            for key, value in values.items()
+        }
+        return merged, (*self.labels, "worker")
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = SECONDS_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: count in each bucket (not cumulative, +Inf last), sum
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = dict()
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def snapshot(self) -> dict:
+        # per label set: (bucket counts, sum)
+        with self._lock:
+            return {key: (list(counts), total[0]) for key, (counts, total) in self._values.items()}
+
+    def merge(self, snapshots: dict[int, dict]) -> tuple[dict, tuple[str, ...]]:
+        merged = dict()
+        for values in snapshots.values():
+            for key, (counts, total) in values.items():
+                merged_counts, merged_total = merged.get(key, ([0] * len(counts), 0.0))
+                merged[key] = ([a + b for a, b in zip(merged_counts, counts)], merged_total + total)
+        return merged, self.labels
+
+    def _samples(self, values: dict, labels: tuple[str, ...]) -> list[str]:
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    the metrics this process exports. collectors run right before rendering, for values that live
+    elsewhere (cache and executor stats) and are cheaper to copy when scraped than to keep updated.
+
+    in a preforked server (GRAD_SAT_METRICS_DIR set) a scrape reaches whichever worker accepted it, so every
+    worker writes its metrics to the directory and renders the sum of all of them: counters and histograms
+    added up, gauges labelled by worker (live workers only)
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = dict()
+        self._collectors: list[Callable[[], None]] = []
+        # collectors clear and refill metrics, one collection at a time
+        self._collect_lock = threading.Lock()
+        self._dumper: Optional[threading.Thread] = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        assert metric.name not in self._metrics, f"{metric.name} registered twice"
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(
+        self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = SECONDS_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def on_collect(self, collector: Callable[[], None]):
+        self._collectors.append(collector)
+
+    def collect(self) -> dict[str, dict]:
+        # runs the collectors, then a snapshot of every metric
+        with self._collect_lock:
+            for collector in self._collectors:
+                collector()
+            return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def render(self) -> str:
+        snapshot = self.collect()
+        root = os.getenv(METRICS_DIR_ENV)
+        lines = []
+        if not root:
+            for name, metric in self._metrics.items():
+                lines.extend(metric.render(snapshot[name]))
+            return "\n".join(lines) + "\n"
+
+        self.__dump(root, snapshot)
+        snapshots = _load_snapshots(root)
+        for name, metric in self._metrics.items():
+            if isinstance(metric, Gauge):
+                # an exited worker's state is gone with it
+                per_worker = {pid: s.get(name, {}) for pid, s in snapshots.items() if _alive(pid)}
+            else:
+                per_worker = {pid: s.get(name, {}) for pid, s in snapshots.items()}
+            values, labels = metric.merge(per_worker)
+            lines.extend(metric.render(values, labels))
+        return "\n".join(lines) + "\n"
+
+    def start_dumping(self, interval: float = DUMP_INTERVAL):
+        """
+        writes this worker's metrics to GRAD_SAT_METRICS_DIR every interval seconds, so scrapes answered by
+        other workers are at most that far behind. nothing to do when it isn't set
+        """
+        root = os.getenv(METRICS_DIR_ENV)
+        if not root or self._dumper is not None:
+            return
+
+        def dump():
+            while True:
+                try:
+                    self.__dump(root, self.collect())
+                except OSError:
+                    # the master removes the directory once the workers are stopped
+                    return
+                time.sleep(interval)
+
+        self._dumper = threading.Thread(target=dump, name="metrics_dump", daemon=True)
+        self._dumper.start()
+
+    def __dump(self, root: str, snapshot: dict[str, dict]):
+        path = os.path.join(root, f"{os.getpid()}.metrics")
+        # scrapes and the dump thread can both be writing it
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+
+def _load_snapshots(root: str) -> dict[int, dict[str, dict]]:
+    snapshots = dict()
+    for name in os.listdir(root):
+        if not name.endswith(".metrics"):
+            continue
+        try:
+            with open(os.path.join(root, name), "rb") as f:
+                snapshots[int(name.removesuffix(".metrics"))] = pickle.load(f)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            continue
+    return snapshots
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+registry = MetricsRegistry()
+
+request_seconds = registry.histogram(
+    "grad_sat_request_duration_seconds",
+    "time to respond to a request (to the first byte for streams)",
+    ("route", "method", "status"),
+)
+phase_seconds = registry.histogram(
+    "grad_sat_phase_duration_seconds",
+    "time spent in each phase of a solve",
+    ("endpoint", "phase", "program_map", "profile"),
+)
+solves = registry.counter(
+    "grad_sat_solves_total",
+    "cp-sat solves by final status",
+    ("endpoint", "model", "status", "program_map", "profile"),
+)
+solver_wall_seconds = registry.histogram(
+    "grad_sat_solver_wall_time_seconds",
+    "cp-sat wall time per solve",
+    ("endpoint", "model", "program_map", "profile"),
+)
+solver_conflicts = registry.histogram(
+    "grad_sat_solver_conflicts",
+    "cp-sat conflicts per solve",
+    ("endpoint", "model", "program_map", "profile"),
+    COUNT_BUCKETS,
+)
+solver_branches = registry.histogram(
+    "grad_sat_solver_branches",
+    "cp-sat branches per solve",
+    ("endpoint", "model", "program_map", "profile"),
+    COUNT_BUCKETS,
+)
+solver_gap = registry.histogram(
+    "grad_sat_solver_objective_gap",
+    "relative gap between the objective and best bound when the solve ended",
+    ("endpoint", "model", "program_map", "profile"),
+    GAP_BUCKETS,
+)
+model_variables = registry.histogram(
+    "grad_sat_model_variables",
+    "variables in a solved model",
+    ("endpoint", "model", "program_map", "profile"),
+    COUNT_BUCKETS,
+)
+model_constraints = registry.histogram(
+    "grad_sat_model_constraints",
+    "constraints in a solved model",
+    ("endpoint", "model", "program_map", "profile"),
+    COUNT_BUCKETS,
+)
+solver_budget_seconds = registry.histogram(
+    "grad_sat_solver_budget_seconds",
+    "time limit a job's solves were granted, shrunk from the full limit under load",
+    ("endpoint", "program_map", "profile"),
+)
+catalog_load_seconds = registry.histogram(
+    "grad_sat_catalog_load_duration_seconds",
+    "time to load a catalog version in the server process",
+    ("term",),
+)
+
+
+def record_solve(endpoint: str, report: dict, program_map: str = "", profile: str = ""):
+    """
+    records a job's phase timings and solver stats, report is what the job returned alongside its result:
+    {"phases": {phase: seconds}, "solvers": [{"model": name, **solver_statistics(...)}], "budget": granted(...)}
+    """
+    labels = {"endpoint": endpoint, "program_map": program_map, "profile": profile}
+    for phase, seconds in report.get("phases", {}).items():
+        phase_seconds.observe(seconds, phase=phase, **labels)
+    if "budget" in report:
+        solver_budget_seconds.observe(report["budget"]["time_limit"], **labels)
+
+    for stats in report.get("solvers", []):
+        model = stats.get("model", "")
+        solves.inc(status=stats["status"], model=model, **labels)
+        if "wall_time" in stats:
+            solver_wall_seconds.observe(stats["wall_time"], model=model, **labels)
+            solver_conflicts.observe(stats["conflicts"], model=model, **labels)
+            solver_branches.observe(stats["branches"], model=model, **labels)
+        if "gap" in stats:
+            solver_gap.observe(stats["gap"], model=model, **labels)
+        if "variables" in stats:
+            model_variables.observe(stats["variables"], model=model, **labels)
+            model_constraints.observe(stats["constraints"], model=model, **labels)
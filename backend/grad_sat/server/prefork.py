@@ -0,0 +1,213 @@
+import gc
+import logging
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from typing import Optional
+
+from grad_sat.server.metrics import METRICS_DIR_ENV
+
+logger = logging.getLogger(__name__)
+
+# a worker exiting sooner than this after it was forked failed to start
+MIN_WORKER_UPTIME = 10.0
+# restarting a worker that failed to start waits twice as long as the last time, up to this
+MAX_RESTART_DELAY = 30.0
+# the master gives up (stopping the other workers) after this many failed starts in a row
+MAX_FAILED_STARTS = 5
+
+# /proc/<pid>/smaps_rollup fields (kB) for each figure memory_usage reports
+_ROLLUP_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Private_Clean": "uss",
+    "Private_Dirty": "uss",
+}
+
+
+def memory_usage(pid: int | str = "self") -> dict[str, int]:
+    """
+    bytes of memory a process uses: rss counts pages it shares with other processes in full, pss splits
+    them between the processes sharing them and uss is what only it uses (what stopping it would free)
+    """
+    usage = {"rss": 0, "pss": 0, "uss": 0}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in _ROLLUP_FIELDS:
+                usage[_ROLLUP_FIELDS[name]] += int(value.split()[0]) * 1024
+    return usage
+
+
+def child_pids(pid: int) -> list[int]:
+    # every process under pid, children before their own children
+    pids, queue = [], [pid]
+    while queue:
+        parent = queue.pop(0)
+        try:
+            with open(f"/proc/{parent}/task/{parent}/children") as f:
+                children = [int(child) for child in f.read().split()]
+        except FileNotFoundError:
+            continue
+        pids.extend(children)
+        queue.extend(children)
+    return pids
+
+
+def preload():
+    """
+    everything the server workers would otherwise each load themselves: the app, the default catalog and the
+    solver modules. forked workers share these pages with the master until they write to them
+    """
+    from grad_sat.server.catalog import term_catalogs
+    from grad_sat.server.executor import solver_executor
+    from grad_sat.server.main import app  # noqa: F401
+    from grad_sat.server.routers.time_tables import import_solver
+
+    term_catalogs.default.load()
+    import_solver()
+    import grad_sat.cp_sat.v2.feasability_model  # noqa: F401
+
+    # solver workers are forked from the server workers (which have all of this) instead of spawned and
+    # loading it again
+    solver_executor.start_method = "fork"
+
+    # objects loaded so far live as long as the workers do, frozen the collector never visits them, so it
+    # doesn't write to (and un-share) their pages
+    gc.collect()
+    gc.freeze()
+
+
+def _serve_worker(sock: socket.socket, host: str, port: int):
+    import uvicorn
+
+    from grad_sat.server.main import app
+
+    # the master's handlers, uvicorn installs its own
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    uvicorn.Server(uvicorn.Config(app, host=host, port=port)).run(sockets=[sock])
+
+
+def metrics_dir() -> tuple[str, bool]:
+    """
+    the directory workers share their metrics through (GRAD_SAT_METRICS_DIR or a new temporary one), cleared
+    of an earlier run's, and whether it was created here
+    """
+    root = os.getenv(METRICS_DIR_ENV)
+    if not root:
+        return tempfile.mkdtemp(prefix="grad_sat_metrics_"), True
+
+    os.makedirs(root, exist_ok=True)
+    for name in os.listdir(root):
+        if name.endswith(".metrics"):
+            os.remove(os.path.join(root, name))
+    return root, False
+
+
+def serve(workers: int, host: str = "0.0.0.0", port: int = 8000):
+    """
+    preloads the server then forks workers serving from one listening socket, restarting any that die (with
+    a growing delay while they fail to start, giving up after MAX_FAILED_STARTS). SIGTERM/SIGINT stops the
+    workers (each shuts down gracefully) and then the master
+    """
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(name)s %(levelname)s %(message)s")
+    # set before forking, every worker's /metrics adds up all of theirs
+    root, temporary = metrics_dir()
+    os.environ[METRICS_DIR_ENV] = root
+    preload()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # pid -> when it was forked
+    children: dict[int, float] = dict()
+    stopping = False
+    failed_starts = 0
+
+    def stop(sig: int, _):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def fork_worker() -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _serve_worker(sock, host, port)
+            except BaseException:
+                logger.exception("worker %d failed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+        return pid
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        fork_worker()
+    logger.info("serving on %s:%d with workers %s, master %d", host, port, sorted(children), os.getpid())
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            if pid not in children:
+                continue
+            forked_at = children.pop(pid)
+            if stopping:
+                continue
+
+            if time.monotonic() - forked_at < MIN_WORKER_UPTIME:
+                failed_starts += 1
+            else:
+                failed_starts = 0
+            if failed_starts >= MAX_FAILED_STARTS:
+                logger.error("workers failed to start %d times in a row, stopping", failed_starts)
+                stop(signal.SIGTERM, None)
+                continue
+
+            # straight back up after running fine, don't spin if it can't start at all
+            delay = min(MAX_RESTART_DELAY, 2.0 ** (failed_starts - 1)) if failed_starts else 0.0
+            logger.warning("worker %d exited (%d), restarting it in %.0fs", pid, status, delay)
+            time.sleep(delay)
+            if not stopping:
+                fork_worker()
+    finally:
+        sock.close()
+        if temporary:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if failed_starts >= MAX_FAILED_STARTS:
+        raise SystemExit(1)
+
+
+def memory_report(pid: Optional[int] = None) -> list[dict]:
+    """
+    memory of a master (this process by default) and every process under it, for comparing preforked and
+    spawned workers: with sharing, a worker's uss is well under its rss
+    """
+    pid = pid or os.getpid()
+    report = []
+    for process in [pid, *child_pids(pid)]:
+        try:
+            report.append({"pid": process, **memory_usage(process)})
+        except (FileNotFoundError, ProcessLookupError):
+            pass
+    return report
@@ -1,16 +1,42 @@
+import asyncio
+import json
+import time
+import uuid
 from collections import defaultdict
 from enum import Enum
-from typing import Literal
-
-from fastapi import HTTPException, APIRouter
-from pydantic import BaseModel
-
-from grad_sat.cp_sat.v2.feasability_model import SolverFeedback, ProgramMapFeas, get_cs_program_map_feas, \
-    GraduationRequirementsInstanceFeas, GraduationRequirementsFeasabilitySolver
-from grad_sat.cp_sat.v2.model import GraduationRequirementsInstance, GraduationRequirementsConfig, \
-    GraduationRequirementsSolver
-
-
+from typing import TYPE_CHECKING, Callable, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from grad_sat.cp_sat.v2.feedback import SolverFeedback
+from grad_sat.cp_sat.v2.profiles import SolverProfile, SOLVER_PROFILES
+from grad_sat.server.budget import (
+    BUDGET_HEADER,
+    SolverBudget,
+    budget_controller,
+    budget_header,
+    client_deadline,
+    flight_key,
+    granted,
+    job_timeout,
+)
+from grad_sat.server.cache import request_fingerprint
+from grad_sat.server.catalog import CATALOG_VERSION_HEADER, Catalog, catalogs
+from grad_sat.server.executor import solver_executor, time_limit
+from grad_sat.server.jobs import TERMINAL_EVENTS, ProgressReporter, progress_channel
+from grad_sat.server.metrics import record_solve
+from grad_sat.server.singleflight import singleflight
+from grad_sat.server.timing import RequestTiming, request_timing, solve_debug_stats
+
+if TYPE_CHECKING:
+    from grad_sat.cp_sat.v2.feasability_model import GraduationRequirementsFeasabilitySolver
+
+
+# the models (ortools, pandas) are imported by the functions running in solver workers, the server itself
+# never builds one. see benchmark_import_time
 router = APIRouter()
 
 class PlannedCourseType(Enum):
@@ -26,6 +52,14 @@ class PlannedCourse(BaseModel):
     course_type: PlannedCourseType
 
 
+class PlanStatus(Enum):
+    NOT_SOLVED = 0  # turned away before solving, ie. a course taken twice
+    OPTIMAL = 1
+    FEASIBLE = 2  # the best plan found before the time limit, there may be a better one
+    INFEASIBLE = 3  # no plan meets the requirements, the issues say why
+    TIMED_OUT = 4  # no plan found before the time limit, not that there isn't one
+
+
 class GeneratePlanRequest(BaseModel):
     completed_courses: list[tuple[str, int]]
     taken_in: list[tuple[str, int]]
@@ -34,22 +68,199 @@ class GeneratePlanRequest(BaseModel):
     course_ratings: list[tuple[str, int]]
     must_take: list[str]
     must_not_take: list[str]
+    # how long to search for a better plan, see SOLVER_PROFILES
+    profile: SolverProfile = SolverProfile.Default
 
 
 class GeneratePlanResponse(BaseModel):
     # during render on ui side always sort to maintain order within semesters
     courses: list[PlannedCourse]
     issues: list[SolverFeedback]
+    status: PlanStatus = PlanStatus.NOT_SOLVED
 
 
-course_maps: dict[str, ProgramMapFeas] = {
-    "computer-science": get_cs_program_map_feas()
+@router.post("/planner-generate")
+async def verify_graduation_requirements(genPlanReq: GeneratePlanRequest, response: Response, request: Request,
+                                         stream: bool = False, debug_stats: bool = False) -> GeneratePlanResponse:
+    timing = request_timing(request)
+    print("enter planner generate")
+    if stream:
+        return stream_plan(genPlanReq, request)
+
+    # a class told to try the planner at the same time sends the same request, solve it once for all of them
+    deadline = client_deadline(request)
+    catalog = await run_in_threadpool(catalogs.load)
+    budget = plan_budget(genPlanReq, deadline)
+    key = flight_key(request_fingerprint("planner-generate", genPlanReq, catalog.data_version), budget)
+    start = time.perf_counter()
+    res, catalog_version, report = await singleflight.do(
+        key, lambda: submit_plan_solve(genPlanReq, None, budget, deadline)
+    )
+    timing.add_report(report, time.perf_counter() - start)
+    response.headers[CATALOG_VERSION_HEADER] = catalog_version
+    add_budget_header(response, report)
+    return respond(res, response, timing, report if debug_stats else None)
+
+
+def respond(res: BaseModel, response: Response, timing: RequestTiming, report: Optional[dict] = None):
+    """
+    the response model, or with a debug_stats block from the job's report when it's set
+    """
+    timing.handler_done()
+    if report is None:
+        return res
+    content = {**res.model_dump(mode="json"), "debug_stats": solve_debug_stats(report, timing)}
+    headers = {name: response.headers[name] for name in [CATALOG_VERSION_HEADER, BUDGET_HEADER]
+               if name in response.headers}
+    return JSONResponse(content=content, headers=headers)
+
+
+def add_budget_header(response: Response, report: dict):
+    # requests answered without a solve (ie. repeated courses) weren't given a budget
+    if "budget" in report:
+        response.headers[BUDGET_HEADER] = budget_header(report["budget"])
+
+
+# sse event names for each progress event type of a streamed plan
+PLAN_STREAM_EVENTS = {
+    "phase": "phaseEvent",
+    "solution": "planEvent",
+    "finished": "resultEvent",
+    "failed": "errorEvent",
 }
 
 
-@router.post("/planner-generate")
-def verify_graduation_requirements(genPlanReq: GeneratePlanRequest) -> GeneratePlanResponse:
-    print("enter planner generate")
+def stream_plan(genPlanReq: GeneratePlanRequest, request: Request) -> StreamingResponse:
+    """
+    every improving plan as it's found (objective, gap, elapsed seconds and the courses), then the response
+    /planner-generate would have returned. the search keeps going to its time limit if the client leaves
+    """
+    async def plan_events():
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        report = await asyncio.to_thread(
+            progress_channel.reporter,
+            uuid.uuid4().hex,
+            lambda _, event: loop.call_soon_threadsafe(events.put_nowait, event),
+        )
+        start_plan(genPlanReq, report)
+
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=1.0)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                continue
+
+            data = event["result"] if event["type"] == "finished" else event
+            yield f"event:{PLAN_STREAM_EVENTS[event['type']]}\ndata: {json.dumps(data)}\n\n"
+            if event["type"] in TERMINAL_EVENTS:
+                return
+
+    return StreamingResponse(plan_events(), media_type="text/event-stream")
+
+
+# plans running in the background, held so their tasks aren't garbage collected before they finish
+_plan_tasks: set[asyncio.Task] = set()
+
+
+def start_plan(genPlanReq: GeneratePlanRequest, report: ProgressReporter):
+    task = asyncio.create_task(submit_plan(genPlanReq, report))
+    _plan_tasks.add(task)
+    task.add_done_callback(_plan_tasks.discard)
+
+
+async def submit_plan(genPlanReq: GeneratePlanRequest, report: ProgressReporter):
+    """
+    generates the plan in the solver executor, the outcome is reported as the last progress event so it's
+    seen after every event the worker sent
+    """
+    try:
+        res, catalog_version, solve_report = await submit_plan_solve(genPlanReq, report)
+    except HTTPException as e:
+        await asyncio.to_thread(report, {"type": "failed", "error": str(e.detail)})
+        return
+
+    result = {**res.model_dump(mode="json"), "catalog_version": catalog_version, "budget": solve_report.get("budget")}
+    await asyncio.to_thread(report, {"type": "finished", "result": result})
+
+
+def plan_budget(genPlanReq: GeneratePlanRequest, deadline: Optional[float] = None) -> SolverBudget:
+    # deadline is the client's, the plan and the explanation of why there isn't one have to fit in it
+    profile_time_limit, opt_tol = SOLVER_PROFILES[genPlanReq.profile]
+    return budget_controller.grant(profile_time_limit, opt_tol, deadline, solves=2, model="plan")
+
+
+async def submit_plan_solve(genPlanReq: GeneratePlanRequest, report: Optional[ProgressReporter],
+                            budget: Optional[SolverBudget] = None, deadline: Optional[float] = None):
+    budget = budget or plan_budget(genPlanReq, deadline)
+    solved = await solver_executor.submit(generate_plan, genPlanReq, report, budget,
+                                          timeout=job_timeout(deadline, plan_timeout(genPlanReq.profile)))
+    record_solve("planner-generate", solved[-1], genPlanReq.course_map, genPlanReq.profile.value)
+    budget_controller.observe(solved[-1])
+    return solved
+
+
+def plan_timeout(profile: SolverProfile) -> float:
+    # the plan and, when there isn't one, the explanation of why each get the profile's time limit
+    profile_time_limit, _ = SOLVER_PROFILES[profile]
+    return max(solver_executor.deadline, 2 * profile_time_limit + 10)
+
+
+def planned_courses(genPlanReq: GeneratePlanRequest, taken_courses: dict[int, list[str]]) -> list[PlannedCourse]:
+    res: list[PlannedCourse] = []
+    for semester, courses in taken_courses.items():
+        for course in courses:
+            course = course[:-4]  # trim _(T)'s
+            course_type = PlannedCourseType.UNKNOWN
+            if course.upper() in [course_name for course_name, _ in genPlanReq.completed_courses]:
+                course_type = PlannedCourseType.USER_COMPLETED
+            elif course.upper() in [course_name for course_name, _ in genPlanReq.taken_in]:
+                course_type = PlannedCourseType.USER_DESIRED
+            else:
+                course_type = PlannedCourseType.SOLVER_PLANNED
+
+            res.append(PlannedCourse(course_name=course,
+                                     semester=semester,
+                                     course_type=course_type))
+    return res
+
+
+def generate_plan(genPlanReq: GeneratePlanRequest, progress: Optional[Callable[[dict], None]] = None,
+                  budget: Optional[SolverBudget] = None,
+                  deadline: Optional[float] = None) -> tuple[GeneratePlanResponse, str, dict]:
+    """
+    runs in a solver worker, the plan, the version of the catalog it was made from and the solve's phase
+    timings, stats (see record_solve) and granted budget. progress (if set) gets phase changes and every
+    improving plan found during the search. budget is the profile's when not set
+    """
+    from grad_sat.cp_sat.v2.feasability_model import GraduationRequirementsFeasabilitySolver, \
+        GraduationRequirementsInstanceFeas
+    from grad_sat.cp_sat.v2.model import GraduationRequirementsConfig, GraduationRequirementsInstance, \
+        GraduationRequirementsProgress, GraduationRequirementsSolver
+    from grad_sat.cp_sat.v2.util import solver_statistics
+
+    # course maps and courses come from the catalog active when the job started
+    catalog = catalogs.active
+
+    def report(event: dict):
+        if progress is not None:
+            progress(event)
+
+    def report_solution(solution: GraduationRequirementsProgress):
+        report({
+            "type": "solution",
+            "objective": solution.objective,
+            "best_bound": solution.best_bound,
+            "gap": solution.gap,
+            "elapsed": solution.elapsed,
+            "courses": [course.model_dump(mode="json")
+                        for course in planned_courses(genPlanReq, solution.taken_courses)],
+        })
+
+    report({"type": "phase", "phase": "building"})
+
     sem_counts = defaultdict(int)
     for course, sem in genPlanReq.taken_in:
         sem_counts[sem] += 1
@@ -57,22 +268,23 @@ def verify_graduation_requirements(genPlanReq: GeneratePlanRequest) -> GenerateP
     for sem, count in sem_counts.items():
         print("Sem:", sem, "count", count)
 
-    course_names = [course for course, _ in genPlanReq.taken_in]
-    if len(course_names) != len(set(course_names)):
-        res = GeneratePlanResponse(courses=[], issues=[])
-        for course in [s for s in set(course_names) if course_names.count(s) > 1]:
-            res.issues.append(SolverFeedback(category="Course Repeated",
-                                             reason=f"Attempt to {course} take {course_names.count(course)} times",
-                                             variable=False))
+    repeated = repeated_courses(genPlanReq.taken_in)
+    if repeated:
+        res = GeneratePlanResponse(courses=[], issues=repeated)
 
-        return res
+        return res, catalog.version, {}
 
     gr_instance = GraduationRequirementsInstance(
-        program_map=course_maps[genPlanReq.course_map],
+        program_map=catalog.course_maps[genPlanReq.course_map],
         semesters=list(genPlanReq.semester_layout.keys()),
         pickle_path="grad_sat/cp_sat/v2/uoit_courses_copy.pickle",
+        courses=catalog.graduation_courses,
+    )
+    budget = budget or SolverBudget(*SOLVER_PROFILES[genPlanReq.profile])
+    gr_config = GraduationRequirementsConfig.from_profile(
+        genPlanReq.profile, print_stats=False, time_limit=time_limit(deadline, budget.time_limit),
+        opt_tol=budget.opt_tol,
     )
-    gr_config = GraduationRequirementsConfig(print_stats=False)
 
     solver = GraduationRequirementsSolver(
         problem_instance=gr_instance,
@@ -94,23 +306,41 @@ def verify_graduation_requirements(genPlanReq: GeneratePlanRequest) -> GenerateP
     solver.set_star_rating_maximization_target(genPlanReq.course_ratings)
 
     res = GeneratePlanResponse(courses=[], issues=[])
+    report({"type": "phase", "phase": "solving"})
     try:
-        solution = solver.solve()
-    except Exception as e:
+        solution = solver.solve(on_solution=None if progress is None else report_solution)
+    except Exception:
+        # the executor turns it into a 500
         print("error solving generation model")
-        raise HTTPException(status_code=500, detail=str(e))
-
-    if len(solution.taken_courses) == 0:
+        raise
+
+    stats = [{"model": "plan", **solver_statistics(solver.solver, solver.model),
+              "first_solution": solver.first_solution_seconds}]
+    if stats[0]["status"] == "UNKNOWN":
+        # out of time (the budget shrinks under load) without a plan, explaining it would report requirements
+        # as missing from a plan that may well exist
+        searched = solver.solver.parameters.max_time_in_seconds
+        res.status = PlanStatus.TIMED_OUT
+        res.issues = [SolverFeedback(category="Timed Out",
+                                     reason=f"no plan found within {searched:.1f}s, try again or with a longer profile",
+                                     variable=False)]
+    elif stats[0]["status"] in ["OPTIMAL", "FEASIBLE"]:
+        res.status = PlanStatus[stats[0]["status"]]
+    elif stats[0]["status"] == "INFEASIBLE":
+        res.status = PlanStatus.INFEASIBLE
+        report({"type": "phase", "phase": "explaining"})
         gr_feas_instance = GraduationRequirementsInstanceFeas(
-            program_map=get_cs_program_map_feas(),
+            program_map=catalog.course_maps[genPlanReq.course_map],
             semesters=list(genPlanReq.semester_layout.keys()),
-            pickle_path="grad_sat/cp_sat/v2/uoit_courses_copy.pickle"
+            pickle_path="grad_sat/cp_sat/v2/uoit_courses_copy.pickle",
+            courses=catalog.graduation_courses,
         )
 
         # failed to solve
         feas_solver = GraduationRequirementsFeasabilitySolver(
             problem_instance=gr_feas_instance,
-            config=GraduationRequirementsConfig(print_stats=False),
+            config=GraduationRequirementsConfig(print_stats=False,
+                                                time_limit=time_limit(deadline, budget.time_limit)),
             completed_classes=[course for course, _ in genPlanReq.completed_courses] + [course for course, _ in
                                                                                         genPlanReq.taken_in],
             must_take=genPlanReq.must_take,
@@ -126,29 +356,23 @@ def verify_graduation_requirements(genPlanReq: GeneratePlanRequest) -> GenerateP
         for course in genPlanReq.must_not_take:
             feas_solver.dont_take_class(course)
 
-        try:
-            res.issues = feas_solver.solve()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+        res.issues = detach_feedback(feas_solver.solve())
+        solver.timer.merge(feas_solver.timer, prefix="explain.")
+        stats.append({"model": "explain", **solver_statistics(feas_solver.solver, feas_solver.model),
+                      "first_solution": feas_solver.first_solution_seconds})
 
         # res.issues.append("Failed to find solution")
+    else:
+        # the executor turns it into a 500
+        raise RuntimeError(f"plan model wasn't solved: {stats[0]['status']}")
 
-    for semester, courses in solution.taken_courses.items():
-        for course in courses:
-            course = course[:-4]  # trim _(T)'s
-            course_type = PlannedCourseType.UNKNOWN
-            if course.upper() in [course_name for course_name, _ in genPlanReq.completed_courses]:
-                course_type = PlannedCourseType.USER_COMPLETED
-            elif course.upper() in [course_name for course_name, _ in genPlanReq.taken_in]:
-                course_type = PlannedCourseType.USER_DESIRED
-            else:
-                course_type = PlannedCourseType.SOLVER_PLANNED
-
-            res.courses.append(PlannedCourse(course_name=course,
-                                             semester=semester,
-                                             course_type=course_type))
-
-    return res
+    with solver.timer.phase("response"):
+        res.courses = planned_courses(genPlanReq, solution.taken_courses)
+    return res, catalog.version, {
+        "phases": solver.timer.as_dict(),
+        "solvers": stats,
+        "budget": granted(budget, solver.solver),
+    }
 
 
 class VerifyPlanRequest(BaseModel):
@@ -163,37 +387,187 @@ class VerifyPlanResponse(BaseModel):
     issues: list[SolverFeedback]
 
 
-@router.post("/graduation-verification")
-def verify_graduation_requirements(verifyReq: VerifyPlanRequest) -> VerifyPlanResponse:
-    course_names = [course for course, _ in verifyReq.taken_in]
-    if len(course_names) != len(set(course_names)):
-        res = GeneratePlanResponse(courses=[], issues=[])
-        for course in [s for s in set(course_names) if course_names.count(s) > 1]:
-            res.issues.append(SolverFeedback(category="Course Repeated",
-                                             reason=f"Attempt to {course} take {course_names.count(course)} times",
-                                             variable=False))
+# a verification's time limit on an idle server, the feasibility model keeps its own gap limit
+VERIFY_TIME_LIMIT = 5.0
 
-        return res
-    res = VerifyPlanResponse(issues=[])
-    try:
-        feedback = verify_grad_req(verifyReq.taken_in, verifyReq.semester_layout, verifyReq.completed_courses, verifyReq.must_take, verifyReq.must_not_take)
-        res.issues = feedback
-        return res
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/graduation-verification")
+async def verify_graduation_requirements(verifyReq: VerifyPlanRequest, response: Response, request: Request,
+                                         debug_stats: bool = False) -> VerifyPlanResponse:
+    timing = request_timing(request)
+    deadline = client_deadline(request)
+    catalog = await run_in_threadpool(catalogs.load)
+    repeated = repeated_courses(verifyReq.taken_in)
+    if repeated:
+        res = GeneratePlanResponse(courses=[], issues=repeated)
+
+        response.headers[CATALOG_VERSION_HEADER] = catalog.version
+        return respond(res, response, timing, {} if debug_stats else None)
+
+    budget = budget_controller.grant(VERIFY_TIME_LIMIT, 0.0, deadline, model="verify")
+    key = flight_key(request_fingerprint("graduation-verification", verifyReq, catalog.data_version), budget)
+    async def verify():
+        verified = await solver_executor.submit(verify_plan, verifyReq, budget,
+                                                timeout=job_timeout(deadline, solver_executor.deadline))
+        record_solve("graduation-verification", verified[-1], verifyReq.course_map)
+        budget_controller.observe(verified[-1])
+        return verified
+
+    start = time.perf_counter()
+    feedback, catalog_version, report = await singleflight.do(key, verify)
+    timing.add_report(report, time.perf_counter() - start)
+    response.headers[CATALOG_VERSION_HEADER] = catalog_version
+    add_budget_header(response, report)
+    return respond(VerifyPlanResponse(issues=feedback), response, timing, report if debug_stats else None)
+
+
+# most plans a batch can hold and the longest it can ask to run
+BATCH_MAX_PLANS = 1000
+BATCH_MAX_BUDGET = 300.0
+
+
+class BatchVerifyPlan(VerifyPlanRequest):
+    # sent back on the plan's result line, for matching results to students
+    id: Optional[str] = None
+
+
+class BatchVerifyRequest(BaseModel):
+    plans: list[BatchVerifyPlan] = Field(min_length=1, max_length=BATCH_MAX_PLANS)
+    # seconds for the whole batch, plans that aren't verified by then are reported as timed out
+    time_budget: float = Field(default=60.0, gt=0, le=BATCH_MAX_BUDGET)
+
+
+@router.post("/graduation-verification/batch")
+async def verify_graduation_requirements_batch(batchReq: BatchVerifyRequest, request: Request):
+    """
+    verifies every plan in the solver workers, streamed as a line of json per plan in the order they finish:
+    {"index", "id", "issues", "catalog_version"}, or {"index", "id", "error", "status"} for a plan that
+    couldn't be verified (504 once the batch's time budget is spent)
+    """
+    catalog = await run_in_threadpool(catalogs.load)
+    deadline = time.time() + batchReq.time_budget
+    # at most a job per worker from the batch at a time, so it doesn't fill the queue ahead of single requests
+    slots = asyncio.Semaphore(solver_executor.workers)
+
+    async def verify(index: int, plan: BatchVerifyPlan) -> dict:
+        line = {"index": index, "id": plan.id}
+        repeated = repeated_courses(plan.taken_in)
+        if repeated:
+            return {**line, "issues": [fdb.model_dump(mode="json") for fdb in repeated],
+                    "catalog_version": catalog.version}
+
+        verifyReq = VerifyPlanRequest(**plan.model_dump(exclude={"id"}))
+        # a cohort has plenty of identical plans, those (and single requests for them) share a solve
+        fingerprint = request_fingerprint("graduation-verification", verifyReq, catalog.data_version)
+
+        async def solve(budget: SolverBudget, timeout: float):
+            verified = await solver_executor.submit(verify_plan, verifyReq, budget, timeout=timeout)
+            record_solve("graduation-verification-batch", verified[-1], verifyReq.course_map)
+            budget_controller.observe(verified[-1])
+            return verified
+
+        async with slots:
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return {**line, "error": "batch time budget spent", "status": 504}
+                try:
+                    # the batch's time budget is its deadline, later plans get less of it as it runs out. the key
+                    # comes from the budget the solve is given, so a solve the batch's time budget cut short
+                    # isn't shared
+                    budget = budget_controller.grant(VERIFY_TIME_LIMIT, 0.0, deadline, model="verify")
+                    feedback, catalog_version, report = await singleflight.do(
+                        flight_key(fingerprint, budget), lambda: solve(budget, remaining)
+                    )
+                    break
+                except HTTPException as e:
+                    if e.status_code != 503:
+                        return {**line, "error": e.detail, "status": e.status_code}
+                    # the queue is full of other requests, wait for them instead of failing the plan
+                    await asyncio.sleep(min(remaining, solver_executor.average_job_seconds))
+        return {**line, "issues": [fdb.model_dump(mode="json") for fdb in feedback],
+                "catalog_version": catalog_version, "budget": report["budget"]}
+
+    async def results():
+        tasks = [asyncio.ensure_future(verify(index, plan)) for index, plan in enumerate(batchReq.plans)]
+        try:
+            for result in asyncio.as_completed(tasks):
+                yield json.dumps(await result, separators=(",", ":")) + "\n"
+        finally:
+            # the client left, plans not started yet never are
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson",
+                             headers={CATALOG_VERSION_HEADER: catalog.version})
+
+
+def verify_plan(verifyReq: VerifyPlanRequest, budget: Optional[SolverBudget] = None,
+                deadline: Optional[float] = None) -> tuple[list[SolverFeedback], str, dict]:
+    # runs in a solver worker, the feedback, the version of the catalog it was checked against and the solve's
+    # phase timings, stats and granted budget
+    from grad_sat.cp_sat.v2.util import solver_statistics
+
+    budget = budget or SolverBudget(VERIFY_TIME_LIMIT, 0.0)
+    catalog = catalogs.active
+    feas_solver = grad_req_verifier(verifyReq.taken_in, verifyReq.semester_layout, verifyReq.completed_courses,
+                                    verifyReq.must_take, verifyReq.must_not_take, catalog,
+                                    time_limit(deadline, budget.time_limit))
+    feedback = feas_solver.solve()
+    with feas_solver.timer.phase("response"):
+        feedback = detach_feedback(feedback)
+    stats = {"model": "verify", **solver_statistics(feas_solver.solver, feas_solver.model),
+             "first_solution": feas_solver.first_solution_seconds}
+    return feedback, catalog.version, {
+        "phases": feas_solver.timer.as_dict(),
+        "solvers": [stats],
+        "budget": granted(budget, feas_solver.solver),
+    }
+
+
+def detach_feedback(feedback: list[SolverFeedback]) -> list[SolverFeedback]:
+    # the cp-sat variables can't be sent back from a worker, they're excluded from responses anyway
+    return [fdb.model_copy(update={"variable": None}) for fdb in feedback]
+
+
+def repeated_courses(taken_in: list[tuple[str, int]]) -> list[SolverFeedback]:
+    # plans taking a course more than once aren't solved, these are their issues instead
+    course_names = [course for course, _ in taken_in]
+    return [
+        SolverFeedback(category="Course Repeated",
+                       reason=f"Attempt to {course} take {course_names.count(course)} times",
+                       variable=False)
+        for course in sorted(set(course_names)) if course_names.count(course) > 1
+    ]
 
 
 def verify_grad_req(taken_in: list[tuple[str, int]], semester_layout: dict[str, int],
-                    completed_courses: list[tuple[str, int]], must_take: list[str], must_not_take: list[str]) -> list[SolverFeedback]:
+                    completed_courses: list[tuple[str, int]], must_take: list[str], must_not_take: list[str],
+                    catalog: Optional[Catalog] = None, time_limit: float = 5.0) -> list[SolverFeedback]:
+    feas_solver = grad_req_verifier(taken_in, semester_layout, completed_courses, must_take, must_not_take,
+                                    catalog, time_limit)
+    return feas_solver.solve()
+
+
+def grad_req_verifier(taken_in: list[tuple[str, int]], semester_layout: dict[str, int],
+                      completed_courses: list[tuple[str, int]], must_take: list[str], must_not_take: list[str],
+                      catalog: Optional[Catalog] = None,
+                      time_limit: float = 5.0) -> "GraduationRequirementsFeasabilitySolver":
+    from grad_sat.cp_sat.v2.feasability_model import GraduationRequirementsFeasabilitySolver, \
+        GraduationRequirementsInstanceFeas
+    from grad_sat.cp_sat.v2.model import GraduationRequirementsConfig
+
+    catalog = catalog or catalogs.active
     gr_feas_instance = GraduationRequirementsInstanceFeas(
-        program_map=get_cs_program_map_feas(),
+        program_map=catalog.course_maps["computer-science"],
         semesters=list(semester_layout.keys()),
-        pickle_path="grad_sat/cp_sat/v2/uoit_courses_copy.pickle"
+        pickle_path="grad_sat/cp_sat/v2/uoit_courses_copy.pickle",
+        courses=catalog.graduation_courses,
     )
 
     feas_solver = GraduationRequirementsFeasabilitySolver(
         problem_instance=gr_feas_instance,
-        config=GraduationRequirementsConfig(print_stats=False),
+        config=GraduationRequirementsConfig(print_stats=False, time_limit=time_limit),
         completed_classes=[course for course, _ in completed_courses] + [course for course, _ in taken_in],
         must_not_take=must_not_take,
         must_take=must_take
@@ -210,5 +584,4 @@ def verify_grad_req(taken_in: list[tuple[str, int]], semester_layout: dict[str,
     # for course in must_not_take:
     #     feas_solver.dont_take_class(course)
 
-    feedback_list = feas_solver.solve()
-    return feedback_list
+    return feas_solver
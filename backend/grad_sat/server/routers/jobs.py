@@ -0,0 +1,80 @@
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from grad_sat.server.executor import solver_executor
+from grad_sat.server.jobs import JobStatus, create_job_store, progress_channel
+from grad_sat.server.routers.graduation import GeneratePlanRequest, start_plan
+
+router = APIRouter(prefix="/jobs")
+
+# how often an event stream checks the store for new events
+EVENTS_POLL_INTERVAL = 0.25
+
+# the store can be on disk (sqlite), async handlers call it from the threadpool
+job_store = create_job_store()
+
+
+def record_event(job_id: str, event: dict):
+    job_store.add_event(job_id, event)
+
+    if event["type"] == "phase" and event["phase"] == "building":
+        job_store.update(job_id, status=JobStatus.Running)
+    elif event["type"] == "solution":
+        job_store.update(job_id, best=event)
+    elif event["type"] == "finished":
+        job_store.update(job_id, status=JobStatus.Succeeded, result=event["result"])
+    elif event["type"] == "failed":
+        job_store.update(job_id, status=JobStatus.Failed, error=event["error"])
+
+
+@router.post("/planner-generate", status_code=202)
+async def create_planner_job(genPlanReq: GeneratePlanRequest) -> dict:
+    # turn the request away now instead of accepting a job that fails straight away
+    if solver_executor.saturated():
+        raise solver_executor.busy_error()
+
+    job = await run_in_threadpool(job_store.create, "planner-generate")
+    report = await asyncio.to_thread(progress_channel.reporter, job.id, record_event)
+    start_plan(genPlanReq, report)
+    return {"id": job.id, "status": job.status.value}
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str) -> dict:
+    # status, the best plan found so far and the response once it's done
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"no job {job_id}")
+    return job.summary()
+
+
+@router.get("/{job_id}/events")
+async def get_job_events(job_id: str, request: Request, last_event_id: Optional[str] = Header(default=None)):
+    if await run_in_threadpool(job_store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail=f"no job {job_id}")
+
+    # checked before streaming, a bad id can't be reported once the stream has started
+    try:
+        after = int(last_event_id or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Last-Event-ID should be the id of an event")
+
+    async def job_events():
+        # every event the job sent, resuming after Last-Event-ID when the client reconnects
+        seq = after
+        while True:
+            for seq, event in await run_in_threadpool(job_store.events, job_id, after=seq):
+                yield f"id: {seq}\nevent:{event['type']}\ndata: {json.dumps(event)}\n\n"
+                if event["type"] in ["finished", "failed"]:
+                    return
+
+            if await run_in_threadpool(job_store.get, job_id) is None or await request.is_disconnected():
+                return
+            await asyncio.sleep(EVENTS_POLL_INTERVAL)
+
+    return StreamingResponse(job_events(), media_type="text/event-stream")
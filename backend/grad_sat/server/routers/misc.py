@@ -1,10 +1,93 @@
-from fastapi import File, UploadFile, APIRouter
+from fastapi import File, UploadFile, APIRouter, Response
 from pydantic import BaseModel
-from pymupdf import pymupdf
+import os
 import re
 
+from grad_sat.server.budget import budget_controller
+from grad_sat.server.catalog import term_catalogs
+from grad_sat.server.executor import solver_executor
+from grad_sat.server.metrics import CONTENT_TYPE, registry
+from grad_sat.server.prefork import memory_usage
+from grad_sat.server.routers.time_tables import schedule_cache, stream_cache
+from grad_sat.server.singleflight import singleflight
+
 router = APIRouter()
 
+# copied from the caches, executor and catalogs whenever /metrics is scraped
+cache_hits = registry.counter("grad_sat_cache_hits_total", "cache lookups that hit", ("cache",))
+cache_misses = registry.counter("grad_sat_cache_misses_total", "cache lookups that missed", ("cache",))
+cache_hit_ratio = registry.gauge("grad_sat_cache_hit_ratio", "share of cache lookups that hit", ("cache",))
+cache_bytes = registry.gauge("grad_sat_cache_bytes", "bytes held by a cache", ("cache",))
+executor_queue_depth = registry.gauge("grad_sat_executor_queue_depth", "solver jobs waiting for a worker")
+executor_running = registry.gauge("grad_sat_executor_running", "solver jobs running")
+budget_fraction = registry.gauge(
+    "grad_sat_solver_budget_fraction", "share of its full time limit a solve submitted now would get"
+)
+executor_jobs = registry.counter("grad_sat_executor_jobs_total", "solver jobs by outcome", ("outcome",))
+executor_restarts = registry.counter(
+    "grad_sat_executor_restarts_total", "solver pools replaced after a worker died"
+)
+coalesced = registry.counter(
+    "grad_sat_coalesced_requests_total", "solve requests answered by an identical request's solve", ("scope",)
+)
+process_memory = registry.gauge(
+    "grad_sat_process_memory_bytes", "memory of this server worker and its solver workers", ("pid", "process", "kind")
+)
+catalog_info = registry.gauge(
+    "grad_sat_catalog_info", "the active catalog of each loaded term", ("term", "version", "data_version")
+)
+
+
+def collect_server_stats():
+    for name, cache in [("time-table", schedule_cache), ("all-time-tables", stream_cache)]:
+        stats = cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        cache_hits.set(stats["hits"], cache=name)
+        cache_misses.set(stats["misses"], cache=name)
+        cache_hit_ratio.set(stats["hits"] / lookups if lookups else 0.0, cache=name)
+        cache_bytes.set(stats["bytes"], cache=name)
+
+    stats = solver_executor.stats()
+    executor_queue_depth.set(stats["queue_depth"])
+    executor_running.set(stats["running"])
+    for outcome in ["submitted", "completed", "failed", "rejected", "timed_out"]:
+        executor_jobs.set(stats[outcome], outcome=outcome)
+    executor_restarts.set(stats["restarts"])
+    budget_fraction.set(budget_controller.stats()["fraction"])
+
+    stats = singleflight.stats()
+    coalesced.set(stats["coalesced"], scope="process")
+    coalesced.set(stats["coalesced_across_processes"], scope="machine")
+
+    process_memory.clear()
+    for process in process_memory_usage():
+        for kind in ["rss", "pss", "uss"]:
+            process_memory.set(process[kind], pid=process["pid"], process=process["process"], kind=kind)
+
+    status = term_catalogs.status()
+    # versions swapped out since the last scrape are dropped rather than left at 1
+    catalog_info.clear()
+    if status["version"] is not None:
+        catalog_info.set(1, term="", version=status["version"], data_version=status["data_version"])
+    for term, term_status in status["terms"]["loaded"].items():
+        catalog_info.set(1, term=term, version=term_status["version"], data_version=term_status["data_version"])
+
+
+registry.on_collect(collect_server_stats)
+
+
+def process_memory_usage() -> list[dict]:
+    processes = [{"pid": os.getpid(), "process": "server"}]
+    processes.extend({"pid": pid, "process": "solver"} for pid in solver_executor.worker_pids())
+    usage = []
+    for process in processes:
+        try:
+            usage.append({**process, **memory_usage(process["pid"])})
+        except FileNotFoundError:
+            # a worker that exited since
+            pass
+    return usage
+
 class CourseSelection(BaseModel):
     course_name: str
     course_type: int
@@ -12,6 +95,9 @@ class CourseSelection(BaseModel):
 
 @router.post("/process-pdf")
 def process_pdf(file: UploadFile = File(...)):
+    # only imported once a transcript is uploaded, it's slow to import and rarely used
+    from pymupdf import pymupdf
+
     doc = pymupdf.open(stream=file.file.read())
     all_matches = []
     for page in doc:
@@ -38,3 +124,45 @@ def process_pdf(file: UploadFile = File(...)):
 @router.get("/health")
 def health():
     return "OK"
+
+
+@router.get("/ready")
+def ready(response: Response):
+    # /health is the process being up, this is it being able to solve: the default catalog is loaded and a
+    # solver worker has loaded its own
+    status = {"catalog": term_catalogs.default.loaded, "solver": solver_executor.ready()}
+    if not all(status.values()):
+        response.status_code = 503
+    return status
+
+
+@router.get("/catalog")
+def catalog_status():
+    # active catalog version, when it was loaded and how many times it's been swapped, plus the loaded terms
+    return term_catalogs.status()
+
+
+@router.get("/executor-stats")
+def executor_stats():
+    # solver pool queue depth, utilisation and how many jobs were rejected or ran out of time, plus how much
+    # solver time jobs get at the current load
+    return {**solver_executor.stats(), "budget": budget_controller.stats()}
+
+
+@router.get("/coalescing-stats")
+def coalescing_stats():
+    # how many solve requests shared an identical request's in-flight solve
+    return singleflight.stats()
+
+
+@router.get("/metrics")
+def metrics():
+    # prometheus scrape endpoint, request latency, per phase solve timings and solver stats. preforked, it adds
+    # up every worker's (see MetricsRegistry)
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
+@router.get("/memory")
+def memory():
+    # rss, pss and uss (memory only it uses) of this server worker and its solver workers
+    return process_memory_usage()
@@ -1,28 +1,51 @@
-import asyncio
+import json
+import os
+import threading
+import time
 from typing import Optional
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from grad_sat.cp_sat.time_tables.main import generate_multiple_optimal_schedules
-from grad_sat.cp_sat.time_tables.model import (
-    TTFilterConstraint,
-    TTProblemInstance,
-    TTSolver,
+from grad_sat.cp_sat.time_tables.inputs import (
     ForcedConflict,
     OptimizationTarget,
+    SectionAvailability,
+    TTFilterConstraint,
+)
+from grad_sat.cp_sat.time_tables.responses import TTGenerateResponse
+from grad_sat.server.cache import CachedStream, LRUCache, request_fingerprint
+from grad_sat.server.catalog import (
+    CATALOG_VERSION_HEADER,
+    Catalog,
+    UnknownTermError,
+    term_catalogs,
 )
-from grad_sat.scraper.models import ListOfMinimumClassInfo
+from grad_sat.server.executor import solver_executor, time_limit
+from grad_sat.server.metrics import record_solve
+from grad_sat.server.singleflight import singleflight
+from grad_sat.server.streaming import iterate_in_thread
+from grad_sat.server.timing import request_timing, solve_debug_stats
 
+# the solver (ortools, pandas, sqlalchemy) is imported by the functions that solve, so the server starts
+# without it and solver workers are the first to pay for it. see benchmark_import_time
 router = APIRouter()
 
-def read_data(path: str) -> ListOfMinimumClassInfo:
-    with open(path, "r") as f:
-        tmp = f.read()
-        return ListOfMinimumClassInfo.model_validate_json(tmp)
+# results are keyed by the canonical request + data version, a new catalog version never hits old results
+CACHE_MAX_BYTES = int(os.getenv("TT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+schedule_cache: LRUCache[str] = LRUCache(max_bytes=CACHE_MAX_BYTES // 2, sizeof=len)
+stream_cache: LRUCache[CachedStream] = LRUCache(
+    max_bytes=CACHE_MAX_BYTES // 2, sizeof=CachedStream.size
+)
+
 
+def term_catalog(term: Optional[int]) -> Catalog:
+    try:
+        return term_catalogs.get(term)
+    except UnknownTermError:
+        raise HTTPException(status_code=404, detail=f"no catalog for term {term}")
 
-course_list = read_data("grad_sat/cp_sat/time_tables/data.json")
 
 class TimeTableRequest(BaseModel):
     forced_conflicts: list[ForcedConflict]
@@ -30,36 +53,237 @@ class TimeTableRequest(BaseModel):
     optimization_target: OptimizationTarget
     enumerate_all: Optional[bool] = None
 
+    # ie. 202509 for fall 2025, the default catalog when not set
+    term: Optional[int] = Field(default=None, ge=0)
+
+    # skip closed (OPEN), full without waitlist (SEATS_OR_WAITLIST) or full (SEATS) sections
+    section_availability: SectionAvailability = SectionAvailability.ALL
+
+    # "fewest days, then least time on campus", optimized in order after optimization_target
+    secondary_optimization_targets: list[OptimizationTarget] = []
+    lexicographic_tolerance: float = Field(
+        default=0.0, ge=0.0, description="relative slack kept on earlier targets"
+    )
+
+    # top-k mode for /all-time-tables, off when top_k isn't set
+    top_k: Optional[int] = Field(default=None, ge=1, le=50)
+    min_course_difference: int = Field(
+        default=1, ge=0, description="courses each schedule must differ by"
+    )
+    objective_gap: float = Field(
+        default=0.0, ge=0.0, description="relative gap from the optimal objective"
+    )
+
 
-@router.post("/time-table")
-def generate_time_tables(ttr: TimeTableRequest):
+@router.post("/time-table", response_model=TTGenerateResponse)
+async def generate_time_tables(ttr: TimeTableRequest, request: Request, debug_stats: bool = False):
+    timing = request_timing(request)
     print(ttr)
+    catalog = await run_in_threadpool(term_catalog, ttr.term)
+
+    key = request_fingerprint("time-table", ttr, catalog.data_version)
+    cached = schedule_cache.get(key)
+    if cached is not None:
+        if debug_stats:
+            cached = with_debug_stats(cached, solve_debug_stats({}, timing, cached=True))
+        timing.handler_done()
+        return Response(
+            content=cached,
+            media_type="application/json",
+            headers={CATALOG_VERSION_HEADER: catalog.version},
+        )
+
+    async def solve():
+        solved = await solver_executor.submit(solve_time_table, ttr)
+        record_solve("time-table", solved[-1])
+        return solved
+
+    # identical requests arriving while this one solves wait for it instead of solving again
+    start = time.perf_counter()
+    content, definitive, catalog_version, data_version, report = await singleflight.do(key, solve)
+    timing.add_report(report, time.perf_counter() - start)
+    # the worker can be a catalog version ahead or behind, only cache under the version it solved with
+    if definitive and data_version == catalog.data_version:
+        schedule_cache.put(key, content)
+
+    if debug_stats:
+        content = with_debug_stats(content, solve_debug_stats(report, timing))
+    timing.handler_done()
+    return Response(
+        content=content,
+        media_type="application/json",
+        headers={CATALOG_VERSION_HEADER: catalog_version},
+    )
+
+
+def import_solver():
+    # /all-time-tables and /pareto-time-tables solve in the server process, imported in the background at
+    # startup so their first request doesn't pay for it
+    import grad_sat.cp_sat.time_tables.main  # noqa: F401
+
+
+def with_debug_stats(content: str, stats: dict) -> str:
+    # only when asked for, the cached json is kept as is
+    return json.dumps({**json.loads(content), "debug_stats": stats}, separators=(",", ":"))
+
 
+def solve_time_table(ttr: TimeTableRequest, deadline: Optional[float] = None) -> tuple[str, bool, str, str, dict]:
+    """
+    runs in a solver worker, the response json, whether it's definitive (optimal or proven infeasible, either
+    way the same request gets the same answer), the catalog's version and data version and the solve's phase
+    timings and stats (see record_solve)
+    """
+    from ortools.sat.python import cp_model
+
+    from grad_sat.cp_sat.time_tables.model import SearchCancellation, TTProblemInstance, TTSolver
+    from grad_sat.cp_sat.v2.util import solver_statistics
+
+    catalog = term_catalogs.get(ttr.term)
     problem_instance = TTProblemInstance(
-        courses=course_list.lomci,
+        section_store=catalog.section_store,
         forced_conflicts=ttr.forced_conflicts,
         filter_constraints=ttr.filter_constraints,
         optimization_target=ttr.optimization_target,
+        secondary_optimization_targets=ttr.secondary_optimization_targets,
+        lexicographic_tolerance=ttr.lexicographic_tolerance,
+        section_availability=ttr.section_availability,
     )
 
-    solver = TTSolver(problem_instance=problem_instance)
+    # stops the search (every stage of a lexicographic solve) at the deadline, keeping the best so far
+    cancellation = SearchCancellation()
+    timer = threading.Timer(time_limit(deadline, float("inf")), cancellation.cancel)
+    if deadline is not None:
+        timer.start()
+
+    try:
+        solver = TTSolver(problem_instance=problem_instance, cancellation=cancellation)
+        if problem_instance.secondary_optimization_targets:
+            solution = solver.solve_lexicographic()
+        else:
+            solution = solver.solve()
+    finally:
+        timer.cancel()
 
-    solution = solver.solve()
-    return solution.response()
+    with solver.timer.phase("response"):
+        content = solution.response_json()
+    report = {
+        "phases": solver.timer.as_dict(),
+        "solvers": [{"model": "time-table", **solver_statistics(solver.solver, solver.model)}],
+    }
+    definitive = solution.status in [cp_model.OPTIMAL, cp_model.INFEASIBLE]
+    return content, definitive, catalog.version, catalog.data_version, report
 
 
 @router.post("/all-time-tables")
-def generate_all_time_tables(ttr: TimeTableRequest):
-    async def time_table_generator():
+async def generate_all_time_tables(ttr: TimeTableRequest, request: Request):
+    from grad_sat.cp_sat.time_tables.main import generate_diverse_schedules, generate_multiple_optimal_schedules
+    from grad_sat.cp_sat.time_tables.model import SearchCancellation, TTProblemInstance
+
+    cancellation = SearchCancellation()
+    # a cold term is loaded first, keep that off the event loop
+    catalog = await run_in_threadpool(term_catalog, ttr.term)
+    key = request_fingerprint("all-time-tables", ttr, catalog.data_version)
+
+    # runs in a worker thread, every solve blocks so it can't be on the event loop
+    def time_table_events():
+        # replay what an earlier run of this request sent, then carry on searching past it
+        cached = stream_cache.get(key) or CachedStream()
+        stream = CachedStream(
+            payloads=list(cached.payloads), schedules=list(cached.schedules)
+        )
+        try:
+            yield from cached.payloads
+            if cached.complete:
+                stream.complete = True
+                return
+
+            problem_instance = TTProblemInstance(
+                section_store=catalog.section_store,
+                forced_conflicts=ttr.forced_conflicts,
+                filter_constraints=ttr.filter_constraints,
+                optimization_target=ttr.optimization_target,
+                section_availability=ttr.section_availability,
+            )
+
+            if ttr.top_k is not None:
+                schedules = generate_diverse_schedules(
+                    problem_instance,
+                    k=ttr.top_k,
+                    min_course_difference=ttr.min_course_difference,
+                    objective_gap=ttr.objective_gap,
+                    cancellation=cancellation,
+                    seen=list(stream.schedules),
+                )
+            else:
+                schedules = generate_multiple_optimal_schedules(
+                    problem_instance, cancellation=cancellation, seen=list(stream.schedules)
+                )
+
+            for sol in schedules:
+                if cancellation.cancelled:
+                    return
+
+                payload = f"event:scheduleEvent\ndata: {sol.response_json()}\n\n"
+                stream.payloads.append(payload)
+                if sol.status_ok:
+                    stream.schedules.append(sorted(sol.courses_taken))
+                yield payload
+
+            stream.complete = not cancellation.cancelled
+        finally:
+            if len(stream.payloads) > len(cached.payloads) or stream.complete != cached.complete:
+                stream_cache.put(key, stream)
+
+    return StreamingResponse(
+        iterate_in_thread(
+            time_table_events,
+            cancel=cancellation.cancel,
+            is_disconnected=request.is_disconnected,
+        ),
+        media_type="text/event-stream",
+        headers={CATALOG_VERSION_HEADER: catalog.version},
+    )
+
+
+class ParetoTimeTableRequest(BaseModel):
+    forced_conflicts: list[ForcedConflict]
+    filter_constraints: list[TTFilterConstraint]
+    include_courses_taken: bool = False
+    section_availability: SectionAvailability = SectionAvailability.ALL
+    term: Optional[int] = Field(default=None, ge=0)
+
+
+@router.post("/pareto-time-tables")
+async def generate_pareto_time_tables(ptr: ParetoTimeTableRequest, request: Request):
+    from grad_sat.cp_sat.time_tables.main import generate_pareto_front
+    from grad_sat.cp_sat.time_tables.model import SearchCancellation, TTProblemInstance
+
+    cancellation = SearchCancellation()
+    catalog = await run_in_threadpool(term_catalog, ptr.term)
+
+    def pareto_events():
         problem_instance = TTProblemInstance(
-            courses=course_list.lomci,
-            forced_conflicts=ttr.forced_conflicts,
-            filter_constraints=ttr.filter_constraints,
-            optimization_target=ttr.optimization_target,
+            section_store=catalog.section_store,
+            forced_conflicts=ptr.forced_conflicts,
+            filter_constraints=ptr.filter_constraints,
+            optimization_target=OptimizationTarget.TimeOnCampus,
+            section_availability=ptr.section_availability,
         )
 
-        for sol in generate_multiple_optimal_schedules(problem_instance):
-            await asyncio.sleep(0.01)  # sends as 1 if no sleep?
-            yield f"event:scheduleEvent\ndata: {sol.response().model_dump_json()}\n\n"
+        for sol in generate_pareto_front(
+            problem_instance,
+            include_courses_taken=ptr.include_courses_taken,
+            cancellation=cancellation,
+        ):
+            objectives = json.dumps(sol.objective_values, separators=(",", ":"))
+            yield f"event:paretoEvent\ndata: {{\"objectives\":{objectives},\"schedule\":{sol.response_json()}}}\n\n"
 
-    return StreamingResponse(time_table_generator(), media_type="text/event-stream")
+    return StreamingResponse(
+        iterate_in_thread(
+            pareto_events,
+            cancel=cancellation.cancel,
+            is_disconnected=request.is_disconnected,
+        ),
+        media_type="text/event-stream",
+        headers={CATALOG_VERSION_HEADER: catalog.version},
+    )
@@ -0,0 +1,208 @@
+import asyncio
+import fcntl
+import os
+import pickle
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+
+class FileFlightStore:
+    """
+    lets server processes on the same machine share in-flight solves. the process solving a key holds an
+    exclusive lock on <root>/<key>.lock and writes its result next to it before unlocking, processes that
+    wanted the same key wait for the lock and read the result. results are only read by requests that were
+    waiting while it was solved, so this never acts as a cache.
+
+    lock files nobody has used for result_ttl are deleted along with old results. a process can open a lock
+    file just before it's deleted, so whoever takes a lock checks it's still the file at that path
+    """
+
+    def __init__(self, root: str, result_ttl: float = 30.0):
+        self.root = root
+        self.result_ttl = result_ttl
+        os.makedirs(root, exist_ok=True)
+
+    def __path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.root, f"{key}.{suffix}")
+
+    def __lock(self, key: str, operation: int) -> int:
+        """
+        fd of key's lock file, locked with operation (fcntl.LOCK_*). raises BlockingIOError for a LOCK_NB
+        lock that's held
+        """
+        path = self.__path(key, "lock")
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, operation)
+                try:
+                    if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                        return fd
+                except FileNotFoundError:
+                    pass
+            except BaseException:
+                os.close(fd)
+                raise
+            # purged while waiting for it, lock the new one
+            os.close(fd)
+
+    def try_lead(self, key: str) -> Optional[int]:
+        # lock fd if nobody else is solving key
+        try:
+            fd = self.__lock(key, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+
+        # keys being solved aren't purged
+        os.utime(fd)
+        self.__purge()
+        return fd
+
+    def lead(self, key: str) -> int:
+        fd = self.__lock(key, fcntl.LOCK_EX)
+        os.utime(fd)
+        return fd
+
+    def publish(self, key: str, value: Any, fd: int):
+        tmp_path = self.__path(key, f"{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f)
+        os.replace(tmp_path, self.__path(key, "result"))
+        self.release(fd)
+
+    def release(self, fd: int):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def wait(self, key: str, since: float) -> Any:
+        """
+        blocks until whoever is solving key is done, their result or _MISSING if they failed
+        """
+        fd = self.__lock(key, fcntl.LOCK_SH)
+        try:
+            try:
+                result_path = self.__path(key, "result")
+                if os.path.getmtime(result_path) < since:
+                    return _MISSING
+                with open(result_path, "rb") as f:
+                    return pickle.load(f)
+            except FileNotFoundError:
+                return _MISSING
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def __purge(self):
+        # results older than anyone could still be waiting for, and lock files of keys nobody is solving
+        cutoff = time.time() - self.result_ttl
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                if name.endswith(".result"):
+                    os.remove(path)
+                elif name.endswith(".lock"):
+                    self.__purge_lock(path)
+            except FileNotFoundError:
+                pass
+
+    def __purge_lock(self, path: str):
+        fd = os.open(path, os.O_RDWR)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # someone is solving or waiting on it
+                return
+            # deleted while holding the lock, anyone who opened it meanwhile sees it's gone once they lock it
+            if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                os.remove(path)
+        finally:
+            os.close(fd)
+
+
+class SingleFlight:
+    """
+    runs one solve per key at a time, identical requests that arrive while it's running wait for it and
+    share its result (or its error). with a store the same goes for requests in other server processes.
+
+    the solve runs as its own task, so the request that started it disconnecting doesn't cancel it for the
+    requests waiting on it
+    """
+
+    def __init__(self, store: Optional[FileFlightStore] = None):
+        self.store = store
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.coalesced_across_processes = 0
+        self._lock = threading.Lock()
+        self._flights: dict[str, asyncio.Task] = dict()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = asyncio.ensure_future(self.__lead(key, fn))
+                self._flights[key] = flight
+                flight.add_done_callback(lambda _: self.__land(key))
+            else:
+                self.coalesced += 1
+
+        return await asyncio.shield(flight)
+
+    def __land(self, key: str):
+        with self._lock:
+            self._flights.pop(key, None)
+
+    async def __lead(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        if self.store is None:
+            with self._lock:
+                self.executions += 1
+            return await fn()
+
+        since = time.time()
+        fd = await asyncio.to_thread(self.store.try_lead, key)
+        if fd is None:
+            result = await asyncio.to_thread(self.store.wait, key, since)
+            if result is not _MISSING:
+                with self._lock:
+                    self.coalesced_across_processes += 1
+                return result
+            # the other process failed, try it here
+            fd = await asyncio.to_thread(self.store.lead, key)
+
+        with self._lock:
+            self.executions += 1
+        try:
+            result = await fn()
+        except BaseException:
+            self.store.release(fd)
+            raise
+        await asyncio.to_thread(self.store.publish, key, result, fd)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            shared = self.coalesced + self.coalesced_across_processes
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "coalesced_across_processes": self.coalesced_across_processes,
+                "in_flight": len(self._flights),
+                # share of requests answered by someone else's solve
+                "coalescing_ratio": shared / self.calls if self.calls else 0.0,
+            }
+
+
+# GRAD_SAT_SINGLEFLIGHT_DIR shares in-flight solves between the server processes on a machine
+_store_dir = os.getenv("GRAD_SAT_SINGLEFLIGHT_DIR")
+singleflight = SingleFlight(store=None if not _store_dir else FileFlightStore(_store_dir))
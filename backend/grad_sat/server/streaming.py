@@ -0,0 +1,73 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import AsyncGenerator, Awaitable, Callable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_ITEM, _ERROR, _DONE = range(3)
+
+
+async def iterate_in_thread(
+    make_iterator: Callable[[], Iterator[T]],
+    cancel: Callable[[], None],
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    max_buffered: int = 2,
+    poll_interval: float = 1.0,
+) -> AsyncGenerator[T, None]:
+    """
+    runs a blocking iterator (ie. a sequence of cp-sat solves) in a worker thread so the event loop stays free,
+    items come back through a bounded queue so the producer can't run ahead of a slow client.
+
+    when the consumer stops early (client disconnected, response cancelled) cancel() is called to stop the
+    in-flight search and the producer thread exits on its next put.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffered)
+    consumer_gone = threading.Event()
+
+    def put(kind: int, item) -> bool:
+        future = asyncio.run_coroutine_threadsafe(queue.put((kind, item)), loop)
+        while True:
+            try:
+                future.result(timeout=0.1)
+                return True
+            except concurrent.futures.TimeoutError:
+                # queue is full (backpressure), give up if nobody is going to drain it
+                if consumer_gone.is_set():
+                    future.cancel()
+                    return False
+
+    def produce():
+        try:
+            for item in make_iterator():
+                if consumer_gone.is_set() or not put(_ITEM, item):
+                    return
+        except BaseException as e:
+            put(_ERROR, e)
+        finally:
+            if not consumer_gone.is_set():
+                put(_DONE, None)
+
+    producer = threading.Thread(target=produce, name="iterate_in_thread", daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            try:
+                kind, item = await asyncio.wait_for(queue.get(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                # nothing is written while a solve runs, so check on the client between items
+                if is_disconnected is not None and await is_disconnected():
+                    print("client disconnected, stopping search")
+                    return
+                continue
+
+            if kind == _DONE:
+                return
+            if kind == _ERROR:
+                raise item
+            yield item
+    finally:
+        consumer_gone.set()
+        cancel()
@@ -0,0 +1,86 @@
+import time
+from typing import Optional
+
+from fastapi import Request
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+# the order metrics are listed in the header
+SERVER_TIMING_METRICS = ["parse", "queue", "build", "solve", "feedback", "serialise", "total"]
+
+
+def timing_metric(phase: str) -> str:
+    """
+    the Server-Timing metric a solver phase (see PhaseTimer) counts towards, the planner's explanation
+    model (explain.*) is counted like the plan's
+    """
+    phase = phase.removeprefix("explain.")
+    if phase == "solve":
+        return "solve"
+    if phase in ["extract", "feedback"]:
+        return "feedback"
+    if phase == "response":
+        return "serialise"
+    # cull, variables, constraints.*
+    return "build"
+
+
+class RequestTiming:
+    """
+    where a request's time went, sent back as a Server-Timing header. the middleware creates one per request
+    and adds serialisation and the total once the handler returns, solve endpoints add the rest
+    """
+
+    def __init__(self):
+        self.received_at = time.perf_counter()
+        self.handler_done_at: Optional[float] = None
+        self.durations: dict[str, float] = dict()
+
+    def add(self, metric: str, seconds: float):
+        self.durations[metric] = self.durations.get(metric, 0.0) + seconds
+
+    def add_report(self, report: dict, waited: float):
+        """
+        adds a solver job's phase timings, waited is how long the request waited on the job. whatever of that
+        the job didn't spend in a phase was queueing (and sending the job to and from the worker)
+        """
+        phases = report.get("phases", {})
+        for phase, seconds in phases.items():
+            self.add(timing_metric(phase), seconds)
+        self.add("queue", max(0.0, waited - sum(phases.values())))
+
+    def handler_done(self):
+        self.handler_done_at = time.perf_counter()
+
+    def finish(self) -> str:
+        # the header value, durations in milliseconds
+        now = time.perf_counter()
+        if self.handler_done_at is not None:
+            self.add("serialise", now - self.handler_done_at)
+        self.durations["total"] = now - self.received_at
+        return ", ".join(
+            f"{metric};dur={self.durations[metric] * 1000:.1f}"
+            for metric in SERVER_TIMING_METRICS
+            if metric in self.durations
+        )
+
+
+def request_timing(request: Request) -> RequestTiming:
+    """
+    the request's timing, called first thing in a handler so the time before it counts as parsing
+    """
+    timing = request.state.timing
+    timing.add("parse", time.perf_counter() - timing.received_at)
+    return timing
+
+
+def solve_debug_stats(report: dict, timing: RequestTiming, cached: bool = False) -> dict:
+    # the debug_stats block of a response, the job's phases, solver stats and budget plus the request's timings
+    # so far
+    return {
+        "cached": cached,
+        "phases": report.get("phases", {}),
+        "solvers": report.get("solvers", []),
+        "budget": report.get("budget"),
+        "timings": dict(timing.durations),
+    }